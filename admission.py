@@ -0,0 +1,264 @@
+"""
+Admission Control
+
+Decides, before any work is done, whether a ``/query`` request is served or
+rejected straight away: each client IP draws from a token bucket (``429``
+when it is empty) and the number of requests being served at once across
+all workers is capped (``503`` when full). Rejections carry ``Retry-After``
+and cost microseconds, so a burst gets fast answers instead of queueing
+until the worker timeout.
+
+State lives in an anonymous shared memory mapping created at import, like
+the request metrics: with gunicorn preloading the app, every forked worker
+sees the same buckets and in-flight counts. Each process counts its own
+in-flight requests in its own slot, and a new worker taking over the slot
+of an exited one resets it, so requests cut short by a crash do not hold
+capacity forever. Updates are serialized by one inter-process lock; if it
+cannot be taken promptly (e.g. its holder was killed), requests are
+admitted rather than made to wait.
+
+Client buckets are kept in a fixed-size table keyed by a hash of the
+address. When a table region is full, the least recently used bucket is
+reused; its client simply starts again with a full bucket.
+"""
+
+import hashlib
+import math
+import mmap
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from metrics import _is_running
+
+# Buckets examined for a client before the least recently used one is reused
+PROBES = 8
+
+# Per-slot counters after the in-flight count: admitted, throttled, shed
+_COUNTERS = ("admitted", "throttled", "shed")
+
+
+class Rejection(NamedTuple):
+    """Why a request was turned away and when to try again."""
+
+    status: int
+    retry_after: int
+    message: str
+
+
+def client_key(address: str) -> int:
+    """Stable, non-zero 63-bit key for a client address."""
+    digest = hashlib.blake2b(address.encode(), digest_size=8).digest()
+    return (int.from_bytes(digest, "big") >> 1) or 1
+
+
+class AdmissionController:
+    """
+    Per-client token buckets and a global concurrency limit, shared by
+    forked processes.
+
+    Args:
+        rate (float): Requests per second each client may sustain; 0
+            disables the buckets
+        burst (float): Requests a client may make at once (bucket size)
+        max_concurrent (int): Requests served at once across all processes;
+            0 disables the limit
+        retry_after (int): ``Retry-After`` seconds when the limit is full
+        table_size (int): Client buckets kept
+        slots (int): Maximum number of processes counted at the same time
+        lock_timeout (float): Seconds to wait for the shared lock before
+            admitting without a check
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: float = 40.0,
+        max_concurrent: int = 0,
+        retry_after: int = 1,
+        table_size: int = 4096,
+        slots: int = 64,
+        lock_timeout: float = 0.05,
+    ) -> None:
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, float(burst))
+        self.max_concurrent = max(0, int(max_concurrent))
+        self.retry_after = max(1, int(retry_after))
+        self.table_size = max(PROBES, int(table_size))
+        self.slots = max(1, int(slots))
+        self.lock_timeout = lock_timeout
+
+        # Per slot: owner pid, in-flight count, then the counters
+        self._slot_len = 2 + len(_COUNTERS)
+        int_bytes = 8 * (self.slots * self._slot_len + self.table_size)
+        self._mmap = mmap.mmap(-1, int_bytes + 16 * self.table_size)
+        view = memoryview(self._mmap)
+        ints = view[:int_bytes].cast("q")
+        self._slot_values = ints[: self.slots * self._slot_len]
+        self._keys = ints[self.slots * self._slot_len :]
+        floats = view[int_bytes:].cast("d")
+        self._tokens = floats[: self.table_size]
+        self._stamps = floats[self.table_size :]
+
+        self._lock = multiprocessing.Lock()
+        self._slot_pid: Optional[int] = None
+        self._slot: Optional[int] = None
+        self.unchecked = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 or self.max_concurrent > 0
+
+    def _own_slot(self) -> Optional[int]:
+        """This process's slot, claimed on first use after a fork (lock held)."""
+        pid = os.getpid()
+        if self._slot_pid == pid:
+            return self._slot
+        values, slot = self._slot_values, None
+        for index in range(self.slots):
+            base = index * self._slot_len
+            owner = values[base]
+            if owner in (0, pid) or not _is_running(owner):
+                if owner != pid:
+                    # Requests of an exited owner will never be released
+                    values[base + 1] = 0
+                values[base] = pid
+                slot = index
+                break
+        self._slot_pid, self._slot = pid, slot
+        return slot
+
+    def _in_flight(self) -> int:
+        values = self._slot_values
+        return sum(values[base + 1] for base in range(0, len(values), self._slot_len))
+
+    def _take_token(self, key: int, now: float) -> float:
+        """
+        Take a token from the client's bucket (lock held).
+
+        Returns:
+            float: 0.0 if a token was taken, else seconds until one is available
+        """
+        start = key % self.table_size
+        found = oldest = None
+        for probe in range(PROBES):
+            index = (start + probe) % self.table_size
+            if self._keys[index] == key:
+                found = index
+                break
+            if oldest is None or self._stamps[index] < self._stamps[oldest]:
+                oldest = index
+        if found is None:
+            found = oldest
+            self._keys[found] = key
+            self._tokens[found] = self.burst
+            self._stamps[found] = now
+
+        elapsed = max(0.0, now - self._stamps[found])
+        tokens = min(self.burst, self._tokens[found] + elapsed * self.rate)
+        self._stamps[found] = now
+        if tokens >= 1.0:
+            self._tokens[found] = tokens - 1.0
+            return 0.0
+        self._tokens[found] = tokens
+        return (1.0 - tokens) / self.rate
+
+    def _refund(self, key: int) -> None:
+        """Give back a token taken for a request that was shed (lock held)."""
+        start = key % self.table_size
+        for probe in range(PROBES):
+            index = (start + probe) % self.table_size
+            if self._keys[index] == key:
+                self._tokens[index] = min(self.burst, self._tokens[index] + 1.0)
+                return
+
+    def admit(self, client: str) -> Optional[Rejection]:
+        """
+        Admit a request from ``client`` or say why not.
+
+        An admitted request must be followed by exactly one ``release()``
+        from the same process.
+
+        Args:
+            client (str): Client address
+
+        Returns:
+            Optional[Rejection]: None if admitted, else the status to answer
+        """
+        if not self._lock.acquire(timeout=self.lock_timeout):
+            self.unchecked += 1
+            return None
+        try:
+            slot = self._own_slot()
+            if slot is None:
+                self.unchecked += 1
+                return None
+            base = slot * self._slot_len
+            key = client_key(client)
+            if self.rate > 0:
+                wait = self._take_token(key, time.monotonic())
+                if wait:
+                    self._slot_values[base + 3] += 1
+                    return Rejection(
+                        429,
+                        max(1, math.ceil(wait)),
+                        "Too many queries, please slow down",
+                    )
+            if self.max_concurrent and self._in_flight() >= self.max_concurrent:
+                if self.rate > 0:
+                    self._refund(key)
+                self._slot_values[base + 4] += 1
+                return Rejection(
+                    503, self.retry_after, "Server is busy, please retry shortly"
+                )
+            self._slot_values[base + 1] += 1
+            self._slot_values[base + 2] += 1
+            return None
+        finally:
+            self._lock.release()
+
+    def release(self) -> None:
+        """End a request admitted by this process."""
+        if self._slot_pid != os.getpid() or self._slot is None:
+            return
+        if not self._lock.acquire(timeout=self.lock_timeout):
+            return
+        try:
+            base = self._slot * self._slot_len
+            # Never below zero: admissions made without the check were not counted
+            if self._slot_values[base + 1] > 0:
+                self._slot_values[base + 1] -= 1
+        finally:
+            self._lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Limits and counters summed over every process.
+
+        Returns:
+            Dict[str, Any]: Settings, requests in flight, admitted, throttled
+            (429) and shed (503) totals, and this process's unchecked count
+        """
+        totals = dict.fromkeys(_COUNTERS, 0)
+        with self._lock:
+            in_flight = self._in_flight()
+            values = self._slot_values
+            for base in range(0, len(values), self._slot_len):
+                for offset, name in enumerate(_COUNTERS, start=2):
+                    totals[name] += values[base + offset]
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_concurrent": self.max_concurrent,
+            "in_flight": in_flight,
+            **totals,
+            "unchecked": self.unchecked,
+        }
+
+    def reset(self) -> None:
+        """Forget every bucket, count and slot."""
+        with self._lock:
+            self._mmap.seek(0)
+            self._mmap.write(bytes(len(self._mmap)))
+            self._slot_pid = self._slot = None
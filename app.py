@@ -5,12 +5,68 @@ A secure Flask application that serves as a portfolio website,
 allowing users to submit SQL queries to interact with a SQLite database.
 """
 
-from flask import Flask, render_template, request, jsonify
+from startup import LOADED_AT, StartupTimer  # first, to time the imports below
+from flask import (
+    Flask,
+    Response,
+    abort,
+    g,
+    jsonify,
+    render_template,
+    request,
+    send_from_directory,
+    url_for,
+)
 import sqlite3
+import gzip
+import hashlib
+import hmac
+import json
 import logging
 import os
-import re
-from typing import Dict, Any, Tuple
+import time
+from contextlib import contextmanager
+from typing import (
+    Callable,
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from assets import (
+    DIST_DIR,
+    ENCODINGS,
+    SERVICE_WORKER,
+    AssetManifest,
+    mimetype_for,
+    select_variant,
+)
+from cache import LRUCache
+from db_pool import (
+    PoolTimeoutError,
+    QueryTimeoutError,
+    StatementDeadline,
+    database_fingerprint,
+    open_pool,
+)
+from db_replica import MemoryReplica
+from metrics import MetricsRegistry, StageTimer
+from pagination import (
+    CursorCodec,
+    InvalidCursorError,
+    fetch_page,
+    id_keyed_tables,
+    query_digest,
+    supports_keyset,
+)
+from result_encoder import FORMATS, ROWS, encode_result
+from query_planner import PlanEstimate, QueryCostGuard, QueryTooExpensiveError
+from sql_validator import SQLValidator, canonical_query
 
 # Import configuration
 try:
@@ -63,6 +119,11 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Startup phases up to the worker being ready, logged once per process
+startup = StartupTimer()
+startup.mark("launch", at=LOADED_AT)
+startup.mark("imports")
+
 app = Flask(__name__)
 
 # Load configuration
@@ -119,6 +180,240 @@ BLOCKED_KEYWORDS = getattr(
 )
 ALLOWED_TABLES = {"projects", "skills", "education", "experience", "clients"}
 MAX_QUERY_LENGTH = getattr(app_config, "MAX_QUERY_LENGTH", 1000)
+MAX_RESULTS = getattr(app_config, "MAX_RESULTS", 100)
+
+# Signs the opaque next_cursor continuation tokens
+cursor_codec = CursorCodec(
+    getattr(app_config, "SECRET_KEY", "dev-secret-key-change-in-production")
+)
+
+# Tables whose primary key is ``id``, for keyset paging; read on first use
+_keyed_tables: Dict[str, Optional[frozenset]] = {"tables": None}
+
+VALIDATION_CACHE_SIZE = getattr(app_config, "VALIDATION_CACHE_SIZE", 256)
+
+# Keyword and table sets are compiled once here, not on every request
+_validator = SQLValidator(
+    BLOCKED_KEYWORDS, ALLOWED_TABLES, MAX_QUERY_LENGTH, VALIDATION_CACHE_SIZE
+)
+
+# The query builder's example queries, validated and planned in the master
+# before workers fork (see preload_resources)
+WARM_QUERIES = (
+    "SELECT * FROM projects;",
+    "SELECT name FROM skills WHERE category = 'Programming';",
+    "SELECT degree, institution FROM education;",
+    "SELECT job_title, company FROM experience WHERE start_year > 2020;",
+    "SELECT name, description FROM projects;",
+    "SELECT name, email FROM clients WHERE age > 25;",
+    "SELECT name FROM clients;",
+)
+
+
+# Read-only connections, opened lazily in each worker after fork
+db_pool = open_pool(DB_PATH, app_config)
+
+# Optional in-memory copy of the allowed tables. SQLite databases must not
+# cross a fork, so each worker builds its own in open_worker_resources()
+replica: Optional[MemoryReplica] = None
+if getattr(app_config, "DB_MEMORY_REPLICA", False):
+    replica = MemoryReplica(DB_PATH, ALLOWED_TABLES, db_pool)
+
+startup.mark("database")
+
+# Shared secret for the /admin endpoints; empty disables them
+ADMIN_TOKEN = getattr(app_config, "ADMIN_TOKEN", "")
+
+# Wall-clock budget for user SQL, enforced inside SQLite
+query_deadline = StatementDeadline(
+    getattr(app_config, "QUERY_TIMEOUT", 5.0),
+    getattr(app_config, "QUERY_PROGRESS_STEPS", 1000),
+)
+
+
+# EXPLAIN QUERY PLAN budget for user SQL, with per-query cached decisions
+cost_guard = QueryCostGuard(
+    getattr(app_config, "QUERY_PLAN_MAX_COST", 1000),
+    scan_cost=getattr(app_config, "QUERY_PLAN_SCAN_COST", 10),
+    temp_btree_cost=getattr(app_config, "QUERY_PLAN_TEMP_BTREE_COST", 5),
+    cache_size=getattr(app_config, "QUERY_PLAN_CACHE_SIZE", 256),
+)
+
+# Optional subsystems below are imported only when configured, so a disabled
+# one costs nothing at startup; their module globals are None then
+
+# /query statements slower than the threshold, with their plans
+slow_query_log = None
+if getattr(app_config, "SLOW_QUERY_THRESHOLD", 0.25):
+    from slow_queries import SlowQueryLog
+
+    slow_query_log = SlowQueryLog(
+        getattr(app_config, "SLOW_QUERY_THRESHOLD", 0.25),
+        capacity=getattr(app_config, "SLOW_QUERY_LOG_SIZE", 200),
+        log_file=getattr(app_config, "SLOW_QUERY_LOG_FILE", ""),
+        max_bytes=getattr(app_config, "SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024),
+        backups=getattr(app_config, "SLOW_QUERY_LOG_BACKUPS", 3),
+    )
+
+# Encoded /query responses, keyed on the canonical query and database state
+result_cache = LRUCache(
+    None,
+    max_bytes=getattr(app_config, "RESULT_CACHE_MAX_BYTES", 8 * 1024 * 1024),
+    ttl=getattr(app_config, "RESULT_CACHE_TTL", 0),
+)
+
+# Identical /query requests in flight at the same time share one execution
+query_flights = None
+if getattr(app_config, "QUERY_COALESCE_TIMEOUT", 5.0):
+    from singleflight import SingleFlight
+
+    query_flights = SingleFlight(getattr(app_config, "QUERY_COALESCE_TIMEOUT", 5.0))
+
+# HTTP caching policy (responses revalidate with ETag / If-None-Match)
+INDEX_CACHE_CONTROL = "public, no-cache"
+PROJECTS_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+QUERY_CACHE_CONTROL = "private, no-cache"
+
+# Hashed, precompressed copies of the CSS and JavaScript written by assets.py;
+# without a build the manifest is empty and templates use the plain files
+ASSET_DIR = os.path.join(app.static_folder, DIST_DIR)
+STATIC_ASSET_MAX_AGE = getattr(app_config, "STATIC_ASSET_MAX_AGE", 365 * 24 * 3600)
+asset_manifest = AssetManifest(
+    app.static_folder, auto_reload=getattr(app_config, "DEBUG", False)
+)
+
+
+class RenderedPage(NamedTuple):
+    """A template rendered once, with its validator and gzip variant."""
+
+    key: Tuple[Any, ...]
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+
+# The index takes no per-request context, so it is rendered once per process
+# (or, with INDEX_AUTO_RELOAD, again whenever the template or asset manifest
+# changes) and served from these bytes
+INDEX_AUTO_RELOAD = getattr(app_config, "DEBUG", False)
+_index_page: Dict[str, Optional[RenderedPage]] = {"page": None}
+
+# Per-stage timing (Server-Timing header) and /metrics histograms, shared by
+# every worker forked from the master that imported this module
+METRICS_ENABLED = getattr(app_config, "METRICS_ENABLED", True)
+SERVER_TIMING_ENABLED = getattr(app_config, "SERVER_TIMING_ENABLED", True)
+METRIC_ENDPOINTS = (
+    "index",
+    "query",
+    "query_batch",
+    "projects",
+    "health_check",
+    "prometheus_metrics",
+    "reload_replica",
+    "slow_queries",
+    "hashed_asset",
+    "service_worker",
+    "static",
+    "other",
+)
+METRIC_STAGES = (
+    "validate",
+    "cache",
+    "coalesce",
+    "acquire",
+    "plan",
+    "execute",
+    "fetch",
+    "encode",
+)
+request_metrics = MetricsRegistry(
+    METRIC_ENDPOINTS, METRIC_STAGES, slots=getattr(app_config, "METRICS_SLOTS", 64)
+)
+
+# Fast 429/503 rejections for /query under bursts, shared by forked workers;
+# off unless configured. /health, the page and static files are never
+# subject to it
+ADMISSION_ENDPOINTS = frozenset({"query", "query_batch"})
+ADMISSION_PROXY_HOPS = getattr(app_config, "ADMISSION_PROXY_HOPS", 0)
+admission = None
+if getattr(app_config, "ADMISSION_RATE", 0) or getattr(
+    app_config, "ADMISSION_MAX_CONCURRENT", 0
+):
+    from admission import AdmissionController
+
+    admission = AdmissionController(
+        rate=getattr(app_config, "ADMISSION_RATE", 0),
+        burst=getattr(app_config, "ADMISSION_BURST", 40),
+        max_concurrent=getattr(app_config, "ADMISSION_MAX_CONCURRENT", 0),
+        retry_after=getattr(app_config, "ADMISSION_RETRY_AFTER", 1),
+        table_size=getattr(app_config, "ADMISSION_TABLE_SIZE", 4096),
+        slots=getattr(app_config, "METRICS_SLOTS", 64),
+    )
+
+# gzip for text responses over COMPRESSION_MIN_SIZE, streamed ones included
+if getattr(app_config, "COMPRESSION_ENABLED", True):
+    from compression import CompressionMiddleware
+
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=getattr(app_config, "COMPRESSION_MIN_SIZE", 1024),
+        level=getattr(app_config, "COMPRESSION_LEVEL", 6),
+    )
+
+# Streaming (NDJSON) mode for /query
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = getattr(app_config, "STREAM_BATCH_SIZE", 200)
+STREAM_MAX_ROWS = getattr(app_config, "STREAM_MAX_ROWS", 100000)
+
+# Several /query statements in one request and one read transaction
+BATCH_MAX_QUERIES = getattr(app_config, "QUERY_BATCH_MAX_QUERIES", 10)
+BATCH_MAX_ROWS = getattr(app_config, "QUERY_BATCH_MAX_ROWS", 1000)
+
+
+def reload_validation_rules() -> None:
+    """
+    Recompile the validator from the current keyword and table sets.
+
+    Call after changing ``ALLOWED_TABLES``, ``BLOCKED_KEYWORDS`` or
+    ``MAX_QUERY_LENGTH``; cached verdicts are dropped if any of them changed.
+    """
+    _validator.configure(BLOCKED_KEYWORDS, ALLOWED_TABLES, MAX_QUERY_LENGTH)
+
+
+def validation_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss counters of the validation verdict cache.
+
+    Returns:
+        Dict[str, Any]: hits, misses, hit rate, evictions and size
+    """
+    return _validator.cache_stats()
+
+
+def coalescing_stats() -> Dict[str, Any]:
+    """
+    Get this worker's /query coalescing counters.
+
+    Returns:
+        Dict[str, Any]: Executions run and saved, wait timeouts, flights;
+        only ``enabled`` when coalescing is off
+    """
+    if query_flights is None:
+        return {"enabled": False}
+    return query_flights.stats()
+
+
+def admission_stats() -> Dict[str, Any]:
+    """
+    Get the /query admission limits and counters of all workers.
+
+    Returns:
+        Dict[str, Any]: Limits, requests in flight, admitted, throttled and
+        shed totals; only ``enabled`` when admission control is off
+    """
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": admission.enabled, **admission.stats()}
 
 
 def validate_sql_query(query: str) -> Tuple[bool, str]:
@@ -131,79 +426,379 @@ def validate_sql_query(query: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: (is_valid, error_message)
     """
-    if not query or not query.strip():
-        return False, "Query cannot be empty"
+    return _validator.validate(query)
 
-    if len(query) > MAX_QUERY_LENGTH:
-        return (
-            False,
-            f"Query too long. Maximum {MAX_QUERY_LENGTH} " f"characters allowed",
-        )
 
-    # Convert to uppercase for keyword checking
-    query_upper = query.upper()
-
-    # Block dangerous keywords (with word boundaries)
-    for keyword in BLOCKED_KEYWORDS:
-        # Use word boundaries to match whole words
-        pattern = r"\b" + re.escape(keyword) + r"\b"
-        if re.search(pattern, query_upper):
-            return False, f"Operation '{keyword}' is not allowed"
-
-    # Additional SQL injection patterns
-    injection_patterns = [
-        r"'.*'.*=.*'.*'",  # 'x'='x' patterns
-        r"1\s*=\s*1",  # 1=1 patterns
-        r"0\s*=\s*0",  # 0=0 patterns
-        r"true\s*=\s*true",  # true=true patterns
-    ]
+def open_worker_resources() -> None:
+    """
+    Open this process's database resources, e.g. right after a fork.
+
+    Builds the in-memory replica if enabled, checks out the first pooled
+    connection and renders the index page so a worker's first request pays
+    for none of them. Validation and plan caches inherited from the master
+    stay valid and are kept. Ends the ``server`` (app import to worker
+    start) and ``worker_init`` startup phases, and with them startup.
+    """
+    startup.mark("server")
+    if replica is not None:
+        try:
+            replica.open()
+        except sqlite3.Error as e:
+            logger.error(f"In-memory replica unavailable, reading {DB_PATH}: {e}")
+    try:
+        with db_pool.connection():
+            pass
+    except (PoolTimeoutError, sqlite3.Error) as e:
+        logger.warning(f"Could not open a database connection at startup: {e}")
+    prerender_pages()
+    if startup.finish("worker_init"):
+        logger.info(f"Startup (pid {os.getpid()}): {startup.summary()}")
+
 
-    for pattern in injection_patterns:
-        if re.search(pattern, query_upper):
-            return False, "Suspicious SQL pattern detected"
+def preload_resources() -> None:
+    """
+    Warm what forked workers inherit, once in the master (gunicorn --preload).
 
-    # Ensure query starts with SELECT
-    if not query_upper.strip().startswith("SELECT"):
-        return False, "Only SELECT queries are allowed"
+    Validates and plans the query builder's example queries, so the
+    validation and plan caches start warm, and renders the index page. The
+    master's pooled connection is closed again before workers fork.
+    """
+    key_state = _database_state()
+    try:
+        with db_pool.connection() as conn:
+            for sql in WARM_QUERIES:
+                is_valid, _ = validate_sql_query(sql)
+                if is_valid and key_state is not None:
+                    cost_guard.estimate(conn, sql, (canonical_query(sql), key_state))
+    except (PoolTimeoutError, sqlite3.Error) as e:
+        logger.warning(f"Could not warm the query caches: {e}")
+    finally:
+        db_pool.close()
+    prerender_pages()
+    startup.mark("preload")
 
-    # Check for semicolon (prevent multiple statements)
-    if query.count(";") > 1 or (
-        query.count(";") == 1 and not query.strip().endswith(";")
-    ):
-        return False, "Multiple statements are not allowed"
 
-    # Validate table names first
-    table_found = False
-    for table in ALLOWED_TABLES:
-        if table.upper() in query_upper:
-            table_found = True
-            break
+def prerender_pages() -> None:
+    """Render the index page now unless this process already has it."""
+    with app.test_request_context("/"):
+        _rendered_index()
 
-    if not table_found:
-        return (
-            False,
-            f"Query must reference at least one allowed table: "
-            f"{', '.join(ALLOWED_TABLES)}",
+
+def close_worker_resources() -> None:
+    """Close this process's replica and pooled connections, drop cached results."""
+    if replica is not None:
+        replica.close()
+    db_pool.close()
+    result_cache.clear()
+
+
+def _database_state() -> Optional[Tuple[int, ...]]:
+    """
+    Fingerprint of the data queries are served from.
+
+    With the in-memory replica this is the file state it was copied from, so
+    cached results stay valid until the replica itself is rebuilt.
+    """
+    if replica is not None and replica.fingerprint is not None:
+        return replica.fingerprint
+    return database_fingerprint(DB_PATH)
+
+
+def _query_key(sql: str) -> Optional[Tuple[Any, ...]]:
+    """
+    Cache key for per-query decisions and results.
+
+    Returns:
+        Optional[Tuple[Any, ...]]: Canonical query plus database fingerprint,
+        or None if the database file cannot be fingerprinted
+    """
+    fingerprint = _database_state()
+    if fingerprint is None:
+        return None
+    return (canonical_query(sql), fingerprint)
+
+
+def _wants_stream(json_data: Dict[str, Any]) -> bool:
+    """Check whether the client opted into the NDJSON streaming response."""
+    if json_data.get("stream") is True:
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _request_timer() -> StageTimer:
+    """The current request's stage timer (a detached one outside requests)."""
+    timer = g.get("timer")
+    return timer if timer is not None else StageTimer()
+
+
+def _keyset_tables(conn: sqlite3.Connection) -> frozenset:
+    """Tables that can be paged by ``id`` seeks, read from the schema once."""
+    tables = _keyed_tables["tables"]
+    if tables is None:
+        tables = _keyed_tables["tables"] = id_keyed_tables(conn)
+    return tables
+
+
+@contextmanager
+def _checkout(timer: StageTimer) -> Iterator[sqlite3.Connection]:
+    """Pooled connection, with the time spent waiting for it recorded."""
+    started = time.perf_counter()
+    with db_pool.connection() as conn:
+        timer.add("acquire", time.perf_counter() - started)
+        yield conn
+
+
+def _record_slow_query(
+    sql: str,
+    timer: StageTimer,
+    row_count: Optional[int],
+    estimate: Optional[PlanEstimate] = None,
+    query_key: Optional[Tuple[Any, ...]] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Add a statement to the slow-query log, planning it if not yet planned."""
+    if slow_query_log is None:
+        return
+    plan, cost = (), None
+    try:
+        if estimate is None:
+            with db_pool.connection() as conn:
+                estimate = cost_guard.estimate(conn, sql, query_key)
+        plan, cost = estimate.plan, estimate.cost
+    except (PoolTimeoutError, sqlite3.Error) as e:
+        logger.warning(f"Could not plan slow query: {e}")
+    slow_query_log.record(
+        sql, timer.elapsed(), timer.stages, row_count, plan, cost, error
+    )
+
+
+def _stream_query(sql: str, query_key: Optional[Tuple[Any, ...]]) -> Iterator[bytes]:
+    """
+    Execute ``sql`` and yield NDJSON lines: columns, row batches, then a footer.
+
+    The first ``next()`` executes the statement and yields an empty chunk, so
+    the caller can surface database errors as a normal JSON response before
+    any of the stream is sent. The connection stays checked out until the
+    stream is exhausted or closed, but only execution and fetching count
+    against the deadline: time spent waiting for the client to read does not.
+    """
+    started = False
+    timer = _request_timer()
+    try:
+        with _checkout(timer) as conn:
+            budget = query_deadline.metered()
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Plain tuples encode without a copy
+            with budget.applied(conn):
+                with timer.stage("plan"):
+                    cost_guard.check(conn, sql, query_key)
+                with timer.stage("execute"):
+                    cursor.execute(sql)
+            columns = (
+                [desc[0] for desc in cursor.description] if cursor.description else []
+            )
+            yield b""
+            started = True
+
+            yield (json.dumps({"columns": columns}) + "\n").encode()
+            row_count = 0
+            dumps = json.dumps
+            while row_count < STREAM_MAX_ROWS:
+                with budget.applied(conn):
+                    rows = cursor.fetchmany(
+                        min(STREAM_BATCH_SIZE, STREAM_MAX_ROWS - row_count)
+                    )
+                if not rows:
+                    break
+                row_count += len(rows)
+                yield "".join([dumps(row) + "\n" for row in rows]).encode()
+
+            logger.info(f"Query streamed successfully. Returned {row_count} rows")
+            yield (json.dumps({"row_count": row_count}) + "\n").encode()
+
+    except (QueryTimeoutError, sqlite3.Error) as e:
+        if not started:
+            raise
+        # Headers are already sent; report the failure in-band
+        logger.error(f"Streaming query failed: {str(e)}")
+        message = (
+            str(e) if isinstance(e, QueryTimeoutError) else "Database query failed"
         )
+        yield (json.dumps({"error": message}) + "\n").encode()
+
+
+def _etag_for(data: bytes) -> str:
+    """Strong ETag value derived from a hash of ``data``."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _client_has(etag: Optional[str]) -> bool:
+    """Check whether the request's If-None-Match already names ``etag``."""
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
 
-    # Check for multiple table references that could indicate UNION attacks
-    table_count = sum(1 for table in ALLOWED_TABLES if table.upper() in query_upper)
-    if table_count > 1 and ("UNION" in query_upper or "JOIN" not in query_upper):
-        # Allow JOINs but be suspicious of multiple tables without explicit JOINs
-        return False, "Multiple table references detected without explicit JOIN"
+def _with_validators(response: Response, etag: str, cache_control: str) -> Response:
+    """Attach the ETag and Cache-Control headers to ``response``."""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
 
-    return True, ""
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    """Build an empty 304 response for a client that is already up to date."""
+    return _with_validators(app.response_class(status=304), etag, cache_control)
+
+
+def _is_admin() -> bool:
+    """Check the request's X-Admin-Token against ``ADMIN_TOKEN``."""
+    supplied = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+def _rendered_index() -> RenderedPage:
+    """
+    The cached index page, rendering it on first use.
+
+    Without ``INDEX_AUTO_RELOAD`` (or ``app.debug``) the page is never
+    re-checked, so a request costs no template or file system work.
+
+    Returns:
+        RenderedPage: Body, gzip variant and ETag of ``index.html``
+    """
+    page = _index_page["page"]
+    if page is not None and not (INDEX_AUTO_RELOAD or app.debug):
+        return page
+    asset_manifest.refresh()
+    key = (_template_mtime("index.html"), asset_manifest.version)
+    if page is not None and page.key == key:
+        return page
+
+    body = render_template("index.html").encode()
+    page = RenderedPage(
+        key, body, gzip.compress(body, compresslevel=9, mtime=0), _etag_for(body)
+    )
+    _index_page["page"] = page
+    return page
+
+
+def _template_mtime(name: str) -> Optional[int]:
+    try:
+        return os.stat(
+            os.path.join(app.root_path, app.template_folder, name)
+        ).st_mtime_ns
+    except OSError:
+        return None
+
+
+def asset_url(name: str) -> str:
+    """
+    URL of a static asset, using its hashed build when there is one.
+
+    Args:
+        name (str): File name inside ``static/``, e.g. ``styles.css``
+
+    Returns:
+        str: e.g. ``/static/dist/styles.3f9c0a1b2d.css``
+    """
+    return url_for("static", filename=asset_manifest.resolve(name))
+
+
+@app.context_processor
+def _template_helpers() -> Dict[str, Any]:
+    return {"asset_url": asset_url}
+
+
+@app.before_request
+def _start_timer() -> None:
+    g.timer = StageTimer()
+
+
+def _client_address() -> str:
+    """The client's IP, taken from X-Forwarded-For behind trusted proxies."""
+    if ADMISSION_PROXY_HOPS:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if len(hops) >= ADMISSION_PROXY_HOPS:
+            return hops[-ADMISSION_PROXY_HOPS]
+    return request.remote_addr or ""
+
+
+@app.before_request
+def _admit() -> Optional[Response]:
+    """Reject a /query request straight away when over a limit."""
+    if admission is None or not admission.enabled:
+        return None
+    if request.endpoint not in ADMISSION_ENDPOINTS:
+        return None
+    rejection = admission.admit(_client_address())
+    if rejection is not None:
+        response = jsonify({"error": rejection.message})
+        response.status_code = rejection.status
+        response.headers["Retry-After"] = str(rejection.retry_after)
+        return response
+    g.admitted = True
+    return None
+
+
+@app.after_request
+def _release_on_close(response: Response) -> Response:
+    """Hold the admission until the body is sent (streams included)."""
+    if g.pop("admitted", False):
+        response.call_on_close(admission.release)
+    return response
+
+
+@app.teardown_request
+def _release_admission(error: Optional[BaseException]) -> None:
+    """Release an admission whose request ended without a response."""
+    if g.pop("admitted", False):
+        admission.release()
+
+
+@app.after_request
+def _record_timing(response: Response) -> Response:
+    """Add the Server-Timing header and record the request's metrics."""
+    timer = g.get("timer")
+    if timer is None:
+        return response
+    total = timer.elapsed()
+    if SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = timer.server_timing(total)
+    if METRICS_ENABLED:
+        request_metrics.observe_request(
+            request.endpoint or "other", response.status_code, total, timer.stages
+        )
+    if startup.first_response is None and startup.record_first_response(total):
+        logger.info(f"First response (pid {os.getpid()}): {total * 1000:.1f}ms")
+    return response
 
 
 @app.route("/")
-def index() -> str:
+def index() -> Response:
     """
-    Render the main portfolio page.
+    Serve the main portfolio page from its pre-rendered bytes.
+
+    Clients accepting gzip get the precompressed variant (with a weak ETag);
+    clients revalidating with the current ETag get a 304.
 
     Returns:
-        str: Rendered HTML template
+        Response: HTML page
     """
-    return render_template("index.html")
+    page = _rendered_index()
+    gzipped = request.accept_encodings["gzip"] > 0
+    if _client_has(page.etag):
+        response = _not_modified(page.etag, INDEX_CACHE_CONTROL)
+    else:
+        body = page.gzipped if gzipped else page.body
+        response = app.response_class(body, mimetype="text/html")
+        _with_validators(response, page.etag, INDEX_CACHE_CONTROL)
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+    if gzipped:
+        response.set_etag(page.etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 @app.route("/query", methods=["POST"])
@@ -214,6 +809,8 @@ def query() -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: JSON response with query results or error
     """
+    timer = _request_timer()
+    ran_here = True  # False while waiting on another request's execution
     try:
         # Check content type
         if not request.is_json:
@@ -227,39 +824,112 @@ def query() -> Dict[str, Any]:
         sql = json_data.get("query", "").strip()
 
         # Validate the query
-        is_valid, error_message = validate_sql_query(sql)
+        with timer.stage("validate"):
+            is_valid, error_message = validate_sql_query(sql)
         if not is_valid:
             logger.warning(f"Invalid query attempted: {sql[:100]}...")
             return jsonify({"error": error_message}), 400
 
-        # Execute query safely
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row  # Enable column access by name
-            cursor = conn.cursor()
+        fmt = json_data.get("format") or request.args.get("format", ROWS)
+        if not isinstance(fmt, str) or fmt not in FORMATS:
+            formats = ", ".join(sorted(FORMATS))
+            return jsonify({"error": f"Unknown format. Use one of: {formats}"}), 400
 
-            # Set query timeout and limits
-            cursor.execute("PRAGMA query_timeout = 5000")  # 5 seconds
-            cursor.execute(sql)
+        query_key = _query_key(sql)
 
-            # Get column names
-            columns = (
-                [desc[0] for desc in cursor.description] if cursor.description else []
-            )
+        if _wants_stream(json_data):
+            if fmt != ROWS:
+                return jsonify({"error": "Only the rows format can be streamed"}), 400
+            stream = _stream_query(sql, query_key)
+            next(stream)  # Execute now so errors get a proper status code
+            return Response(stream, mimetype=NDJSON_MIMETYPE)
+
+        tokens = query_key[0] if query_key else canonical_query(sql)
+        cursor_scope = "query:" + query_digest(tokens)
+        cursor_token = json_data.get("cursor")
+        state = (
+            cursor_codec.decode(cursor_scope, cursor_token) if cursor_token else None
+        )
 
-            # Fetch results with limit
-            rows = cursor.fetchmany(1000)  # Limit to 1000 rows
+        cache_key = None
+        if result_cache.enabled and query_key:
+            cache_key = (query_key, fmt, cursor_token)
+        if cache_key is not None:
+            with timer.stage("cache"):
+                cached = result_cache.get(cache_key)
+            if cached is not None:
+                body, etag = cached
+                if _client_has(etag):
+                    return _not_modified(etag, QUERY_CACHE_CONTROL)
+                response = app.response_class(body, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+                return _with_validators(response, etag, QUERY_CACHE_CONTROL)
 
-            # Convert Row objects to regular tuples for JSON serialization
-            result_rows = [tuple(row) for row in rows]
+        def execute() -> Tuple[bytes, str]:
+            nonlocal ran_here
+            ran_here = True
+            # Execute query safely on a pooled read-only connection
+            with _checkout(timer) as conn, query_deadline.applied(conn):
+                with timer.stage("plan"):
+                    estimate = cost_guard.check(conn, sql, query_key)
 
-            logger.info(
-                f"Query executed successfully. Returned " f"{len(result_rows)} rows"
-            )
+                # Fetch one page of plain tuples and encode them without a copy
+                keyset = supports_keyset(
+                    tokens, _validator.allowed_tables, _keyset_tables(conn)
+                )
+                page = fetch_page(conn, sql, state, MAX_RESULTS, keyset, timer)
+
+            with timer.stage("encode"):
+                next_cursor = (
+                    cursor_codec.encode(cursor_scope, page.next_state)
+                    if page.next_state
+                    else None
+                )
+                body = encode_result(page.columns, page.rows, fmt, next_cursor)
+                etag = _etag_for(body)
+
+            logger.info(f"Query executed successfully. Returned {len(page.rows)} rows")
+            if slow_query_log is not None and slow_query_log.is_slow(timer.elapsed()):
+                _record_slow_query(sql, timer, len(page.rows), estimate, query_key)
+
+            if cache_key is not None:
+                result_cache.put(cache_key, (body, etag), len(body))
+            return body, etag
 
-            return jsonify(
-                {"columns": columns, "rows": result_rows, "row_count": len(result_rows)}
+        # Requests for the same page in the same state share one execution.
+        # Tokens keep their case: ``AS Foo`` and ``AS foo`` name different columns
+        ran_here = False
+        waited = time.perf_counter()
+        if query_flights is None:
+            (body, etag), shared = execute(), False
+        else:
+            (body, etag), shared = query_flights.do(
+                (query_key or tokens, fmt, cursor_token), execute
             )
+        if shared:
+            timer.add("coalesce", time.perf_counter() - waited)
 
+        if _client_has(etag):
+            return _not_modified(etag, QUERY_CACHE_CONTROL)
+
+        response = app.response_class(body, mimetype="application/json")
+        if cache_key is not None:
+            response.headers["X-Cache"] = "MISS"
+        return _with_validators(response, etag, QUERY_CACHE_CONTROL)
+
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueryTooExpensiveError as e:
+        logger.warning(f"Query rejected by plan guard: {sql[:100]}")
+        return jsonify({"error": str(e)}), 422
+    except QueryTimeoutError as e:
+        logger.warning(f"Query aborted: {str(e)}: {sql[:100]}")
+        if slow_query_log is not None and slow_query_log.enabled and ran_here:
+            _record_slow_query(sql, timer, None, error=str(e))
+        return jsonify({"error": str(e)}), 408
+    except PoolTimeoutError as e:
+        logger.warning(f"Database pool exhausted: {str(e)}")
+        return jsonify({"error": "Database busy, please retry"}), 503
     except sqlite3.Error as e:
         logger.error(f"Database error: {str(e)}")
         return jsonify({"error": "Database query failed"}), 500
@@ -268,6 +938,147 @@ def query() -> Dict[str, Any]:
         return jsonify({"error": "Internal server error"}), 500
 
 
+def _batch_error(status: int, message: str) -> bytes:
+    """Encoded per-query error entry of a batch response."""
+    return json.dumps(
+        {"error": message, "status": status}, separators=(",", ":"), sort_keys=True
+    ).encode()
+
+
+def _run_batch_query(
+    conn: sqlite3.Connection, sql: str, fmt: str, row_budget: int, timer: StageTimer
+) -> Tuple[bytes, int]:
+    """
+    Run one statement of a batch on the batch's connection.
+
+    Args:
+        conn (sqlite3.Connection): Connection holding the batch's transaction
+        sql (str): The statement, not yet validated
+        fmt (str): Result format
+        row_budget (int): Rows the batch may still return
+        timer (StageTimer): The request's stage timer
+
+    Returns:
+        Tuple[bytes, int]: Encoded result or error entry, and its row count
+    """
+    if not isinstance(sql, str):
+        return _batch_error(400, "Each query must be a string"), 0
+    sql = sql.strip()
+    with timer.stage("validate"):
+        is_valid, error_message = validate_sql_query(sql)
+    if not is_valid:
+        logger.warning(f"Invalid query attempted in batch: {sql[:100]}...")
+        return _batch_error(400, error_message), 0
+    if row_budget <= 0:
+        return (
+            _batch_error(
+                413, f"Batch row limit of {BATCH_MAX_ROWS} reached; run it on its own"
+            ),
+            0,
+        )
+
+    query_key = _query_key(sql)
+    tokens = query_key[0] if query_key else canonical_query(sql)
+    try:
+        # Each statement gets the full deadline, as it would on /query
+        with query_deadline.applied(conn):
+            with timer.stage("plan"):
+                cost_guard.check(conn, sql, query_key)
+            keyset = supports_keyset(
+                tokens, _validator.allowed_tables, _keyset_tables(conn)
+            )
+            page = fetch_page(
+                conn, sql, None, min(MAX_RESULTS, row_budget), keyset, timer
+            )
+    except QueryTooExpensiveError as e:
+        logger.warning(f"Query rejected by plan guard in batch: {sql[:100]}")
+        return _batch_error(422, str(e)), 0
+    except QueryTimeoutError as e:
+        logger.warning(f"Batch query aborted: {str(e)}: {sql[:100]}")
+        return _batch_error(408, str(e)), 0
+    except sqlite3.Error as e:
+        logger.error(f"Database error in batch: {str(e)}")
+        return _batch_error(500, "Database query failed"), 0
+
+    with timer.stage("encode"):
+        next_cursor = None
+        if page.next_state:
+            # Continue this statement on /query
+            scope = "query:" + query_digest(tokens)
+            next_cursor = cursor_codec.encode(scope, page.next_state)
+        body = encode_result(page.columns, page.rows, fmt, next_cursor)
+    return body.rstrip(b"\n"), len(page.rows)
+
+
+@app.route("/query/batch", methods=["POST"])
+def query_batch() -> Response:
+    """
+    Run several queries in one request, on one connection and snapshot.
+
+    Body: ``{"queries": ["SELECT ...", ...], "format": "rows"}``. Each query
+    is validated and planned like on ``/query`` and returns its first page;
+    a query that fails gets an ``{"error", "status"}`` entry in its place
+    and the others still run. All of them read inside one transaction, so
+    they see the same database state. At most ``BATCH_MAX_QUERIES`` queries
+    and ``BATCH_MAX_ROWS`` rows in total are returned; a result cut short
+    carries a ``next_cursor`` for ``/query``.
+
+    Returns:
+        Response: ``{"results": [...], "row_count": total}`` in query order
+    """
+    timer = _request_timer()
+    if not request.is_json:
+        return jsonify({"error": "Content-Type must be application/json"}), 400
+    json_data = request.get_json(silent=True)
+    queries = json_data.get("queries") if isinstance(json_data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return (
+            jsonify({"error": "queries must be a non-empty list of SQL strings"}),
+            400,
+        )
+    if len(queries) > BATCH_MAX_QUERIES:
+        return (
+            jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch"}),
+            400,
+        )
+    fmt = json_data.get("format") or request.args.get("format", ROWS)
+    if not isinstance(fmt, str) or fmt not in FORMATS:
+        formats = ", ".join(sorted(FORMATS))
+        return jsonify({"error": f"Unknown format. Use one of: {formats}"}), 400
+
+    results: List[bytes] = []
+    total_rows = 0
+    try:
+        with _checkout(timer) as conn:
+            # One read transaction: every statement sees the same snapshot
+            conn.execute("BEGIN")
+            try:
+                for sql in queries:
+                    body, row_count = _run_batch_query(
+                        conn, sql, fmt, BATCH_MAX_ROWS - total_rows, timer
+                    )
+                    results.append(body)
+                    total_rows += row_count
+            finally:
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+    except PoolTimeoutError as e:
+        logger.warning(f"Database pool exhausted: {str(e)}")
+        return jsonify({"error": "Database busy, please retry"}), 503
+    except sqlite3.Error as e:
+        logger.error(f"Database error in batch: {str(e)}")
+        return jsonify({"error": "Database query failed"}), 500
+    except Exception as e:
+        logger.error(f"Unexpected error in batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+    logger.info(f"Batch of {len(queries)} queries returned {total_rows} rows")
+    body = b'{"results":[%s],"row_count":%d}\n' % (b",".join(results), total_rows)
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["Cache-Control"] = QUERY_CACHE_CONTROL
+    return response
+
+
 @app.route("/health", methods=["GET"])
 def health_check() -> Dict[str, str]:
     """
@@ -279,25 +1090,122 @@ def health_check() -> Dict[str, str]:
     return jsonify({"status": "healthy", "message": "Portfolio app is running"})
 
 
+@app.route("/static/dist/<path:filename>", methods=["GET"])
+def hashed_asset(filename: str) -> Response:
+    """
+    Serve a built asset, precompressed if the client accepts it.
+
+    A hashed name always has the same content, so the response may be cached
+    for ``STATIC_ASSET_MAX_AGE`` without revalidation.
+
+    Args:
+        filename (str): Hashed file name inside ``static/dist``
+
+    Returns:
+        Response: The brotli, gzip or plain file
+    """
+    if filename.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+        abort(404)
+    name, encoding = select_variant(ASSET_DIR, filename, dict(request.accept_encodings))
+    response = send_from_directory(
+        ASSET_DIR,
+        name,
+        mimetype=mimetype_for(filename),
+        max_age=STATIC_ASSET_MAX_AGE,
+    )
+    # send_file names every file it sends; assets are shown inline, not saved
+    response.headers.pop("Content-Disposition", None)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route("/static/sw.js", methods=["GET"])
+def service_worker() -> Response:
+    """
+    Serve the service worker, preferring the copy that caches hashed assets.
+
+    Its URL never changes, so browsers must revalidate it on every check.
+
+    Returns:
+        Response: JavaScript with ``Cache-Control: no-cache``
+    """
+    directory = ASSET_DIR
+    if not os.path.isfile(os.path.join(ASSET_DIR, SERVICE_WORKER)):
+        directory = app.static_folder
+    response = send_from_directory(
+        directory, SERVICE_WORKER, mimetype="text/javascript", max_age=0
+    )
+    response.cache_control.no_cache = True
+    return response
+
+
 @app.route("/projects", methods=["GET"])
 def projects() -> Dict[str, Any]:
     """
-    Get all projects from the database.
+    Get a page of projects from the database, in id order.
+
+    Pass the previous response's ``next_cursor`` as ``?cursor=`` to get the
+    next page.
 
     Returns:
         Dict[str, Any]: JSON response with projects data or error
     """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
+        cursor_token = request.args.get("cursor")
+
+        # The page only changes with the database file, the cursor or page size
+        fingerprint = _database_state()
+        etag = None
+        if fingerprint is not None:
+            etag = _etag_for(repr((fingerprint, cursor_token, MAX_RESULTS)).encode())
+            if _client_has(etag):
+                return _not_modified(etag, PROJECTS_CACHE_CONTROL)
+
+        after = None
+        if cursor_token:
+            after = cursor_codec.decode("projects", cursor_token).get("a")
+
+        timer = _request_timer()
+        with _checkout(timer) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM projects LIMIT 100")
+            with timer.stage("execute"):
+                if after is None:
+                    cursor.execute(
+                        "SELECT * FROM projects ORDER BY id LIMIT ?",
+                        (MAX_RESULTS + 1,),
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT * FROM projects WHERE id > ? ORDER BY id LIMIT ?",
+                        (after, MAX_RESULTS + 1),
+                    )
 
             # Convert rows to list of dictionaries
-            projects_list = [dict(row) for row in cursor.fetchall()]
+            with timer.stage("fetch"):
+                projects_list = [dict(row) for row in cursor.fetchall()]
 
-            return jsonify({"projects": projects_list})
+        next_cursor = None
+        if len(projects_list) > MAX_RESULTS:
+            projects_list = projects_list[:MAX_RESULTS]
+            next_cursor = cursor_codec.encode(
+                "projects", {"a": projects_list[-1]["id"]}
+            )
 
+        with timer.stage("encode"):
+            response = jsonify({"projects": projects_list, "next_cursor": next_cursor})
+        if etag is not None:
+            _with_validators(response, etag, PROJECTS_CACHE_CONTROL)
+        return response
+
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
+    except PoolTimeoutError as e:
+        logger.warning(f"Database pool exhausted in projects endpoint: {str(e)}")
+        return jsonify({"error": "Database busy, please retry"}), 503
     except sqlite3.Error as e:
         logger.error(f"Database error in projects endpoint: {str(e)}")
         return jsonify({"error": "Failed to fetch projects"}), 500
@@ -306,6 +1214,287 @@ def projects() -> Dict[str, Any]:
         return jsonify({"error": "Internal server error"}), 500
 
 
+# A /metrics series: (name, type, help, value)
+MetricSeries = Tuple[str, str, str, float]
+
+# Extra per-worker series for /metrics from the serving layer (see asgi.py)
+worker_metric_sources: List[Callable[[], Iterable[MetricSeries]]] = []
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics() -> Response:
+    """
+    Request counters and latency histograms in Prometheus text format.
+
+    Request and admission totals cover every worker forked from the same
+    master; series labelled with a ``pid`` are the answering worker's own.
+
+    Returns:
+        Response: Exposition text
+    """
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Endpoint not found"}), 404
+    return app.response_class(
+        request_metrics.render() + _admission_metrics() + _worker_metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _worker_metrics() -> str:
+    """
+    This worker's connection pool, statement deadline, query cost guard,
+    validation and result cache and (when enabled) query coalescing counters
+    in Prometheus text format, plus any ``worker_metric_sources``.
+
+    They are per process, so each series carries the answering worker's
+    ``pid`` label; scrape repeatedly (or sum by pid) to cover every worker.
+    """
+    pool = db_pool.stats()
+    deadline = query_deadline.stats()
+    guard = cost_guard.stats()
+    cache = result_cache.stats()
+    verdicts = validation_cache_stats()
+    series = [
+        ("db_pool_size", "gauge", "Connections the pool may open.", pool["size"]),
+        ("db_pool_open", "gauge", "Connections currently open.", pool["open"]),
+        ("db_pool_idle", "gauge", "Open connections not checked out.", pool["idle"]),
+        (
+            "db_pool_checkouts_total",
+            "counter",
+            "Connections checked out.",
+            pool["checkouts"],
+        ),
+        (
+            "db_pool_timeouts_total",
+            "counter",
+            "Checkouts that gave up waiting for a connection.",
+            pool["timeouts"],
+        ),
+        (
+            "db_pool_recycled_total",
+            "counter",
+            "Connections closed for age or ill health.",
+            pool["recycled"],
+        ),
+        (
+            "db_pool_wait_seconds_avg",
+            "gauge",
+            "Mean time a checkout waited for a connection.",
+            pool["wait_avg_ms"] / 1000,
+        ),
+        (
+            "db_pool_wait_seconds_max",
+            "gauge",
+            "Longest time a checkout waited for a connection.",
+            pool["wait_max_ms"] / 1000,
+        ),
+        (
+            "query_deadline_seconds",
+            "gauge",
+            "Execution budget per statement (0 when disabled).",
+            deadline["budget_s"],
+        ),
+        (
+            "query_deadline_aborted_total",
+            "counter",
+            "Statements interrupted for exceeding the deadline.",
+            deadline["aborted"],
+        ),
+        (
+            "query_cost_limit",
+            "gauge",
+            "Highest accepted estimated query cost (0 when disabled).",
+            guard["max_cost"],
+        ),
+        (
+            "query_cost_rejected_total",
+            "counter",
+            "Queries refused for their estimated cost.",
+            guard["rejected"],
+        ),
+        (
+            "validation_cache_hits_total",
+            "counter",
+            "Query validations answered from the verdict cache.",
+            verdicts["hits"],
+        ),
+        (
+            "validation_cache_misses_total",
+            "counter",
+            "Query validations that ran the validator.",
+            verdicts["misses"],
+        ),
+        (
+            "result_cache_hits_total",
+            "counter",
+            "/query lookups answered from the result cache.",
+            cache["hits"],
+        ),
+        (
+            "result_cache_misses_total",
+            "counter",
+            "/query lookups that missed the result cache.",
+            cache["misses"],
+        ),
+        (
+            "result_cache_evictions_total",
+            "counter",
+            "Results evicted to stay within the cache bounds.",
+            cache["evictions"],
+        ),
+        (
+            "result_cache_bytes",
+            "gauge",
+            "Bytes of encoded results held in the cache.",
+            cache["bytes"],
+        ),
+    ]
+    flights = coalescing_stats()
+    if flights["enabled"]:
+        series += [
+            (
+                "query_coalesce_executions_total",
+                "counter",
+                "/query executions run by a flight leader.",
+                flights["executions"],
+            ),
+            (
+                "query_coalesce_saved_total",
+                "counter",
+                "/query executions avoided by sharing a leader's result.",
+                flights["saved"],
+            ),
+            (
+                "query_coalesce_timeouts_total",
+                "counter",
+                "Followers that gave up waiting and ran the query themselves.",
+                flights["timeouts"],
+            ),
+        ]
+    for source in worker_metric_sources:
+        series += source()
+    return _render_series(series, f'pid="{os.getpid()}"')
+
+
+def _admission_metrics() -> str:
+    """
+    /query admission totals of every worker in Prometheus text format.
+
+    The counters live in memory shared by all workers, so the series carry
+    no ``pid`` label. Empty when admission control is off.
+    """
+    stats = admission_stats()
+    if not stats["enabled"]:
+        return ""
+    return _render_series(
+        (
+            (
+                "admission_admitted_total",
+                "counter",
+                "/query requests admitted.",
+                stats["admitted"],
+            ),
+            (
+                "admission_throttled_total",
+                "counter",
+                "/query requests refused with 429 by the per-client rate limit.",
+                stats["throttled"],
+            ),
+            (
+                "admission_shed_total",
+                "counter",
+                "/query requests refused with 503 at the concurrency limit.",
+                stats["shed"],
+            ),
+        )
+    )
+
+
+def _render_series(series: Iterable[MetricSeries], label: str = "") -> str:
+    """Format ``(name, type, help, value)`` tuples as Prometheus text."""
+    labels = f"{{{label}}}" if label else ""
+    lines = []
+    for name, kind, description, value in series:
+        lines += [
+            f"# HELP portfolio_{name} {description}",
+            f"# TYPE portfolio_{name} {kind}",
+            f"portfolio_{name}{labels} {value:g}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+@app.route("/admin/slow-queries", methods=["GET"])
+def slow_queries() -> Dict[str, Any]:
+    """
+    List the slowest /query statements recorded by the worker that answers.
+
+    Each worker keeps its own log, so with several workers one response
+    covers only part of the traffic; the body's ``scope`` and ``pid`` (and
+    the ``X-Worker-Pid`` header) say which worker it came from.
+
+    Query parameters: ``limit`` (default 10) and ``sort`` (``total``,
+    ``max`` or ``count``). Requires the X-Admin-Token header.
+
+    Returns:
+        Dict[str, Any]: Log settings, top offenders and the latest entries
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    from slow_queries import SORT_KEYS
+
+    sort = request.args.get("sort", "total")
+    if sort not in SORT_KEYS:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORT_KEYS)}"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    if slow_query_log is None:
+        body = {"enabled": False, "scope": "worker", "pid": os.getpid()}
+        response = jsonify({**body, "offenders": [], "recent": []})
+    else:
+        response = jsonify(
+            {
+                **slow_query_log.stats(),
+                "offenders": slow_query_log.top(limit, sort),
+                "recent": slow_query_log.recent(limit),
+            }
+        )
+    response.headers["X-Worker-Pid"] = str(os.getpid())
+    return response
+
+
+@app.route("/admin/replica/reload", methods=["POST"])
+def reload_replica() -> Dict[str, Any]:
+    """
+    Rebuild this worker's in-memory replica if ``portfolio.db`` changed.
+
+    Pass ``?force=true`` to rebuild regardless. Under gunicorn, send SIGHUP
+    to the master instead: every re-forked worker builds a fresh replica.
+
+    Returns:
+        Dict[str, Any]: Whether a rebuild happened, plus replica stats
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    if replica is None:
+        return jsonify({"error": "In-memory replica is not enabled"}), 409
+
+    force = request.args.get("force", "").lower() == "true"
+    try:
+        reloaded = replica.refresh(force=force)
+    except sqlite3.Error as e:
+        logger.error(f"Replica rebuild failed: {str(e)}")
+        return jsonify({"error": "Replica rebuild failed"}), 500
+    return jsonify({"reloaded": reloaded, **replica.stats()})
+
+
 @app.errorhandler(404)
 def not_found(error) -> Tuple[Dict[str, str], int]:
     """Handle 404 errors."""
@@ -318,6 +1507,9 @@ def method_not_allowed(error) -> Tuple[Dict[str, str], int]:
     return jsonify({"error": "Method not allowed"}), 405
 
 
+startup.mark("app")
+
+
 if __name__ == "__main__":
     # Get configuration values
     debug = getattr(app_config, "DEBUG", False)
@@ -329,4 +1521,5 @@ if __name__ == "__main__":
     host = os.environ.get("HOST", host)
     port = int(os.environ.get("PORT", port))
 
+    open_worker_resources()
     app.run(debug=debug, host=host, port=port)
@@ -0,0 +1,310 @@
+"""
+ASGI Entry Point
+
+Serves the Flask app from an ASGI server (``uvicorn asgi:application``, see
+``asgi_start.py``). The event loop only moves bytes; each request runs the
+WSGI app on a thread pool. Database routes get their own bounded pool, sized
+to the connection pool, so slow queries queue behind each other instead of
+holding up ``/health``, the index page or static files.
+
+When a lane's pool and backlog are both full, new requests on that lane get
+an immediate 503 rather than waiting in an unbounded queue.
+"""
+
+import asyncio
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app import (
+    MetricSeries,
+    app,
+    app_config,
+    close_worker_resources,
+    db_pool,
+    open_worker_resources,
+    worker_metric_sources,
+)
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+# Path prefixes whose handlers run SQLite work
+DB_ROUTES = ("/query", "/projects", "/admin")
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class ClientDisconnected(Exception):
+    """The client went away before sending its whole request body."""
+
+
+class _Lane:
+    """A thread pool plus a cap on requests running or queued on it."""
+
+    def __init__(self, name: str, workers: int, backlog: int) -> None:
+        self.name = name
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, int(workers)), thread_name_prefix=f"asgi-{name}"
+        )
+        self.limit = max(1, int(workers)) + max(0, int(backlog))
+        self.in_flight = 0
+        self.rejected = 0
+
+
+class WSGIBridge:
+    """
+    ASGI application that runs a WSGI app on per-lane thread pools.
+
+    Args:
+        wsgi_app (Callable): The WSGI application
+        db_workers (int): Threads for database routes (``DB_ROUTES``)
+        web_workers (int): Threads for every other route
+        backlog (int): Requests allowed to wait per lane before 503s
+    """
+
+    def __init__(
+        self,
+        wsgi_app: Callable,
+        db_workers: int = 4,
+        web_workers: int = 4,
+        backlog: int = 64,
+    ) -> None:
+        self.wsgi_app = wsgi_app
+        self.db_lane = _Lane("db", db_workers, backlog)
+        self.web_lane = _Lane("web", web_workers, backlog)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                open_worker_resources()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self) -> None:
+        """Stop both thread pools and release this process's database resources."""
+        for lane in (self.db_lane, self.web_lane):
+            lane.executor.shutdown(wait=False)
+        close_worker_resources()
+
+    def lane_for(self, path: str) -> _Lane:
+        """Pick the thread pool that serves ``path``."""
+        for prefix in DB_ROUTES:
+            if path == prefix or path.startswith(prefix + "/"):
+                return self.db_lane
+        return self.web_lane
+
+    async def _http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            body = await self._read_body(receive)
+        except ClientDisconnected:
+            # A truncated body must never reach the app; nobody is left to answer
+            return
+        if body is None:
+            await _send_error(send, 413, "Request body too large")
+            return
+
+        lane = self.lane_for(scope["path"])
+        if lane.in_flight >= lane.limit:
+            lane.rejected += 1
+            await _send_error(send, 503, "Server busy, please retry", retry_after=1)
+            return
+
+        lane.in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            environ = build_environ(scope, body)
+            await loop.run_in_executor(lane.executor, self._run, environ, send, loop)
+        finally:
+            lane.in_flight -= 1
+
+    async def _read_body(self, receive: Receive) -> Optional[bytes]:
+        """
+        Read the complete request body.
+
+        Returns:
+            Optional[bytes]: The body, or None if it exceeds ``MAX_BODY_BYTES``
+
+        Raises:
+            ClientDisconnected: If the client disconnects before the end
+        """
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnected()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    def _run(
+        self,
+        environ: Dict[str, Any],
+        send: Send,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        """Call the WSGI app on a pool thread and relay its response."""
+
+        def relay(message: Message) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response: Dict[str, Any] = {}
+
+        def start_response(
+            status: str,
+            headers: List[Tuple[str, str]],
+            exc_info: Optional[Any] = None,
+        ) -> Callable[[bytes], None]:
+            if exc_info and response.get("started"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+            return relay_body
+
+        def relay_body(data: bytes, more: bool = True) -> None:
+            if not response.get("started"):
+                response["started"] = True
+                relay(
+                    {
+                        "type": "http.response.start",
+                        "status": response["status"],
+                        "headers": response["headers"],
+                    }
+                )
+            if data or not more:
+                relay({"type": "http.response.body", "body": data, "more_body": more})
+
+        result: Iterable[bytes] = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    relay_body(chunk)
+            relay_body(b"", more=False)
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        In-flight and rejected request counts per lane.
+
+        Returns:
+            Dict[str, Any]: ``db`` and ``web`` lane counters
+        """
+        return {
+            lane.name: {
+                "limit": lane.limit,
+                "in_flight": lane.in_flight,
+                "rejected": lane.rejected,
+            }
+            for lane in (self.db_lane, self.web_lane)
+        }
+
+    def metric_series(self) -> List[MetricSeries]:
+        """Per-lane rejection counters for this worker's ``/metrics``."""
+        return [
+            (
+                f"asgi_{lane.name}_lane_rejected_total",
+                "counter",
+                f"Requests refused with 503 while the {lane.name} lane was full.",
+                lane.rejected,
+            )
+            for lane in (self.db_lane, self.web_lane)
+        ]
+
+
+def build_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    """
+    Translate an ASGI HTTP scope into a PEP 3333 WSGI environ.
+
+    Args:
+        scope (Scope): ASGI connection scope
+        body (bytes): The complete request body
+
+    Returns:
+        Dict[str, Any]: WSGI environ
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = "HTTP_" + name
+        if key in environ:
+            # RFC 6265: cookie pairs are separated by "; ", other fields by ","
+            separator = "; " if key == "HTTP_COOKIE" else ","
+            value = environ[key] + separator + value
+        environ[key] = value
+    return environ
+
+
+async def _send_error(
+    send: Send, status: int, message: str, retry_after: Optional[int] = None
+) -> None:
+    """Send a JSON error response without touching the WSGI app."""
+    body = (json.dumps({"error": message}) + "\n").encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+application = WSGIBridge(
+    app,
+    db_workers=getattr(app_config, "ASGI_DB_WORKERS", 0) or db_pool.size,
+    web_workers=getattr(app_config, "ASGI_WEB_WORKERS", 4),
+    backlog=getattr(app_config, "ASGI_BACKLOG", 64),
+)
+worker_metric_sources.append(application.metric_series)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+ASGI startup script
+Serves the app with uvicorn through asgi.py, so slow queries run on their
+own thread pool and never block /health or the index page
+"""
+
+import os
+import sys
+
+from startup import mark_launch
+
+
+def main():
+    # Startup timing (logged with the first response) starts here
+    mark_launch()
+    port = int(os.environ.get("PORT", "5000"))
+    host = os.environ.get("HOST", "0.0.0.0")
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is not installed; run: pip install uvicorn")
+        print("Or start the WSGI server instead: python3 start.py")
+        sys.exit(1)
+
+    print(f"Starting ASGI server on {host}:{port} with {workers} worker(s)")
+    uvicorn.run(
+        "asgi:application",
+        host=host,
+        port=port,
+        workers=workers,
+        lifespan="on",
+        log_level=os.environ.get("LOG_LEVEL", "info").lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Static Asset Pipeline
+
+Build step that copies the site's CSS and JavaScript into ``static/dist``
+under content-hashed names (``styles.3f9c0a1b2d.css``), next to gzip and
+brotli variants, and writes ``static/dist/assets.json`` mapping each source
+name to its hashed path. Templates resolve names through the manifest, so a
+changed file gets a new URL and every asset can be cached as immutable.
+
+The service worker keeps its fixed URL. Its built copy caches the hashed
+URLs under a cache name derived from the build, so it no longer needs a
+manual version bump.
+
+Without a build (e.g. during development) the manifest is empty and the
+original files are served from ``static/`` as before.
+
+Run with:
+    python assets.py            # build into static/dist
+"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = "dist"
+MANIFEST_NAME = "assets.json"
+SERVICE_WORKER = "sw.js"
+
+# Files that get hashed names; the service worker and PWA manifest keep theirs
+ASSET_FILES = ("styles.css", "script.js", "analytics.js")
+
+# Precompressed variants in order of preference: (content coding, suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_CACHE_NAME_PATTERN = re.compile(r"(const CACHE_NAME = ')[^']*(')")
+
+
+def content_hash(data: bytes, length: int = 10) -> str:
+    """Short hex digest used in hashed file names."""
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    """
+    Insert the content hash before the extension.
+
+    Args:
+        name (str): Source file name, e.g. ``styles.css``
+        data (bytes): File contents
+
+    Returns:
+        str: e.g. ``styles.3f9c0a1b2d.css``
+    """
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def _write(path: str, data: bytes) -> None:
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _brotli() -> Optional[Any]:
+    """The optional brotli module, imported only when building."""
+    try:
+        import brotli
+    except ImportError:  # optional: only gzip variants are built
+        return None
+    return brotli
+
+
+def _variants(data: bytes, gzip_level: int, brotli_quality: int) -> Dict[str, bytes]:
+    """Compressed copies of ``data`` that are smaller than it, by suffix."""
+    import gzip
+
+    variants = {".gz": gzip.compress(data, compresslevel=gzip_level, mtime=0)}
+    brotli = _brotli()
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=brotli_quality)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data)}
+
+
+def build_assets(
+    static_dir: str = STATIC_DIR,
+    files: Sequence[str] = ASSET_FILES,
+    gzip_level: int = 9,
+    brotli_quality: int = 11,
+) -> Dict[str, str]:
+    """
+    Write hashed and precompressed copies of ``files`` and the manifest.
+
+    Files left in ``dist`` by earlier builds are removed.
+
+    Args:
+        static_dir (str): Directory holding the source files
+        files (Sequence[str]): Names of the files to process
+        gzip_level (int): gzip compression level (1-9)
+        brotli_quality (int): brotli quality (0-11), if brotli is installed
+
+    Returns:
+        Dict[str, str]: Manifest, source name to path relative to static_dir
+    """
+    dist = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+
+    manifest: Dict[str, str] = {}
+    written = {MANIFEST_NAME}
+    for name in files:
+        with open(os.path.join(static_dir, name), "rb") as f:
+            data = f.read()
+        target = hashed_name(name, data)
+        _write(os.path.join(dist, target), data)
+        written.add(target)
+        for suffix, body in _variants(data, gzip_level, brotli_quality).items():
+            _write(os.path.join(dist, target + suffix), body)
+            written.add(target + suffix)
+        manifest[name] = f"{DIST_DIR}/{target}"
+
+    worker_source = os.path.join(static_dir, SERVICE_WORKER)
+    if os.path.exists(worker_source):
+        with open(worker_source) as f:
+            worker = f.read()
+        build = content_hash("\n".join(sorted(manifest.values())).encode())
+        worker = _CACHE_NAME_PATTERN.sub(rf"\g<1>sql-portfolio-{build}\g<2>", worker)
+        for name, path in manifest.items():
+            worker = worker.replace(f"'/static/{name}'", f"'/static/{path}'")
+        _write(os.path.join(dist, SERVICE_WORKER), worker.encode())
+        written.add(SERVICE_WORKER)
+
+    _write(
+        os.path.join(dist, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode(),
+    )
+    for leftover in set(os.listdir(dist)) - written:
+        path = os.path.join(dist, leftover)
+        if os.path.isfile(path):
+            os.remove(path)
+    return manifest
+
+
+class AssetManifest:
+    """
+    Source name to hashed path lookups for templates.
+
+    Args:
+        static_dir (str): Directory whose ``dist/assets.json`` is read
+        auto_reload (bool): Re-read the manifest when the file changes
+            (for debug mode, where assets may be rebuilt while running)
+    """
+
+    def __init__(self, static_dir: str = STATIC_DIR, auto_reload: bool = False) -> None:
+        self.path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+        self.auto_reload = auto_reload
+        self._files: Dict[str, str] = {}
+        self._mtime: Optional[int] = None
+        self.load()
+
+    def load(self) -> None:
+        """Read the manifest; a missing or unreadable one maps nothing."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path) as f:
+                files = json.load(f)
+        except (OSError, ValueError):
+            self._files, self._mtime = {}, None
+            return
+        self._files, self._mtime = files, mtime
+
+    def refresh(self) -> None:
+        """Re-read the manifest if ``auto_reload`` is on and the file changed."""
+        if not self.auto_reload:
+            return
+        try:
+            mtime: Optional[int] = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.load()
+
+    @property
+    def version(self) -> Optional[int]:
+        """Modification time of the loaded manifest, None if there is none."""
+        return self._mtime
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def resolve(self, name: str) -> str:
+        """
+        Path of the built copy of ``name``, relative to the static folder.
+
+        Args:
+            name (str): Source file name, e.g. ``styles.css``
+
+        Returns:
+            str: e.g. ``dist/styles.3f9c0a1b2d.css``, or ``name`` if unbuilt
+        """
+        self.refresh()
+        return self._files.get(name, name)
+
+
+def select_variant(
+    directory: str, filename: str, accepts: Dict[str, float]
+) -> Tuple[str, Optional[str]]:
+    """
+    Pick the precompressed variant of ``filename`` the client accepts.
+
+    Args:
+        directory (str): Directory holding the file and its variants
+        filename (str): Requested file name
+        accepts (Dict[str, float]): Content coding to quality from
+            ``Accept-Encoding`` (``*`` applies to codings not listed)
+
+    Returns:
+        Tuple[str, Optional[str]]: File name to send and its content coding
+        (None for the file itself)
+    """
+    for encoding, suffix in ENCODINGS:
+        quality = accepts.get(encoding, accepts.get("*", 0))
+        if quality > 0 and os.path.isfile(os.path.join(directory, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+
+def mimetype_for(filename: str) -> str:
+    """Content type of the uncompressed file."""
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    manifest = build_assets()
+    for name, path in sorted(manifest.items()):
+        logger.info(f"{name} -> static/{path}")
+    if _brotli() is None:
+        logger.info("brotli is not installed; only gzip variants were written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the Portfolio application hot paths
+
+Run with: python benchmarks.py [validator] [encoder] [pipeline] [serving]
+                                [cold_start] [--json FILE]
+
+``--json`` writes every measured number to FILE (``-`` for stdout) so runs
+can be tracked over time. The serving and cold-start benchmarks start real
+servers on local ports, so they only run when named explicitly.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import re
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Tuple
+
+from flask import jsonify
+
+from app import (
+    ALLOWED_TABLES,
+    BLOCKED_KEYWORDS,
+    DB_PATH,
+    MAX_QUERY_LENGTH,
+    MAX_RESULTS,
+    app,
+    db_pool,
+    validate_sql_query,
+)
+from loadtest import free_port, percentile, wait_ready
+from result_encoder import encode_columnar, encode_rows, fetch_tuples
+from sql_validator import SQLValidator
+
+# Representative /query traffic: the query builder's examples plus rejects
+VALIDATOR_CORPUS = [
+    "SELECT * FROM projects;",
+    "SELECT name FROM skills WHERE category = 'Programming';",
+    "SELECT degree, institution FROM education;",
+    "SELECT job_title, company FROM experience WHERE start_year > 2020;",
+    "SELECT name, description FROM projects;",
+    "SELECT name, email FROM clients WHERE age > 25;",
+    "SELECT p.name, s.name FROM projects p JOIN skills s ON p.id = s.id",
+    "SELECT * FROM projects WHERE id = 1; DROP TABLE projects; --",
+    "SELECT * FROM projects WHERE name = 'test' OR '1'='1'",
+    "SELECT * FROM projects WHERE id = 1 UNION SELECT * FROM sqlite_master",
+    "SHOW TABLES",
+]
+
+
+# Every number printed, by section, for --json
+RESULTS: Dict[str, Dict[str, float]] = {}
+
+
+def record(section: str, metric: str, value: float) -> None:
+    """Keep a measurement for the machine-readable report."""
+    RESULTS.setdefault(section, {})[metric] = round(value, 4)
+
+
+# Columns of the allowed tables, for generating valid queries
+_TABLE_COLUMNS = {
+    "projects": ["id", "name", "description", "repo_url"],
+    "skills": ["id", "name", "category"],
+    "education": ["id", "degree", "institution", "start_year", "end_year"],
+    "experience": ["id", "job_title", "company", "start_year", "end_year"],
+    "clients": ["id", "name", "age", "email", "phone"],
+}
+
+_MALICIOUS_TEMPLATES = [
+    "SELECT * FROM {table} WHERE id = {n}; DROP TABLE {table}; --",
+    "SELECT * FROM {table} WHERE name = 'x' OR '1'='1'",
+    "SELECT * FROM {table} WHERE id = {n} OR 1=1",
+    "SELECT * FROM {table} WHERE id = {n} UNION SELECT * FROM sqlite_master",
+    "SELECT * FROM {table} /* hidden */ WHERE id = {n}",
+    "SELECT * FROM {table} -- trailing comment",
+    "DELETE FROM {table} WHERE id = {n}",
+    "UPDATE {table} SET id = {n}",
+    "INSERT INTO {table} (id) VALUES ({n})",
+    "SELECT * FROM users WHERE id = {n}",
+    "PRAGMA table_info({table})",
+    "ATTACH DATABASE 'x.db' AS x",
+    "SELECT sql FROM sqlite_master WHERE name = '{table}'",
+]
+
+
+def generate_corpus(count: int = 3000, seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Generate ``/query`` inputs: 60% valid, 30% malicious, 10% oversized.
+
+    Args:
+        count (int): Number of queries
+        seed (int): Random seed, so runs are comparable
+
+    Returns:
+        List[Tuple[str, str]]: (kind, sql) pairs; kind is ``valid``,
+        ``malicious`` or ``oversized``
+    """
+    rng = random.Random(seed)
+    tables = sorted(_TABLE_COLUMNS)
+    corpus = []
+    for i in range(count):
+        table = rng.choice(tables)
+        columns = _TABLE_COLUMNS[table]
+        roll = rng.random()
+        if roll < 0.6:
+            picked = rng.sample(columns, rng.randint(1, len(columns)))
+            sql = f"SELECT {', '.join(picked)} FROM {table}"
+            shape = rng.randrange(4)
+            if shape == 1:
+                sql += f" WHERE id > {rng.randint(0, 10)}"
+            elif shape == 2:
+                sql += f" ORDER BY {rng.choice(columns)} LIMIT {rng.randint(1, 20)}"
+            elif shape == 3:
+                sql = f"SELECT COUNT(*), MAX(id) FROM {table} WHERE id <= {i}"
+            corpus.append(("valid", sql + rng.choice(["", ";"])))
+        elif roll < 0.9:
+            template = rng.choice(_MALICIOUS_TEMPLATES)
+            corpus.append(("malicious", template.format(table=table, n=i)))
+        else:
+            padding = " AND id > 0" * (MAX_QUERY_LENGTH // 10)
+            corpus.append(
+                ("oversized", f"SELECT * FROM {table} WHERE id > {i}{padding}")
+            )
+    return corpus
+
+
+def _legacy_validate_sql_query(query: str) -> Tuple[bool, str]:
+    """Per-keyword regex validator that predates sql_validator (for comparison)."""
+    if not query or not query.strip():
+        return False, "Query cannot be empty"
+    if len(query) > MAX_QUERY_LENGTH:
+        return (
+            False,
+            f"Query too long. Maximum {MAX_QUERY_LENGTH} characters allowed",
+        )
+    query_upper = query.upper()
+    for keyword in BLOCKED_KEYWORDS:
+        pattern = r"\b" + re.escape(keyword) + r"\b"
+        if re.search(pattern, query_upper):
+            return False, f"Operation '{keyword}' is not allowed"
+    for pattern in (r"'.*'.*=.*'.*'", r"1\s*=\s*1", r"0\s*=\s*0", r"true\s*=\s*true"):
+        if re.search(pattern, query_upper):
+            return False, "Suspicious SQL pattern detected"
+    if not query_upper.strip().startswith("SELECT"):
+        return False, "Only SELECT queries are allowed"
+    if query.count(";") > 1 or (
+        query.count(";") == 1 and not query.strip().endswith(";")
+    ):
+        return False, "Multiple statements are not allowed"
+    if not any(table.upper() in query_upper for table in ALLOWED_TABLES):
+        return (
+            False,
+            f"Query must reference at least one allowed table: "
+            f"{', '.join(ALLOWED_TABLES)}",
+        )
+    table_count = sum(1 for table in ALLOWED_TABLES if table.upper() in query_upper)
+    if table_count > 1 and ("UNION" in query_upper or "JOIN" not in query_upper):
+        return False, "Multiple table references detected without explicit JOIN"
+    return True, ""
+
+
+def time_per_call(
+    func: Callable[[str], object],
+    corpus: List[str],
+    repeat: int = 5,
+    loops: int = 200,
+) -> float:
+    """
+    Measure the best-of-``repeat`` mean cost of one call over ``corpus``.
+
+    Returns:
+        float: Microseconds per call
+    """
+
+    def run() -> None:
+        for item in corpus:
+            func(item)
+
+    best = min(timeit.repeat(run, number=loops, repeat=repeat))
+    return best / (loops * len(corpus)) * 1e6
+
+
+def bench_validator() -> None:
+    """Compare the compiled validator against the legacy regex loop."""
+    uncached = SQLValidator(BLOCKED_KEYWORDS, ALLOWED_TABLES, MAX_QUERY_LENGTH)
+    legacy = time_per_call(_legacy_validate_sql_query, VALIDATOR_CORPUS)
+    current = time_per_call(uncached.validate, VALIDATOR_CORPUS)
+    cached = time_per_call(validate_sql_query, VALIDATOR_CORPUS)
+    print(f"{'validate_sql_query (legacy regex)':<40} {legacy:8.2f} us/call")
+    print(f"{'validate_sql_query (tokenizer)':<40} {current:8.2f} us/call")
+    print(f"{'validate_sql_query (cached verdicts)':<40} {cached:8.2f} us/call")
+    print(f"{'speed-up (tokenizer)':<40} {legacy / current:8.2f}x")
+    print(f"{'speed-up (cached)':<40} {legacy / cached:8.2f}x")
+    record("validator", "legacy_us", legacy)
+    record("validator", "tokenizer_us", current)
+    record("validator", "cached_us", cached)
+
+    corpus = generate_corpus()
+    for kind in ("valid", "malicious", "oversized"):
+        queries = [sql for k, sql in corpus if k == kind]
+        cost = time_per_call(uncached.validate, queries, repeat=3, loops=5)
+        print(f"{f'generated {kind} ({len(queries)} queries)':<40} {cost:8.2f} us/call")
+        record("validator", f"generated_{kind}_us", cost)
+
+
+def _wide_result_db(row_count: int) -> sqlite3.Connection:
+    """In-memory table shaped like a ``clients``/``experience`` join."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE wide (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, "
+        "email TEXT, phone TEXT, job_title TEXT, company TEXT, start_year "
+        "INTEGER, end_year INTEGER, description TEXT)"
+    )
+    conn.executemany(
+        "INSERT INTO wide VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                i,
+                f"Client {i}",
+                20 + i % 50,
+                f"client{i}@example.com",
+                f"+1-555-{i:04d}",
+                "Software Engineer",
+                f"Company {i % 7}",
+                2010 + i % 10,
+                None if i % 3 else 2022,
+                "Built and maintained data pipelines and web services.",
+            )
+            for i in range(row_count)
+        ),
+    )
+    return conn
+
+
+def bench_encoder(sizes: Tuple[int, ...] = (100, 1000, 10000)) -> None:
+    """Compare Row copy + jsonify with the direct tuple encoders."""
+    for size in sizes:
+        conn = _wide_result_db(size)
+        sql = "SELECT * FROM wide"
+
+        def legacy() -> bytes:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(sql)
+            columns = [desc[0] for desc in cursor.description]
+            rows = [tuple(row) for row in cursor.fetchmany(size)]
+            return jsonify(
+                {"columns": columns, "rows": rows, "row_count": len(rows)}
+            ).get_data()
+
+        def direct(encoder: Callable) -> Callable[[], bytes]:
+            def run() -> bytes:
+                cursor = conn.execute(sql)
+                columns = [desc[0] for desc in cursor.description]
+                return encoder(columns, fetch_tuples(cursor, size))
+
+            return run
+
+        with app.app_context():
+            loops = max(1, 20000 // size)
+            timings = [
+                ("Row copy + jsonify", legacy),
+                ("direct rows encoder", direct(encode_rows)),
+                ("direct columnar encoder", direct(encode_columnar)),
+            ]
+            baseline = None
+            for label, func in timings:
+                best = min(timeit.repeat(func, number=loops, repeat=5)) / loops
+                baseline = baseline or best
+                print(
+                    f"{size:>6} rows  {label:<28} {best * 1000:9.3f} ms"
+                    f"  {baseline / best:6.2f}x"
+                )
+                metric = label.replace(" + ", "_").replace(" ", "_")
+                record("encoder", f"{size}_rows_{metric}_ms", best * 1000)
+        conn.close()
+
+
+def _stage_summary(samples: List[float]) -> Tuple[float, float]:
+    """Mean and p95 of per-query stage times, in microseconds."""
+    return statistics.fmean(samples) * 1e6, percentile(samples, 95) * 1e6
+
+
+def bench_pipeline(repeat: int = 3) -> None:
+    """
+    Time each /query stage separately over the generated valid queries.
+
+    Stages: validation, connection acquisition (pool checkout versus a fresh
+    ``sqlite3.connect``), execution, row conversion (plain tuples versus
+    ``sqlite3.Row`` to dicts) and JSON serialization of the same tuple rows
+    (direct encoder versus ``jsonify``).
+    """
+    validator = SQLValidator(BLOCKED_KEYWORDS, ALLOWED_TABLES, MAX_QUERY_LENGTH)
+    queries = [sql for kind, sql in generate_corpus() if kind == "valid"]
+    stages: Dict[str, List[float]] = {
+        name: []
+        for name in (
+            "validate",
+            "acquire_pool",
+            "acquire_connect",
+            "execute",
+            "convert_tuples",
+            "convert_dicts",
+            "serialize_direct",
+            "serialize_jsonify",
+        )
+    }
+    clock = time.perf_counter
+    with app.app_context():
+        for _ in range(repeat):
+            for sql in queries:
+                t0 = clock()
+                validator.validate(sql)
+                stages["validate"].append(clock() - t0)
+
+                t0 = clock()
+                fresh = sqlite3.connect(DB_PATH)
+                stages["acquire_connect"].append(clock() - t0)
+                fresh.close()
+
+                t0 = clock()
+                with db_pool.connection() as conn:
+                    stages["acquire_pool"].append(clock() - t0)
+
+                    cursor = conn.cursor()
+                    cursor.row_factory = None
+                    t0 = clock()
+                    cursor.execute(sql)
+                    stages["execute"].append(clock() - t0)
+                    columns = [desc[0] for desc in cursor.description]
+
+                    t0 = clock()
+                    rows = fetch_tuples(cursor, MAX_RESULTS)
+                    stages["convert_tuples"].append(clock() - t0)
+
+                    cursor = conn.execute(sql)
+                    t0 = clock()
+                    [dict(row) for row in cursor.fetchmany(MAX_RESULTS)]
+                    stages["convert_dicts"].append(clock() - t0)
+
+                t0 = clock()
+                encode_rows(columns, rows)
+                stages["serialize_direct"].append(clock() - t0)
+
+                t0 = clock()
+                # Same payload and rows as encode_rows, so only the encoder differs
+                jsonify(
+                    {
+                        "columns": columns,
+                        "rows": rows,
+                        "row_count": len(rows),
+                        "next_cursor": None,
+                    }
+                )
+                stages["serialize_jsonify"].append(clock() - t0)
+
+    print(f"{len(queries)} generated valid queries x {repeat}")
+    print(f"{'stage':<24} {'mean us':>10} {'p95 us':>10}")
+    for name, samples in stages.items():
+        mean, p95 = _stage_summary(samples)
+        print(f"{name:<24} {mean:10.2f} {p95:10.2f}")
+        record("pipeline", f"{name}_mean_us", mean)
+        record("pipeline", f"{name}_p95_us", p95)
+
+
+# A valid query that takes a few hundred ms: a six-way self cross join
+SLOW_QUERY = "SELECT COUNT(*) FROM " + " JOIN ".join(f"skills s{i}" for i in range(6))
+
+# Server settings for the serving benchmark: let the slow query through the
+# plan guard and deadline, and keep the result cache from answering it
+SERVING_ENV = {
+    "QUERY_PLAN_MAX_COST": "0",
+    "QUERY_TIMEOUT": "30",
+    "RESULT_CACHE_MAX_BYTES": "0",
+    "ADMISSION_RATE": "0",
+    "ADMISSION_MAX_CONCURRENT": "0",
+}
+
+
+def _drive(
+    base_url: str, slow_clients: int, fast_clients: int, duration: float
+) -> Dict[str, List[float]]:
+    """Run slow /query and fast /health clients in parallel; collect latencies."""
+    latencies: Dict[str, List[float]] = {"query": [], "health": [], "errors": []}
+    stop = time.monotonic() + duration
+    body = json.dumps({"query": SLOW_QUERY}).encode()
+
+    def client(kind: str) -> None:
+        while time.monotonic() < stop:
+            if kind == "query":
+                req = urllib.request.Request(
+                    base_url + "/query",
+                    data=body,
+                    headers={"Content-Type": "application/json"},
+                )
+            else:
+                req = urllib.request.Request(base_url + "/health")
+            started = time.perf_counter()
+            try:
+                urllib.request.urlopen(req, timeout=60).read()
+            except (urllib.error.URLError, OSError):
+                latencies["errors"].append(0.0)
+                continue
+            latencies[kind].append(time.perf_counter() - started)
+
+    threads = [
+        threading.Thread(target=client, args=("query",)) for _ in range(slow_clients)
+    ] + [threading.Thread(target=client, args=("health",)) for _ in range(fast_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def bench_serving(
+    workers: int = 2,
+    slow_clients: int = 4,
+    fast_clients: int = 4,
+    duration: float = 8.0,
+) -> None:
+    """Compare /health latency under slow /query load: sync gunicorn vs ASGI."""
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        print("uvicorn is not installed; skipping the serving benchmark")
+        return
+
+    servers = {
+        "gunicorn sync": [
+            sys.executable, "-m", "gunicorn", "--preload", "--worker-class", "sync",
+            "--threads", "1",
+            "--workers", str(workers), "--timeout", "120", "--bind", "127.0.0.1:{port}",
+            "app:app",
+        ],
+        "uvicorn asgi": [
+            sys.executable, "-m", "uvicorn", "asgi:application", "--workers",
+            str(workers), "--host", "127.0.0.1", "--port", "{port}",
+            "--log-level", "warning",
+        ],
+    }  # fmt: skip
+    env = dict(os.environ, **SERVING_ENV)
+    print(
+        f"{workers} worker processes, {slow_clients} clients running a slow query, "
+        f"{fast_clients} clients polling /health, {duration:g}s"
+    )
+    for label, template in servers.items():
+        port = free_port()
+        cmd = [arg.replace("{port}", str(port)) for arg in template]
+        server = subprocess.Popen(
+            cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base_url)
+            result = _drive(base_url, slow_clients, fast_clients, duration)
+        finally:
+            server.terminate()
+            server.wait()
+        health, slow = result["health"], result["query"]
+        key = label.replace(" ", "_")
+        record("serving", f"{key}_health_rps", len(health) / duration)
+        record("serving", f"{key}_health_p99_ms", percentile(health, 99) * 1000)
+        record("serving", f"{key}_query_rps", len(slow) / duration)
+        print(
+            f"{label:<14} /health {len(health) / duration:8.1f} req/s"
+            f"  p50 {percentile(health, 50) * 1000:8.1f} ms"
+            f"  p99 {percentile(health, 99) * 1000:8.1f} ms"
+            f"  | /query {len(slow) / duration:5.1f} req/s"
+            f"  p50 {statistics.median(slow) * 1000:7.1f} ms"
+            f"  | errors {len(result['errors'])}"
+        )
+
+
+# Every way the app is launched, timed from process start to first /health
+LAUNCHERS = {
+    "start.py": ["start.py"],
+    "simple_start.py": ["simple_start.py"],
+    "asgi_start.py": ["asgi_start.py"],
+    "app.py": ["app.py"],
+}
+
+
+def _time_to_healthy(
+    args: List[str], env: Dict[str, str], timeout: float = 30.0
+) -> float:
+    """Seconds from spawning ``args`` until ``/health`` first answers."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable] + args,
+        env=dict(env, PORT=str(port)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                return time.perf_counter() - started
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.005)
+        raise RuntimeError(f"{' '.join(args)} did not become healthy")
+    finally:
+        # Launchers may exec or spawn workers: stop the whole process group
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+
+def bench_cold_start(workers: int = 2, runs: int = 5) -> None:
+    """Time to first healthy response for each launcher."""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), FLASK_DEBUG="false")
+    print(f"{workers} worker processes where supported, median of {runs} starts")
+    for label, args in LAUNCHERS.items():
+        try:
+            samples = [_time_to_healthy(args, env) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"{label:<16} skipped: {e}")
+            continue
+        key = label.replace(".py", "")
+        record("cold_start", f"{key}_median_ms", statistics.median(samples) * 1000)
+        record("cold_start", f"{key}_min_ms", min(samples) * 1000)
+        print(
+            f"{label:<16} median {statistics.median(samples) * 1000:7.1f} ms"
+            f"  min {min(samples) * 1000:7.1f} ms"
+        )
+
+
+SECTIONS = {
+    "validator": ("Validator", bench_validator),
+    "encoder": ("Result encoding", bench_encoder),
+    "pipeline": ("Query pipeline stages", bench_pipeline),
+    "serving": ("Serving under mixed slow/fast load", bench_serving),
+    "cold_start": ("Cold start to first healthy response", bench_cold_start),
+}
+
+DEFAULT_SECTIONS = ("validator", "encoder", "pipeline")
+
+
+def report() -> Dict[str, Any]:
+    """Machine-readable document of every recorded measurement."""
+    return {
+        "meta": {
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": RESULTS,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Portfolio hot-path benchmarks")
+    parser.add_argument("sections", nargs="*", help=", ".join(SECTIONS))
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON")
+    args = parser.parse_args()
+    unknown = [name for name in args.sections if name not in SECTIONS]
+    if unknown:
+        parser.error(f"unknown section(s): {', '.join(unknown)}")
+
+    # Human-readable output goes to stderr when the JSON goes to stdout
+    out = sys.stderr if args.json == "-" else sys.stdout
+    names = args.sections or DEFAULT_SECTIONS
+    for index, name in enumerate(names):
+        title, bench = SECTIONS[name]
+        with contextlib.redirect_stdout(out):
+            if index:
+                print()
+            print(title)
+            print("-" * 60)
+            bench()
+
+    if args.json == "-":
+        json.dump(report(), sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report(), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
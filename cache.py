@@ -0,0 +1,122 @@
+"""
+In-process caches
+
+Small thread-safe LRU cache with hit/miss accounting, shared by the
+validation and query layers. It can be bounded by entry count, by total
+payload bytes, or both, and entries may expire after a TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry.
+
+    Args:
+        maxsize (Optional[int]): Maximum number of entries; None for no entry
+            limit, 0 disables caching
+        max_bytes (Optional[int]): Maximum total size of stored values (as
+            given to ``put``); None for no byte limit, 0 disables caching
+        ttl (Optional[float]): Seconds an entry stays valid; None never expires
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int],
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.maxsize = None if maxsize is None else max(0, int(maxsize))
+        self.max_bytes = None if max_bytes is None else max(0, int(max_bytes))
+        self.ttl = ttl or None
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize != 0 and self.max_bytes != 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value for ``key`` and mark it most recently used."""
+        with self._lock:
+            try:
+                value, size, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, size: int = 0) -> None:
+        """
+        Store ``value`` under ``key``, evicting old entries if needed.
+
+        Args:
+            key (Hashable): Cache key
+            value (Any): Value to store
+            size (int): Size of ``value`` in bytes, counted against ``max_bytes``
+        """
+        if not self.enabled:
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._data[key] = (value, size, expires)
+            self.bytes += size
+            while (self.maxsize is not None and len(self._data) > self.maxsize) or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the cache counters.
+
+        Returns:
+            Dict[str, Any]: hits, misses, hit_rate, evictions, expirations,
+            size, maxsize, bytes and max_bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
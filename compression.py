@@ -0,0 +1,199 @@
+"""
+Response Compression
+
+WSGI middleware that gzips responses for clients sending
+``Accept-Encoding: gzip``. The body is compressed chunk by chunk as the app
+produces it, so large results are never held twice in memory.
+
+Responses with a ``Content-Length`` (``jsonify`` and other buffered bodies)
+are compressed only if they reach ``min_size``. Streamed responses (NDJSON
+``/query``) have no length up front: chunks are held back until
+``min_size`` bytes have arrived, and a stream that ends before that is sent
+uncompressed. Once compressing, every streamed chunk is sync-flushed, so
+clients still receive each batch as soon as it is produced.
+
+Responses that are already encoded (precompressed static assets), not a
+text-like type, marked ``no-transform``, or without a body are passed
+through untouched.
+"""
+
+import zlib
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from werkzeug.http import parse_accept_header
+
+Headers = List[Tuple[str, str]]
+
+# Media types worth compressing; images, fonts and archives already are
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "application/manifest+json",
+        "application/xml",
+        "image/svg+xml",
+        "text/css",
+        "text/html",
+        "text/javascript",
+        "text/plain",
+        "text/xml",
+    }
+)
+
+# Statuses that never carry a body to compress
+_BODYLESS_STATUS = frozenset({204, 206, 304})
+
+
+def _header(headers: Headers, name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers: Headers, *names: str) -> Headers:
+    drop = {name.lower() for name in names}
+    return [(key, value) for key, value in headers if key.lower() not in drop]
+
+
+def _add_vary(headers: Headers) -> Headers:
+    vary = _header(headers, "Vary")
+    if vary is None:
+        return headers + [("Vary", "Accept-Encoding")]
+    fields = {field.strip().lower() for field in vary.split(",")}
+    if "accept-encoding" in fields or "*" in fields:
+        return headers
+    return _without(headers, "Vary") + [("Vary", f"{vary}, Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """
+    Gzip responses on the fly.
+
+    Args:
+        app (Callable): The WSGI application to wrap
+        min_size (int): Smallest body, in bytes, worth compressing
+        level (int): zlib compression level, 1 (fastest) to 9 (smallest)
+        mimetypes (Iterable[str]): Media types that may be compressed
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        min_size: int = 1024,
+        level: int = 6,
+        mimetypes: Iterable[str] = COMPRESSIBLE_TYPES,
+    ) -> None:
+        self.app = app
+        self.min_size = max(0, int(min_size))
+        self.level = min(max(int(level), 1), 9)
+        self.mimetypes = frozenset(mimetypes)
+
+    def _compressible(self, headers: Headers) -> bool:
+        """Check whether the response's type and caching allow compression."""
+        content_type = (_header(headers, "Content-Type") or "").split(";")[0]
+        if content_type.strip().lower() not in self.mimetypes:
+            return False
+        cache_control = (_header(headers, "Cache-Control") or "").lower()
+        return "no-transform" not in cache_control
+
+    def __call__(
+        self, environ: Dict[str, Any], start_response: Callable
+    ) -> Iterable[bytes]:
+        accepts = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        wants_gzip = accepts.quality("gzip") > 0
+        head = environ.get("REQUEST_METHOD") == "HEAD"
+
+        captured: Dict[str, Any] = {}
+        written: List[bytes] = []
+
+        def capture(status: str, headers: Headers, exc_info: Optional[Any] = None):
+            if exc_info and captured.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured.update(status=status, headers=list(headers), exc_info=exc_info)
+            return written.append
+
+        result = self.app(environ, capture)
+        return self._respond(
+            result, captured, written, start_response, wants_gzip, head
+        )
+
+    def _respond(
+        self,
+        result: Iterable[bytes],
+        captured: Dict[str, Any],
+        written: List[bytes],
+        start_response: Callable,
+        wants_gzip: bool,
+        head: bool,
+    ) -> Iterator[bytes]:
+        chunks = iter(result)
+        try:
+            pending = list(written)
+            while "status" not in captured:
+                # The app delays start_response until its first chunk
+                pending.append(next(chunks))
+
+            status, headers = captured["status"], captured["headers"]
+            code = int(status.split(" ", 1)[0])
+
+            def send(headers: Headers) -> None:
+                captured["sent"] = True
+                start_response(status, headers, captured["exc_info"])
+
+            if (
+                code < 200
+                or code in _BODYLESS_STATUS
+                or _header(headers, "Content-Encoding") is not None
+                or not self._compressible(headers)
+            ):
+                send(headers)
+                yield from chain(pending, chunks)
+                return
+
+            headers = _add_vary(headers)
+            length = _header(headers, "Content-Length")
+            if (
+                not wants_gzip
+                or head
+                or (length is not None and int(length) < self.min_size)
+            ):
+                send(headers)
+                yield from chain(pending, chunks)
+                return
+
+            streaming = length is None
+            size = sum(len(chunk) for chunk in pending)
+            while streaming and size < self.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    body = b"".join(pending)
+                    send(headers + [("Content-Length", str(len(body)))])
+                    yield body
+                    return
+                pending.append(chunk)
+                size += len(chunk)
+
+            etag = _header(headers, "ETag")
+            headers = _without(headers, "Content-Length", "Accept-Ranges", "ETag")
+            headers.append(("Content-Encoding", "gzip"))
+            if etag is not None:
+                # Same content, different bytes: only weakly equal
+                headers.append(("ETag", etag if etag.startswith("W/") else "W/" + etag))
+            send(headers)
+
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            for chunk in chain(pending, chunks):
+                data = compressor.compress(chunk)
+                if streaming:
+                    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
@@ -2,10 +2,13 @@
 
 import os
 from typing import Dict, Any
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from a .env file, if there is one (python-dotenv
+# is only imported then, keeping it off the startup path in deployments)
+if any(os.path.isfile(os.path.join(d, '.env'))
+       for d in (os.getcwd(), os.path.dirname(os.path.abspath(__file__)))):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 class Config:
     """Base configuration class"""
@@ -25,6 +28,92 @@ class Config:
     MAX_QUERY_LENGTH = int(os.environ.get('MAX_QUERY_LENGTH', 1000))
     MAX_RESULTS = int(os.environ.get('MAX_RESULTS', 100))
     
+    # Per-statement execution deadline (seconds, 0 disables)
+    QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', 5.0))
+    QUERY_PROGRESS_STEPS = int(os.environ.get('QUERY_PROGRESS_STEPS', 1000))
+    
+    # Identical concurrent /query requests share one execution; seconds a
+    # request waits for it before running the query itself (0 disables)
+    QUERY_COALESCE_TIMEOUT = float(os.environ.get('QUERY_COALESCE_TIMEOUT', 5.0))
+    
+    # EXPLAIN QUERY PLAN cost guard (0 disables)
+    QUERY_PLAN_MAX_COST = float(os.environ.get('QUERY_PLAN_MAX_COST', 1000))
+    QUERY_PLAN_SCAN_COST = float(os.environ.get('QUERY_PLAN_SCAN_COST', 10))
+    QUERY_PLAN_TEMP_BTREE_COST = float(os.environ.get('QUERY_PLAN_TEMP_BTREE_COST', 5))
+    QUERY_PLAN_CACHE_SIZE = int(os.environ.get('QUERY_PLAN_CACHE_SIZE', 256))
+    
+    # Streaming (NDJSON) /query responses
+    STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 200))
+    STREAM_MAX_ROWS = int(os.environ.get('STREAM_MAX_ROWS', 100000))
+    
+    # /query/batch: queries per request and rows across all of its results
+    QUERY_BATCH_MAX_QUERIES = int(os.environ.get('QUERY_BATCH_MAX_QUERIES', 10))
+    QUERY_BATCH_MAX_ROWS = int(os.environ.get('QUERY_BATCH_MAX_ROWS', 1000))
+    
+    # /query result cache (encoded bytes, 0 disables; TTL seconds, 0 never expires)
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 0))
+    
+    # Validation verdict cache (entries, 0 disables)
+    VALIDATION_CACHE_SIZE = int(os.environ.get('VALIDATION_CACHE_SIZE', 256))
+    
+    # Read-only SQLite connection pool (per worker process)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5.0))
+    DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', 3600))
+    DB_CACHE_SIZE = int(os.environ.get('DB_CACHE_SIZE', -8000))  # KiB when negative
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 64 * 1024 * 1024))
+    
+    # Serve queries from an in-memory copy each worker builds after it forks
+    DB_MEMORY_REPLICA = os.environ.get('DB_MEMORY_REPLICA', 'False').lower() == 'true'
+    
+    # ASGI serving (asgi.py): threads for database routes (0 = DB_POOL_SIZE),
+    # threads for other routes, and requests allowed to queue per lane
+    ASGI_DB_WORKERS = int(os.environ.get('ASGI_DB_WORKERS', 0))
+    ASGI_WEB_WORKERS = int(os.environ.get('ASGI_WEB_WORKERS', 4))
+    ASGI_BACKLOG = int(os.environ.get('ASGI_BACKLOG', 64))
+    
+    # On-the-fly gzip of text responses (compression.py): bodies smaller than
+    # COMPRESSION_MIN_SIZE bytes are sent as is; level 1 (fast) to 9 (small)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    
+    # Cache lifetime of content-hashed static assets (static/dist, see assets.py)
+    STATIC_ASSET_MAX_AGE = int(os.environ.get('STATIC_ASSET_MAX_AGE', 365 * 24 * 3600))
+    
+    # Slow-query log: threshold in seconds (0 disables), in-memory entries per
+    # worker, and an optional rotating JSON-lines file ("{pid}" is expanded)
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.25))
+    SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 200))
+    SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE', '')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 3))
+    
+    # Server-Timing response header and /metrics (Prometheus) histograms;
+    # METRICS_SLOTS bounds the number of worker processes counted
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'True').lower() == 'true'
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_SLOTS = int(os.environ.get('METRICS_SLOTS', 64))
+    
+    # Admission control for /query, shared by all workers; off unless set:
+    # per-client-IP token bucket (requests/second and burst; 0 rate disables
+    # it, 429 when empty) and a cap on requests served at once (0 disables
+    # it, 503 when full; keep it at least gunicorn workers x threads).
+    # ADMISSION_PROXY_HOPS is the number of trusted proxies appending to
+    # X-Forwarded-For; 0 uses the connection's address, which behind a
+    # reverse proxy (Railway, Render) puts every visitor in one bucket, so
+    # set it to 1 there before enabling the rate limit.
+    ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 0))
+    ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', 40))
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 0))
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 1))
+    ADMISSION_TABLE_SIZE = int(os.environ.get('ADMISSION_TABLE_SIZE', 4096))
+    ADMISSION_PROXY_HOPS = int(os.environ.get('ADMISSION_PROXY_HOPS', 0))
+    
+    # Token for the /admin endpoints (X-Admin-Token header); empty disables them
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+    
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'portfolio.log')
@@ -54,6 +143,48 @@ class Config:
             'HOST': cls.HOST,
             'MAX_QUERY_LENGTH': cls.MAX_QUERY_LENGTH,
             'MAX_RESULTS': cls.MAX_RESULTS,
+            'QUERY_TIMEOUT': cls.QUERY_TIMEOUT,
+            'QUERY_PROGRESS_STEPS': cls.QUERY_PROGRESS_STEPS,
+            'QUERY_COALESCE_TIMEOUT': cls.QUERY_COALESCE_TIMEOUT,
+            'QUERY_PLAN_MAX_COST': cls.QUERY_PLAN_MAX_COST,
+            'QUERY_PLAN_SCAN_COST': cls.QUERY_PLAN_SCAN_COST,
+            'QUERY_PLAN_TEMP_BTREE_COST': cls.QUERY_PLAN_TEMP_BTREE_COST,
+            'QUERY_PLAN_CACHE_SIZE': cls.QUERY_PLAN_CACHE_SIZE,
+            'STREAM_BATCH_SIZE': cls.STREAM_BATCH_SIZE,
+            'STREAM_MAX_ROWS': cls.STREAM_MAX_ROWS,
+            'QUERY_BATCH_MAX_QUERIES': cls.QUERY_BATCH_MAX_QUERIES,
+            'QUERY_BATCH_MAX_ROWS': cls.QUERY_BATCH_MAX_ROWS,
+            'RESULT_CACHE_MAX_BYTES': cls.RESULT_CACHE_MAX_BYTES,
+            'RESULT_CACHE_TTL': cls.RESULT_CACHE_TTL,
+            'VALIDATION_CACHE_SIZE': cls.VALIDATION_CACHE_SIZE,
+            'DB_POOL_SIZE': cls.DB_POOL_SIZE,
+            'DB_POOL_TIMEOUT': cls.DB_POOL_TIMEOUT,
+            'DB_POOL_RECYCLE': cls.DB_POOL_RECYCLE,
+            'DB_CACHE_SIZE': cls.DB_CACHE_SIZE,
+            'DB_MMAP_SIZE': cls.DB_MMAP_SIZE,
+            'DB_MEMORY_REPLICA': cls.DB_MEMORY_REPLICA,
+            'ASGI_DB_WORKERS': cls.ASGI_DB_WORKERS,
+            'ASGI_WEB_WORKERS': cls.ASGI_WEB_WORKERS,
+            'ASGI_BACKLOG': cls.ASGI_BACKLOG,
+            'COMPRESSION_ENABLED': cls.COMPRESSION_ENABLED,
+            'COMPRESSION_MIN_SIZE': cls.COMPRESSION_MIN_SIZE,
+            'COMPRESSION_LEVEL': cls.COMPRESSION_LEVEL,
+            'STATIC_ASSET_MAX_AGE': cls.STATIC_ASSET_MAX_AGE,
+            'SLOW_QUERY_THRESHOLD': cls.SLOW_QUERY_THRESHOLD,
+            'SLOW_QUERY_LOG_SIZE': cls.SLOW_QUERY_LOG_SIZE,
+            'SLOW_QUERY_LOG_FILE': cls.SLOW_QUERY_LOG_FILE,
+            'SLOW_QUERY_LOG_MAX_BYTES': cls.SLOW_QUERY_LOG_MAX_BYTES,
+            'SLOW_QUERY_LOG_BACKUPS': cls.SLOW_QUERY_LOG_BACKUPS,
+            'SERVER_TIMING_ENABLED': cls.SERVER_TIMING_ENABLED,
+            'METRICS_ENABLED': cls.METRICS_ENABLED,
+            'METRICS_SLOTS': cls.METRICS_SLOTS,
+            'ADMISSION_RATE': cls.ADMISSION_RATE,
+            'ADMISSION_BURST': cls.ADMISSION_BURST,
+            'ADMISSION_MAX_CONCURRENT': cls.ADMISSION_MAX_CONCURRENT,
+            'ADMISSION_RETRY_AFTER': cls.ADMISSION_RETRY_AFTER,
+            'ADMISSION_TABLE_SIZE': cls.ADMISSION_TABLE_SIZE,
+            'ADMISSION_PROXY_HOPS': cls.ADMISSION_PROXY_HOPS,
+            'ADMIN_TOKEN': cls.ADMIN_TOKEN,
             'LOG_LEVEL': cls.LOG_LEVEL,
             'LOG_FILE': cls.LOG_FILE,
             'ALLOWED_SQL_OPERATIONS': cls.ALLOWED_SQL_OPERATIONS,
@@ -64,12 +195,14 @@ class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     LOG_LEVEL = 'DEBUG'
+    QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', 10.0))
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     LOG_LEVEL = 'WARNING'
     HOST = '0.0.0.0'
+    QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', 2.0))
 
 # Configuration selector
 config = {
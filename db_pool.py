@@ -0,0 +1,433 @@
+"""
+SQLite Connection Pool
+
+Per-process pool of read-only SQLite connections. Connections are opened
+lazily on first checkout, so a pool created while gunicorn preloads the app
+in the master opens nothing until a forked worker uses it, and a pool that
+detects a fork discards inherited connections instead of sharing them.
+
+The pool can be pointed at another database URI (see ``set_source``); each
+retarget starts a new generation, and connections from older generations are
+closed as they come back instead of being reused.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a statement is aborted for exceeding its time budget."""
+
+
+class _PooledConnection:
+    """A pooled connection plus the bookkeeping needed to recycle it."""
+
+    __slots__ = ("conn", "created_at", "generation")
+
+    def __init__(self, conn: sqlite3.Connection, generation: int = 0) -> None:
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.generation = generation
+
+
+class ConnectionPool:
+    """
+    Bounded pool of read-only SQLite connections.
+
+    Args:
+        db_path (str): Path to the SQLite database file
+        size (int): Maximum number of open connections per process
+        timeout (float): Seconds to wait for a free connection
+        recycle (float): Seconds after which a connection is reopened; 0 never
+        cache_size (int): ``PRAGMA cache_size`` (negative values are KiB)
+        mmap_size (int): ``PRAGMA mmap_size`` in bytes
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 4,
+        timeout: float = 5.0,
+        recycle: float = 3600.0,
+        cache_size: int = -8000,
+        mmap_size: int = 67108864,
+    ) -> None:
+        self.db_path = db_path
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.recycle = recycle
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self._source: Optional[str] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._pid = os.getpid()
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        self._opened = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def set_source(self, uri: Optional[str]) -> None:
+        """
+        Serve new checkouts from another database.
+
+        Connections already checked out finish their work on the old source
+        and are closed when released.
+
+        Args:
+            uri (Optional[str]): SQLite URI filename (e.g. a shared-cache
+                in-memory replica); None returns to ``db_path``
+        """
+        with self._lock:
+            self._source = uri
+            self._generation += 1
+        self.close()
+
+    def _connect(self) -> _PooledConnection:
+        while True:
+            with self._lock:
+                source, generation = self._source, self._generation
+            if source is None:
+                uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            else:
+                uri = source
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            with self._lock:
+                current = self._generation
+            if current != generation:
+                # Retargeted while connecting; the old source may be gone
+                conn.close()
+                continue
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only = ON")
+            if source is None:
+                conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+                conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+            return _PooledConnection(conn, generation)
+
+    def _is_current(self, pooled: _PooledConnection) -> bool:
+        return pooled.generation == self._generation
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        if not self._is_current(pooled):
+            return False
+        if self.recycle and time.monotonic() - pooled.created_at > self.recycle:
+            return False
+        try:
+            pooled.conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding unhealthy database connection: {e}")
+            return False
+        return True
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+            self.recycled += 1
+
+    def _check_fork(self) -> None:
+        if self._pid != os.getpid():
+            # Connections inherited from the parent must not be used or closed
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    def _acquire(self) -> _PooledConnection:
+        self._check_fork()
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        while True:
+            pooled = self._next_idle(deadline)
+            if pooled is None:
+                pooled = self._connect_new()
+            elif not self._is_healthy(pooled):
+                self._discard(pooled)
+                continue
+
+            waited = time.perf_counter() - started
+            with self._lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            return pooled
+
+    def _next_idle(self, deadline: float) -> Optional[_PooledConnection]:
+        """Return an idle connection, or None if a new one may be opened."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return None
+        try:
+            return self._idle.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeoutError(
+                f"No database connection available after {self.timeout:.1f}s"
+            )
+
+    def _connect_new(self) -> _PooledConnection:
+        """Open a connection for a slot already reserved by ``_next_idle``."""
+        try:
+            return self._connect()
+        except sqlite3.Error:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _release(self, pooled: _PooledConnection, broken: bool) -> None:
+        if pooled is None or self._pid != os.getpid():
+            return
+        if not broken and pooled.conn.in_transaction:
+            try:
+                pooled.conn.rollback()
+            except sqlite3.Error:
+                broken = True
+        if broken or not self._is_current(pooled):
+            self._discard(pooled)
+        else:
+            self._idle.put(pooled)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Check out a connection for the duration of a ``with`` block.
+
+        Yields:
+            sqlite3.Connection: A read-only connection with ``sqlite3.Row`` rows
+
+        Raises:
+            PoolTimeoutError: If no connection frees up within ``timeout``
+        """
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.conn
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            broken = True
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def close(self) -> None:
+        """Close every idle connection owned by this process."""
+        if self._pid != os.getpid():
+            self._reset_state()
+            return
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool usage, including checkout wait time.
+
+        Returns:
+            Dict[str, Any]: Pool size, open/idle counts and wait statistics
+        """
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "idle": self._idle.qsize(),
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+                "wait_avg_ms": (
+                    self.wait_total / checkouts * 1000 if checkouts else 0.0
+                ),
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+def database_fingerprint(db_path: str) -> Optional[Tuple[int, ...]]:
+    """
+    Identify the current on-disk state of a database file.
+
+    ``PRAGMA data_version`` is only comparable within one connection, so the
+    file's inode, size and mtime (plus the WAL file's, if present) are used
+    instead; any write or redeploy changes at least one of them.
+
+    Args:
+        db_path (str): Path to the SQLite database file
+
+    Returns:
+        Optional[Tuple[int, ...]]: Fingerprint, or None if the file is missing
+    """
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    fingerprint = (st.st_ino, st.st_size, st.st_mtime_ns)
+    try:
+        wal = os.stat(db_path + "-wal")
+    except OSError:
+        return fingerprint
+    return fingerprint + (wal.st_size, wal.st_mtime_ns)
+
+
+class StatementDeadline:
+    """
+    Wall-clock budget for statements, enforced with SQLite's progress handler.
+
+    The handler runs every ``check_interval`` virtual machine instructions and
+    aborts the running statement once the budget is spent, so a runaway query
+    releases its worker instead of running until gunicorn kills it.
+
+    Args:
+        budget (float): Seconds a statement may run; 0 disables the deadline
+        check_interval (int): VM instructions between deadline checks
+    """
+
+    def __init__(self, budget: float, check_interval: int = 1000) -> None:
+        self.budget = budget
+        self.check_interval = max(1, int(check_interval))
+        self._lock = threading.Lock()
+        self.aborted = 0
+
+    @contextmanager
+    def applied(
+        self, conn: sqlite3.Connection, seconds: Optional[float] = None
+    ) -> Iterator[sqlite3.Connection]:
+        """
+        Enforce the budget on everything run on ``conn`` inside the block.
+
+        Execution and fetching both count, since SQLite computes rows lazily.
+
+        Args:
+            conn (sqlite3.Connection): Connection to guard
+            seconds (Optional[float]): Time left of the budget, for work
+                split over several blocks (see ``metered``); defaults to
+                the whole budget
+
+        Yields:
+            sqlite3.Connection: The same connection, with the handler installed
+
+        Raises:
+            QueryTimeoutError: If the budget ran out and SQLite was interrupted
+        """
+        if not self.budget:
+            yield conn
+            return
+
+        deadline = time.monotonic() + (self.budget if seconds is None else seconds)
+        expired = False
+
+        def check() -> int:
+            nonlocal expired
+            if time.monotonic() > deadline:
+                expired = True
+                return 1
+            return 0
+
+        conn.set_progress_handler(check, self.check_interval)
+        try:
+            yield conn
+        except sqlite3.OperationalError as e:
+            if not expired:
+                raise
+            with self._lock:
+                self.aborted += 1
+            raise QueryTimeoutError(
+                f"Query exceeded the {self.budget:g}s execution limit"
+            ) from e
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def metered(self) -> "MeteredDeadline":
+        """One statement's budget, spent only inside its ``applied`` blocks."""
+        return MeteredDeadline(self)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Deadline settings and the number of aborted statements.
+
+        Returns:
+            Dict[str, Any]: budget_s and aborted
+        """
+        with self._lock:
+            return {"budget_s": self.budget, "aborted": self.aborted}
+
+
+class MeteredDeadline:
+    """
+    A statement budget spent only while SQLite is working on it.
+
+    For statements whose rows are fetched in parts with pauses in between,
+    such as a streamed response waiting on a slow client: the time between
+    ``applied`` blocks does not count against the budget.
+
+    Args:
+        deadline (StatementDeadline): Supplies the budget and the abort count
+    """
+
+    def __init__(self, deadline: StatementDeadline) -> None:
+        self.deadline = deadline
+        self.remaining = deadline.budget
+
+    @contextmanager
+    def applied(self, conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+        """
+        Enforce what is left of the budget on ``conn`` inside the block.
+
+        Raises:
+            QueryTimeoutError: If the budget ran out and SQLite was interrupted
+        """
+        started = time.monotonic()
+        try:
+            with self.deadline.applied(conn, max(0.0, self.remaining)):
+                yield conn
+        finally:
+            self.remaining -= time.monotonic() - started
+
+
+def open_pool(db_path: str, settings: Optional[Any] = None) -> ConnectionPool:
+    """
+    Build a pool from a configuration object.
+
+    Args:
+        db_path (str): Path to the SQLite database file
+        settings (Optional[Any]): Object with ``DB_POOL_*`` / ``DB_*`` attributes
+
+    Returns:
+        ConnectionPool: Pool configured from ``settings`` (defaults if missing)
+    """
+    return ConnectionPool(
+        db_path,
+        size=getattr(settings, "DB_POOL_SIZE", 4),
+        timeout=getattr(settings, "DB_POOL_TIMEOUT", 5.0),
+        recycle=getattr(settings, "DB_POOL_RECYCLE", 3600.0),
+        cache_size=getattr(settings, "DB_CACHE_SIZE", -8000),
+        mmap_size=getattr(settings, "DB_MMAP_SIZE", 67108864),
+    )
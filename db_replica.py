@@ -0,0 +1,182 @@
+"""
+In-Memory Read Replica
+
+Copy of the portfolio tables in a shared-cache in-memory SQLite database,
+made with the backup API, so queries never touch ``portfolio.db``.
+
+SQLite connections and in-memory databases must not be carried across
+``fork()``, so every process builds its own copy: gunicorn workers do it in
+``post_fork`` (``open()``), never the master. A copy built by a parent
+process is abandoned in the child, not used or closed.
+
+Every build gets a new database name and is kept alive by an anchor
+connection. ``refresh`` copies the next generation completely, points the
+pool at it and only then closes the previous one, so no request sees a
+partially copied replica.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from db_pool import ConnectionPool, database_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryReplica:
+    """
+    In-memory copy of selected tables of a SQLite database.
+
+    Args:
+        db_path (str): Path to the SQLite database file to copy
+        tables (Iterable[str]): Tables to keep; any other table is dropped
+        pool (Optional[ConnectionPool]): Pool to point at each new generation
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        tables: Iterable[str],
+        pool: Optional[ConnectionPool] = None,
+    ) -> None:
+        self.db_path = db_path
+        self.tables = frozenset(table.lower() for table in tables)
+        self.pool = pool
+        self.uri: Optional[str] = None
+        self.fingerprint: Optional[Tuple[int, ...]] = None
+        self.generation = 0
+        self.built_at: Optional[float] = None
+        self.builds = 0
+        self._anchor: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # A parent's anchor, kept referenced so the child never finalizes it
+        self._inherited: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _forget_inherited(self) -> None:
+        """Drop a parent process's generation without touching it (lock held)."""
+        if self._pid != os.getpid():
+            if self._anchor is not None:
+                self._inherited = self._anchor
+            self._anchor = None
+            self.uri = None
+            self.fingerprint = None
+
+    def _copy(self, uri: str) -> sqlite3.Connection:
+        """Back up ``db_path`` into the database at ``uri`` and prune it."""
+        source = sqlite3.connect(
+            Path(self.db_path).resolve().as_uri() + "?mode=ro", uri=True
+        )
+        anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        try:
+            source.backup(anchor)
+            names = anchor.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+            for (name,) in names:
+                if name.lower() not in self.tables:
+                    quoted = name.replace('"', '""')
+                    anchor.execute(f'DROP TABLE "{quoted}"')
+            anchor.commit()
+        except sqlite3.Error:
+            anchor.close()
+            raise
+        finally:
+            source.close()
+        return anchor
+
+    def open(self) -> bool:
+        """
+        Build this process's replica unless it already has one.
+
+        Returns:
+            bool: True if a generation was built
+
+        Raises:
+            sqlite3.Error: If the database file cannot be copied
+        """
+        with self._lock:
+            if self._pid == os.getpid() and self.uri is not None:
+                return False
+        return self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Rebuild the replica if the database file changed since the last build.
+
+        Args:
+            force (bool): Rebuild even if the file looks unchanged
+
+        Returns:
+            bool: True if a new generation was built
+
+        Raises:
+            sqlite3.Error: If the database file cannot be copied; the current
+                generation keeps serving
+        """
+        with self._lock:
+            self._forget_inherited()
+            fingerprint = database_fingerprint(self.db_path)
+            if not force and self.uri is not None and fingerprint == self.fingerprint:
+                return False
+
+            generation = self.generation + 1
+            uri = (
+                f"file:portfolio-replica-{os.getpid()}-{generation}"
+                "?mode=memory&cache=shared"
+            )
+            anchor = self._copy(uri)
+
+            previous = self._anchor
+            self._anchor = anchor
+            self.uri = uri
+            self.fingerprint = fingerprint
+            self._pid = os.getpid()
+            self.generation = generation
+            self.built_at = time.time()
+            self.builds += 1
+            if self.pool is not None:
+                self.pool.set_source(uri)
+            if previous is not None:
+                # Connections still reading the old generation keep it alive
+                previous.close()
+
+        logger.info(
+            f"Built in-memory replica generation {generation} of {self.db_path}"
+        )
+        return True
+
+    def close(self) -> None:
+        """Point the pool back at the file and drop the replica."""
+        with self._lock:
+            self._forget_inherited()
+            if self.pool is not None:
+                self.pool.set_source(None)
+            if self._anchor is not None:
+                self._anchor.close()
+            self._anchor = None
+            self.uri = None
+            self.fingerprint = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Replica generation and build information.
+
+        Returns:
+            Dict[str, Any]: generation, builds, built_at, tables and whether
+            the file changed since the last build (stale)
+        """
+        with self._lock:
+            return {
+                "generation": self.generation,
+                "builds": self.builds,
+                "built_at": self.built_at,
+                "tables": sorted(self.tables),
+                "stale": database_fingerprint(self.db_path) != self.fingerprint,
+            }
@@ -1,16 +1,52 @@
 # Gunicorn Configuration File
+#
+# Shared by every launch path (Procfile, start.py, simple_start.py). Worker
+# and thread counts follow the machine unless overridden:
+#   WEB_CONCURRENCY        worker processes (default: derived from CPU count)
+#   GUNICORN_WORKER_CLASS  "gthread" (default) or "sync"
+#   GUNICORN_THREADS       threads per gthread worker (default: DB_POOL_SIZE)
+#   GUNICORN_MAX_WORKERS   cap on derived worker count (default: 8)
+import multiprocessing
 import os
+import sqlite3
+import sys
+
+
+def _env_int(name, default):
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+
+cpu_count = multiprocessing.cpu_count()
 
 # Server socket - Use PORT from environment if available
 port = os.environ.get("PORT", "5000")
 bind = f"0.0.0.0:{port}"
 
 # Worker processes
-workers = 2
-worker_class = "sync"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gthread":
+    # SQLite releases the GIL while it runs, so a few threads per core pay
+    # off; one thread per pooled connection keeps checkouts from waiting
+    threads = max(1, _env_int("GUNICORN_THREADS", _env_int("DB_POOL_SIZE", 4)))
+    derived_workers = cpu_count + 1
+else:
+    threads = 1
+    derived_workers = cpu_count * 2 + 1
+workers = max(
+    1,
+    _env_int(
+        "WEB_CONCURRENCY",
+        min(derived_workers, _env_int("GUNICORN_MAX_WORKERS", 8)),
+    ),
+)
 worker_connections = 1000
-timeout = 30
-keepalive = 2
+timeout = _env_int("GUNICORN_TIMEOUT", 60)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# Import the app once in the master; workers build their own in-memory
+# replica (if enabled) after the fork, as SQLite databases cannot cross it
+preload_app = True
 
 # Logging
 accesslog = "-"
@@ -32,4 +68,39 @@ keyfile = None
 certfile = None
 
 # Application
-module = "app:app"
+wsgi_app = "app:app"
+
+
+# Server hooks
+def when_ready(server):
+    """Migrate the database and warm the preloaded app's caches, before the first fork."""
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        # Runs where the app serves from: a release phase's filesystem is discarded
+        from migrations import apply_migrations
+
+        try:
+            applied = apply_migrations(app_module.DB_PATH)
+            server.log.info(f"Applied {applied} schema migration(s)")
+        except sqlite3.Error as e:
+            server.log.error(f"Could not migrate {app_module.DB_PATH}: {e}")
+        app_module.preload_resources()
+        server.log.info(f"Master startup: {app_module.startup.summary()}")
+    server.log.info(
+        f"{workers} {worker_class} worker(s) x {threads} thread(s) "
+        f"on {cpu_count} CPU(s)"
+    )
+
+
+def post_fork(server, worker):
+    """Open the worker's own database connections after the fork."""
+    from app import open_worker_resources
+
+    open_worker_resources()
+
+
+def worker_exit(server, worker):
+    """Close the worker's database connections and caches on the way out."""
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.close_worker_resources()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Index advisor for recorded /query traffic
+
+Replays statements through ``EXPLAIN QUERY PLAN`` on an in-memory copy of
+the database and, for every full scan, tries candidate indexes built from
+the columns the statement filters, joins, groups or sorts on (plus the
+columns it selects, for covering variants). The candidate with the lowest
+estimated plan cost is proposed when it beats the current plan.
+
+For each proposal it reports the statements it helps, how often they were
+seen, the estimated cost before and after (the cost guard's model) and,
+for statements that kept their literals, the measured time on the copy.
+
+Traffic comes from the slow-query JSON-lines log (``SLOW_QUERY_LOG_FILE``,
+rotated files included), plain files with one statement per line, or
+``--query``. Logged statements have their literals replaced by ``?``; they
+are planned with NULL parameters and not timed.
+
+Run with:
+    python index_advisor.py logs/slow-*.jsonl
+    python index_advisor.py --query "SELECT * FROM clients WHERE email = 'x'"
+    python index_advisor.py --sql           # CREATE INDEX statements only
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from query_planner import PlanEstimate, estimate_plan
+from sql_validator import IDENTIFIER, OPERATOR, WORD, tokenize
+
+DEFAULT_DB = "portfolio.db"
+
+# Clause keywords that decide whether a column is a key or an output column
+_KEY_CLAUSES = {"WHERE", "ON", "GROUP", "ORDER", "HAVING"}
+_CLAUSES = _KEY_CLAUSES | {"SELECT", "FROM", "JOIN", "LIMIT", "OFFSET", "USING"}
+_EQUALITY = {"=", "==", "IN", "IS"}
+_RANGE = {"<", ">", "<=", ">=", "!=", "<>", "BETWEEN", "LIKE", "GLOB"}
+
+# Covering candidates are only tried up to this many columns
+MAX_INDEX_COLUMNS = 6
+
+
+class Proposal:
+    """An index and the statements it would speed up."""
+
+    def __init__(self, table: str, columns: Tuple[str, ...]) -> None:
+        self.table = table
+        self.columns = columns
+        self.queries: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    def create_sql(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals over the statements this index helps, weighted by count."""
+        seen = sum(q["count"] for q in self.queries.values())
+        before = sum(q["cost_before"] * q["count"] for q in self.queries.values())
+        after = sum(q["cost_after"] * q["count"] for q in self.queries.values())
+        timed = [q for q in self.queries.values() if q["ms_before"] is not None]
+        ms_before = sum(q["ms_before"] * q["count"] for q in timed)
+        ms_after = sum(q["ms_after"] * q["count"] for q in timed)
+        return {
+            "index": self.create_sql(),
+            "statements": len(self.queries),
+            "occurrences": seen,
+            "cost_before": round(before, 3),
+            "cost_after": round(after, 3),
+            "estimated_speedup": round(before / after, 2) if after else None,
+            "measured_speedup": round(ms_before / ms_after, 2) if ms_after else None,
+            "queries": list(self.queries.values()),
+        }
+
+
+def load_traffic(paths: Iterable[str]) -> Counter:
+    """
+    Read statements from slow-query logs or plain statement files.
+
+    Args:
+        paths (Iterable[str]): Files or glob patterns; ``log.jsonl`` also
+            reads its rotated ``log.jsonl.1``, ``log.jsonl.2``...
+
+    Returns:
+        Counter: Occurrences per statement
+    """
+    traffic: Counter = Counter()
+    for pattern in paths:
+        files = sorted(set(glob.glob(pattern) + glob.glob(pattern + ".[0-9]*")))
+        if not files:
+            raise FileNotFoundError(f"No traffic files match {pattern}")
+        for path in files:
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if line.startswith("{"):
+                        traffic[json.loads(line)["query"]] += 1
+                    else:
+                        traffic[line] += 1
+    return traffic
+
+
+def _placeholders(sql: str) -> int:
+    return sum(1 for kind, value in tokenize(sql) if kind == OPERATOR and value == "?")
+
+
+def _plan(conn: sqlite3.Connection, sql: str) -> PlanEstimate:
+    params = (None,) * _placeholders(sql)
+    return estimate_plan(conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall())
+
+
+def _time_ms(conn: sqlite3.Connection, sql: str, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        conn.execute(sql).fetchall()
+    return (time.perf_counter() - started) * 1000 / loops
+
+
+def _aliases(
+    tokens: Sequence[Tuple[str, str]], tables: Dict[str, List[str]]
+) -> Dict[str, str]:
+    """Map every name a table goes by in the statement to the table."""
+    aliases = {}
+    for i, (kind, value) in enumerate(tokens):
+        name = value.lower()
+        if kind not in (WORD, IDENTIFIER) or name not in tables:
+            continue
+        if i == 0 or tokens[i - 1][1] not in ("FROM", "JOIN", ","):
+            continue
+        aliases[name] = name
+        following = tokens[i + 1 : i + 3]
+        if following and following[0][1] == "AS":
+            following = following[1:]
+        if following and following[0][0] in (WORD, IDENTIFIER):
+            alias = following[0][1]
+            if alias not in _CLAUSES and alias not in (
+                "INNER",
+                "LEFT",
+                "CROSS",
+                "NATURAL",
+            ):
+                aliases[alias.lower()] = name
+    return aliases
+
+
+def column_roles(
+    sql: str, table: str, tables: Dict[str, List[str]]
+) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """
+    Classify the columns of ``table`` used by ``sql``.
+
+    Returns:
+        Tuple[List[str], List[str], List[str], List[str]]: Equality-filtered,
+        range-filtered, grouped/sorted and selected columns, in query order
+    """
+    tokens = [(kind, value) for kind, value in tokenize(sql)]
+    aliases = _aliases(tokens, tables)
+    own_names = {alias for alias, name in aliases.items() if name == table}
+    columns = {column.lower() for column in tables[table]}
+    single_table = len(set(aliases.values())) <= 1
+
+    equality: List[str] = []
+    ranged: List[str] = []
+    ordered: List[str] = []
+    selected: List[str] = []
+    clause = None
+    for i, (kind, value) in enumerate(tokens):
+        if kind == WORD and value in _CLAUSES:
+            clause = value
+            continue
+        if kind not in (WORD, IDENTIFIER) or value.lower() not in columns:
+            continue
+        qualified = i >= 2 and tokens[i - 1][1] == "."
+        if qualified and tokens[i - 2][1].lower() not in own_names:
+            continue
+        if not qualified and not single_table:
+            continue
+        column = value.lower()
+        start = i - 2 if qualified else i
+        before = tokens[start - 1][1] if start else ""
+        after = tokens[i + 1][1] if i + 1 < len(tokens) else ""
+        if clause in ("WHERE", "ON", "HAVING"):
+            if after in _EQUALITY or before in _EQUALITY:
+                target = equality
+            elif after in _RANGE or before in _RANGE or after == "NOT":
+                target = ranged
+            else:
+                continue
+        elif clause in ("GROUP", "ORDER"):
+            target = ordered
+        elif clause == "SELECT":
+            target = selected
+        else:
+            continue
+        if column not in target:
+            target.append(column)
+    return equality, ranged, ordered, selected
+
+
+def candidates(
+    equality: List[str], ranged: List[str], ordered: List[str], selected: List[str]
+) -> List[Tuple[str, ...]]:
+    """Column lists worth trying: single keys, composites and covering forms."""
+    keys: List[Tuple[str, ...]] = [(c,) for c in equality + ranged + ordered]
+    if equality:
+        for tail in ranged + ordered:
+            if tail not in equality:
+                keys.append(tuple(equality) + (tail,))
+        keys.append(tuple(equality))
+    result: List[Tuple[str, ...]] = []
+    for key in keys:
+        covering = key + tuple(c for c in selected if c not in key)
+        for option in (key, covering):
+            if len(option) <= MAX_INDEX_COLUMNS and option not in result:
+                result.append(option)
+    return result
+
+
+def _scanned(estimate: PlanEstimate, aliases: Dict[str, str]) -> List[str]:
+    tables = []
+    for detail in estimate.plan:
+        if not detail.startswith("SCAN ") or detail == "SCAN CONSTANT ROW":
+            continue
+        name = detail.split()[1].lower()
+        table = aliases.get(name)
+        if table is not None and table not in tables:
+            tables.append(table)
+    return tables
+
+
+def advise(
+    db_path: str,
+    traffic: Counter,
+    loops: int = 50,
+) -> Tuple[List[Proposal], List[str]]:
+    """
+    Propose indexes that lower the estimated cost of ``traffic``.
+
+    Args:
+        db_path (str): Database to copy and plan against; it is not modified
+        traffic (Counter): Occurrences per statement
+        loops (int): Executions per measured timing
+
+    Returns:
+        Tuple[List[Proposal], List[str]]: Proposals, best first, and the
+        statements that could not be planned
+    """
+    source = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    scratch = sqlite3.connect(":memory:")
+    try:
+        source.backup(scratch)
+    finally:
+        source.close()
+
+    tables = {
+        name.lower(): [
+            row[1] for row in scratch.execute(f'PRAGMA table_info("{name}")')
+        ]
+        for (name,) in scratch.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )
+    }
+
+    proposals: Dict[Tuple[str, Tuple[str, ...]], Proposal] = {}
+    failed = []
+    for sql, count in traffic.most_common():
+        tokens = tokenize(sql)
+        if not tokens or tokens[0].value not in ("SELECT", "WITH"):
+            failed.append(sql)
+            continue
+        try:
+            baseline = _plan(scratch, sql)
+        except sqlite3.Error:
+            failed.append(sql)
+            continue
+        runnable = not _placeholders(sql)
+        aliases = _aliases(list(tokens), tables)
+        for table in _scanned(baseline, aliases):
+            best: Optional[Tuple[float, Tuple[str, ...]]] = None
+            for columns in candidates(*column_roles(sql, table, tables)):
+                scratch.execute(
+                    f"CREATE INDEX advisor_candidate ON {table} ({', '.join(columns)})"
+                )
+                try:
+                    cost = _plan(scratch, sql).cost
+                finally:
+                    scratch.execute("DROP INDEX advisor_candidate")
+                if cost < baseline.cost and (best is None or cost < best[0]):
+                    best = (cost, columns)
+            if best is None:
+                continue
+
+            cost, columns = best
+            ms_before = ms_after = None
+            if runnable:
+                ms_before = _time_ms(scratch, sql, loops)
+                scratch.execute(
+                    f"CREATE INDEX advisor_candidate ON {table} ({', '.join(columns)})"
+                )
+                try:
+                    ms_after = _time_ms(scratch, sql, loops)
+                finally:
+                    scratch.execute("DROP INDEX advisor_candidate")
+            proposal = proposals.setdefault((table, columns), Proposal(table, columns))
+            proposal.queries[sql] = {
+                "query": sql,
+                "count": count,
+                "cost_before": baseline.cost,
+                "cost_after": cost,
+                "ms_before": None if ms_before is None else round(ms_before, 4),
+                "ms_after": None if ms_after is None else round(ms_after, 4),
+            }
+    scratch.close()
+
+    ranked = sorted(
+        proposals.values(),
+        key=lambda p: p.summary()["cost_before"] - p.summary()["cost_after"],
+        reverse=True,
+    )
+    return ranked, failed
+
+
+def print_report(proposals: List[Proposal], failed: List[str], statements: int) -> None:
+    print(
+        f"Replayed {statements} distinct statement(s); {len(proposals)} index proposal(s)"
+    )
+    for proposal in proposals:
+        summary = proposal.summary()
+        print()
+        print(f"  {summary['index']};")
+        print(
+            f"    helps {summary['statements']} statement(s), seen "
+            f"{summary['occurrences']} time(s); estimated cost "
+            f"{summary['cost_before']:g} -> {summary['cost_after']:g} "
+            f"({summary['estimated_speedup']}x)"
+        )
+        if summary["measured_speedup"] is not None:
+            print(f"    measured on the copy: {summary['measured_speedup']}x faster")
+        for query in summary["queries"]:
+            print(f"    - {query['query'][:100]}")
+    if failed:
+        print()
+        print(f"Skipped {len(failed)} statement(s) that are not plannable SELECTs")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("traffic", nargs="*", help="slow-query logs or statement files")
+    parser.add_argument(
+        "--query", action="append", default=[], help="a statement to replay"
+    )
+    parser.add_argument(
+        "--db", default=None, help=f"database to plan against (default {DEFAULT_DB})"
+    )
+    parser.add_argument("--loops", type=int, default=50, help="executions per timing")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument(
+        "--sql", action="store_true", help="print CREATE INDEX statements only"
+    )
+    args = parser.parse_args()
+
+    db_path = args.db
+    paths = list(args.traffic)
+    if db_path is None or not paths:
+        try:
+            from config import Config
+
+            db_path = db_path or Config.DATABASE_URL
+            if not paths and not args.query and Config.SLOW_QUERY_LOG_FILE:
+                paths = [Config.SLOW_QUERY_LOG_FILE.replace("{pid}", "*")]
+        except ImportError:
+            db_path = db_path or DEFAULT_DB
+    if not paths and not args.query:
+        parser.error("no traffic: pass log files, --query, or set SLOW_QUERY_LOG_FILE")
+    if not os.path.exists(db_path):
+        parser.error(f"database {db_path} not found")
+
+    try:
+        traffic = load_traffic(paths)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    traffic.update(args.query)
+
+    proposals, failed = advise(db_path, traffic, args.loops)
+    if args.sql:
+        for proposal in proposals:
+            print(proposal.create_sql() + ";")
+    elif args.json:
+        json.dump(
+            {"proposals": [p.summary() for p in proposals], "skipped": failed},
+            sys.stdout,
+            indent=2,
+        )
+        print()
+    else:
+        print_report(proposals, failed, len(traffic))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test with a latency regression gate
+
+Boots the app under gunicorn (with gunicorn.conf.py) on a free local port,
+drives ``/``, ``/health``, ``/projects`` and a mixed corpus of ``/query``
+bodies from concurrent keep-alive clients, and reports requests per second
+and p50/p95/p99 latency per endpoint.
+
+Run with:
+    python loadtest.py --save-baseline       # record loadtest_baseline.json
+    python loadtest.py                       # compare against it; exit 1 on
+                                             # a regression past --threshold
+    python loadtest.py --url http://host:port   # drive a running server
+
+Each metric is the median of ``--runs`` back-to-back runs, for the baseline
+and for the comparison alike. On a shared machine single runs differ by
+about 30%, so the gate only catches regressions larger than that noise.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_BASELINE = "loadtest_baseline.json"
+
+# Statuses that count as a correct answer; anything else is an error
+EXPECTED_STATUS = {200, 304, 400}
+
+# Server settings that keep admission control out of the measurement
+UNLIMITED_ADMISSION = {"ADMISSION_RATE": "0", "ADMISSION_MAX_CONCURRENT": "0"}
+
+# /query traffic: the query builder's examples, other formats and rejects
+QUERY_CORPUS = [
+    {"query": "SELECT * FROM projects;"},
+    {"query": "SELECT name FROM skills WHERE category = 'Programming';"},
+    {"query": "SELECT degree, institution FROM education;"},
+    {"query": "SELECT job_title, company FROM experience WHERE start_year > 2020;"},
+    {"query": "SELECT name, email FROM clients WHERE age > 25;"},
+    {"query": "SELECT p.name, s.name FROM projects p JOIN skills s ON p.id = s.id"},
+    {"query": "SELECT category, COUNT(*) FROM skills GROUP BY category"},
+    {"query": "SELECT * FROM clients", "format": "columnar"},
+    {"query": "SELECT * FROM experience ORDER BY start_year DESC"},
+    {"query": "SELECT * FROM projects WHERE id = 1; DROP TABLE projects; --"},
+    {"query": "SELECT * FROM projects WHERE name = 'test' OR '1'='1'"},
+]
+
+# (endpoint label, method, path, weight); /query bodies come from the corpus
+SCENARIOS = [
+    ("GET /", "GET", "/", 1),
+    ("GET /health", "GET", "/health", 1),
+    ("GET /projects", "GET", "/projects", 2),
+    ("POST /query", "POST", "/query", 6),
+]
+
+# Metrics compared against the baseline: (key, higher_is_better)
+GATE_HELP = (
+    "The gate compares the median of --runs runs per endpoint with the "
+    "baseline and fails when a metric is worse by more than --threshold or "
+    "errors increased. Single runs vary by about 30% on a shared machine, so "
+    "smaller regressions are not detected; keep --threshold above the noise."
+)
+
+GATED_METRICS = [("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)]
+
+
+def free_port() -> int:
+    """Pick a currently unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 15.0) -> None:
+    """Poll ``/health`` until the server answers or ``timeout`` passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/health", timeout=1).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (0.0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def start_server(port: int, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """
+    Start gunicorn with the shared configuration on ``port``.
+
+    Admission control is switched off: every simulated client shares one
+    address, so a per-IP limit would measure 429s instead of the server.
+    """
+    cmd = [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app:app"]
+    server_env = dict(
+        os.environ,
+        PORT=str(port),
+        **{**UNLIMITED_ADMISSION, **(env or {})},
+    )
+    return subprocess.Popen(
+        cmd,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def _schedule(seed: int) -> List[Tuple[str, str, str, Optional[bytes]]]:
+    """Weighted, shuffled request sequence for one client."""
+    rng = random.Random(seed)
+    requests = []
+    for label, method, path, weight in SCENARIOS:
+        for _ in range(weight):
+            if method == "POST":
+                body = json.dumps(rng.choice(QUERY_CORPUS)).encode()
+            else:
+                body = None
+            requests.append((label, method, path, body))
+    rng.shuffle(requests)
+    return requests
+
+
+def run_load(
+    base_url: str,
+    concurrency: int = 8,
+    duration: float = 10.0,
+    warmup: float = 2.0,
+    seed: int = 0,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Drive the server and collect per-endpoint results.
+
+    Args:
+        base_url (str): Server root, e.g. ``http://127.0.0.1:5000``
+        concurrency (int): Number of concurrent keep-alive clients
+        duration (float): Measured seconds
+        warmup (float): Unmeasured seconds before measuring
+        seed (int): Seed for the request mix
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per endpoint: requests, errors, rps,
+        p50_ms, p95_ms and p99_ms
+    """
+    target = urllib.parse.urlsplit(base_url)
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {label: [] for label, *_ in SCENARIOS}
+    errors: Dict[str, int] = {label: 0 for label, *_ in SCENARIOS}
+    measure_from = time.monotonic() + warmup
+    stop = measure_from + duration
+
+    def client(index: int) -> None:
+        schedule = _schedule(seed + index)
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        local: Dict[str, List[float]] = {label: [] for label in latencies}
+        failed: Dict[str, int] = {label: 0 for label in latencies}
+        position = 0
+        while time.monotonic() < stop:
+            label, method, path, body = schedule[position % len(schedule)]
+            position += 1
+            headers = {"Content-Type": "application/json"} if body else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status in EXPECTED_STATUS
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            elapsed = time.perf_counter() - started
+            if time.monotonic() < measure_from:
+                continue
+            if ok:
+                local[label].append(elapsed)
+            else:
+                failed[label] += 1
+        conn.close()
+        with lock:
+            for label in latencies:
+                latencies[label].extend(local[label])
+                errors[label] += failed[label]
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for label, samples in latencies.items():
+        results[label] = {
+            "requests": len(samples),
+            "errors": errors[label],
+            "rps": len(samples) / duration,
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        }
+    return results
+
+
+def median_results(runs: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Combine several runs into one result per endpoint, metric by metric.
+
+    Args:
+        runs (List[Dict[str, Dict[str, Any]]]): Results of ``run_load``
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Per endpoint, the (low) median of each
+        value, so counts stay whole numbers
+    """
+    return {
+        label: {
+            key: statistics.median_low(run[label][key] for run in runs) for key in row
+        }
+        for label, row in runs[0].items()
+    }
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float,
+) -> List[str]:
+    """
+    List the metrics that regressed past ``threshold`` relative to baseline.
+
+    Args:
+        baseline (Dict[str, Dict[str, Any]]): Saved per-endpoint results
+        current (Dict[str, Dict[str, Any]]): This run's per-endpoint results
+        threshold (float): Allowed relative change, e.g. 0.25 for 25%
+
+    Returns:
+        List[str]: One message per regression; empty if none
+    """
+    regressions = []
+    for label, before in baseline.items():
+        after = current.get(label)
+        if after is None:
+            regressions.append(f"{label}: missing from this run")
+            continue
+        if after["errors"] > before.get("errors", 0):
+            regressions.append(
+                f"{label}: errors {before.get('errors', 0)} -> {after['errors']}"
+            )
+        for key, higher_is_better in GATED_METRICS:
+            old, new = before[key], after[key]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    f"{label}: {key} {old:.2f} -> {new:.2f} ({change:+.0%})"
+                )
+    return regressions
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(
+        f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    for label, row in results.items():
+        print(
+            f"{label:<16}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], epilog=GATE_HELP
+    )
+    parser.add_argument("--url", help="drive a running server instead of booting one")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="runs whose per-metric median is reported and gated (default 3)",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the median result as the baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="allowed relative regression per metric (default 0.5)",
+    )
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = start_server(port)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url)
+        print(
+            f"Driving {base_url}: {args.concurrency} clients, "
+            f"{args.warmup:g}s warm-up, {args.duration:g}s measured, "
+            f"median of {args.runs} run(s)"
+        )
+        results = median_results(
+            [
+                run_load(
+                    base_url, args.concurrency, args.duration, args.warmup, args.seed
+                )
+                for _ in range(max(1, args.runs))
+            ]
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_report(results)
+
+    if args.save_baseline:
+        document = {
+            "meta": {
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "runs": args.runs,
+                "cpu_count": os.cpu_count(),
+                "python": platform.python_version(),
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "endpoints": results,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("concurrency") != args.concurrency:
+        print("Warning: baseline was recorded at a different concurrency")
+    regressions = compare(baseline["endpoints"], results, args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%} of {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Request Metrics
+
+Per-stage request timing (``Server-Timing``) and process-shared latency
+histograms rendered in the Prometheus text format.
+
+Counters live in an anonymous shared memory mapping created at import. When
+gunicorn preloads the app, every forked worker inherits the same mapping, so
+``/metrics`` served by any worker reports the totals of all of them. Each
+process writes only to its own slot, so no lock is shared between workers;
+a new worker adopts the slot of an exited one and keeps adding to it, which
+keeps every counter monotonic across worker restarts.
+"""
+
+import bisect
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+# Upper bounds of the latency histogram buckets, in seconds (+Inf is implicit)
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class StageTimer:
+    """Durations of the named stages of one request."""
+
+    __slots__ = ("started", "stages")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the ``with`` block and add it to stage ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add ``seconds`` to stage ``name``."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """
+        Format the stages as a ``Server-Timing`` header value.
+
+        Args:
+            total (Optional[float]): Request duration to append as ``total``
+
+        Returns:
+            str: e.g. ``validate;dur=0.041, execute;dur=0.210, total;dur=1.3``
+        """
+        parts = [
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()
+        ]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+class MetricsRegistry:
+    """
+    Request counters and latency histograms shared by forked processes.
+
+    Args:
+        endpoints (Sequence[str]): Endpoint label values; others count as
+            the last entry
+        stages (Sequence[str]): Stage label values; unknown stages are ignored
+        buckets (Sequence[float]): Histogram bucket upper bounds in seconds
+        slots (int): Maximum number of processes writing at the same time
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        stages: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        slots: int = 64,
+    ) -> None:
+        self.endpoints = tuple(endpoints)
+        self.stages = tuple(stages)
+        self.buckets = tuple(sorted(buckets))
+        self.slots = max(1, int(slots))
+        self._endpoint_index = {name: i for i, name in enumerate(self.endpoints)}
+        self._stage_index = {name: i for i, name in enumerate(self.stages)}
+
+        # One histogram: a count per bucket (+Inf last), then sum and count
+        self._hist_len = len(self.buckets) + 3
+        self._requests_offset = 0
+        self._latency_offset = len(self.endpoints) * len(STATUS_CLASSES)
+        self._stage_offset = self._latency_offset + len(self.endpoints) * self._hist_len
+        self._slot_len = (
+            self._stage_offset + len(self.endpoints) * len(self.stages) * self._hist_len
+        )
+
+        pid_bytes = 8 * self.slots
+        self._mmap = mmap.mmap(-1, pid_bytes + 8 * self._slot_len * self.slots)
+        view = memoryview(self._mmap)
+        self._pids = view[:pid_bytes].cast("q")
+        self._values = view[pid_bytes:].cast("d")
+
+        self._claim_lock = multiprocessing.Lock()
+        self._lock = threading.Lock()
+        self._slot_pid: Optional[int] = None
+        self._slot: Optional[int] = None
+        self.dropped = 0
+
+    def _own_slot(self) -> Optional[int]:
+        """This process's slot, claimed on first use after a fork."""
+        pid = os.getpid()
+        if self._slot_pid == pid:
+            return self._slot
+        slot = None
+        if self._claim_lock.acquire(timeout=1.0):
+            try:
+                for index in range(self.slots):
+                    owner = self._pids[index]
+                    if owner in (0, pid) or not _is_running(owner):
+                        self._pids[index] = pid
+                        slot = index
+                        break
+            finally:
+                self._claim_lock.release()
+        self._slot_pid, self._slot = pid, slot
+        return slot
+
+    def _observe(self, base: int, seconds: float) -> None:
+        values = self._values
+        values[base + bisect.bisect_left(self.buckets, seconds)] += 1
+        values[base + len(self.buckets) + 1] += seconds
+        values[base + len(self.buckets) + 2] += 1
+
+    def observe_request(
+        self,
+        endpoint: str,
+        status: int,
+        duration: float,
+        stages: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Record one finished request.
+
+        Args:
+            endpoint (str): Endpoint label value
+            status (int): HTTP status code
+            duration (float): Request duration in seconds
+            stages (Optional[Dict[str, float]]): Seconds spent per stage
+        """
+        endpoint_index = self._endpoint_index.get(endpoint, len(self.endpoints) - 1)
+        status_index = min(max(status // 100 - 1, 0), len(STATUS_CLASSES) - 1)
+        with self._lock:
+            slot = self._own_slot()
+            if slot is None:
+                self.dropped += 1
+                return
+            base = slot * self._slot_len
+            self._values[
+                base
+                + self._requests_offset
+                + endpoint_index * len(STATUS_CLASSES)
+                + status_index
+            ] += 1
+            self._observe(
+                base + self._latency_offset + endpoint_index * self._hist_len, duration
+            )
+            for name, seconds in (stages or {}).items():
+                stage_index = self._stage_index.get(name)
+                if stage_index is None:
+                    continue
+                series = endpoint_index * len(self.stages) + stage_index
+                self._observe(
+                    base + self._stage_offset + series * self._hist_len, seconds
+                )
+
+    def _totals(self) -> List[float]:
+        """Sum every slot that has ever been written to."""
+        totals = [0.0] * self._slot_len
+        for slot in range(self.slots):
+            if not self._pids[slot]:
+                continue
+            base = slot * self._slot_len
+            chunk = self._values[base : base + self._slot_len]
+            for i, value in enumerate(chunk):
+                if value:
+                    totals[i] += value
+        return totals
+
+    def _histogram_lines(
+        self, name: str, labels: str, values: List[float], base: int
+    ) -> List[str]:
+        count = values[base + len(self.buckets) + 2]
+        if not count:
+            return []
+        lines = []
+        cumulative = 0.0
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for i, bound in enumerate(bounds):
+            cumulative += values[base + i]
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative:g}')
+        lines.append(
+            f"{name}_sum{{{labels}}} {values[base + len(self.buckets) + 1]:.6f}"
+        )
+        lines.append(f"{name}_count{{{labels}}} {count:g}")
+        return lines
+
+    def render(self) -> str:
+        """
+        Render every series in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text, ending with a newline
+        """
+        values = self._totals()
+        lines = [
+            "# HELP portfolio_requests_total Requests handled, by endpoint and "
+            "status class.",
+            "# TYPE portfolio_requests_total counter",
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            for s, status in enumerate(STATUS_CLASSES):
+                value = values[self._requests_offset + e * len(STATUS_CLASSES) + s]
+                if value:
+                    lines.append(
+                        f'portfolio_requests_total{{endpoint="{endpoint}",'
+                        f'status="{status}"}} {value:g}'
+                    )
+
+        lines += [
+            "# HELP portfolio_request_duration_seconds Request latency by endpoint.",
+            "# TYPE portfolio_request_duration_seconds histogram",
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            lines += self._histogram_lines(
+                "portfolio_request_duration_seconds",
+                f'endpoint="{endpoint}"',
+                values,
+                self._latency_offset + e * self._hist_len,
+            )
+
+        lines += [
+            "# HELP portfolio_stage_duration_seconds Time spent per request stage.",
+            "# TYPE portfolio_stage_duration_seconds histogram",
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            for s, stage in enumerate(self.stages):
+                series = e * len(self.stages) + s
+                lines += self._histogram_lines(
+                    "portfolio_stage_duration_seconds",
+                    f'endpoint="{endpoint}",stage="{stage}"',
+                    values,
+                    self._stage_offset + series * self._hist_len,
+                )
+
+        workers = sum(1 for slot in range(self.slots) if self._pids[slot])
+        lines += [
+            "# HELP portfolio_metrics_slots_used Processes that have recorded "
+            "metrics since startup.",
+            "# TYPE portfolio_metrics_slots_used gauge",
+            f"portfolio_metrics_slots_used {workers}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Zero every counter and release every slot."""
+        with self._lock:
+            self._mmap.seek(0)
+            self._mmap.write(bytes(len(self._mmap)))
+            self._slot_pid = self._slot = None
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations
+
+Versioned changes to ``portfolio.db``, tracked in ``PRAGMA user_version``.
+Pending migrations are applied by a deploy step (the Docker build runs this
+script, and gunicorn's ``when_ready`` hook applies them before forking
+workers), never by importing the app, so tests, benchmarks and local runs
+leave the database file alone. When the
+file is already current only a read-only connection is opened.
+
+Migrations are append-only: never edit one that has shipped, add a new
+version instead. ``index_advisor.py`` prints ``CREATE INDEX`` statements
+ready to paste into the next one.
+
+Run with:
+    python migrations.py                 # migrate portfolio.db
+    python migrations.py path/to/db      # migrate another copy
+"""
+
+import argparse
+import logging
+import sqlite3
+import sys
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = "portfolio.db"
+
+
+class Migration(NamedTuple):
+    """One schema version: the statements that bring the previous one to it."""
+
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(
+        1,
+        "secondary indexes for query-builder filters",
+        (
+            # Leading filter column, then the columns the builder's examples
+            # select, so those queries are answered from the index alone
+            "CREATE INDEX IF NOT EXISTS idx_skills_category "
+            "ON skills (category, name)",
+            "CREATE INDEX IF NOT EXISTS idx_experience_start_year "
+            "ON experience (start_year, end_year, job_title, company)",
+            "CREATE INDEX IF NOT EXISTS idx_experience_end_year "
+            "ON experience (end_year, start_year)",
+            "CREATE INDEX IF NOT EXISTS idx_clients_age "
+            "ON clients (age, name, email)",
+            "CREATE INDEX IF NOT EXISTS idx_education_institution "
+            "ON education (institution, degree)",
+        ),
+    ),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Current schema version of the database behind ``conn``."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(db_path: str, migrations: Sequence[Migration] = MIGRATIONS) -> int:
+    """
+    Bring ``db_path`` up to the latest schema version.
+
+    Each migration runs in its own ``BEGIN IMMEDIATE`` transaction together
+    with the version bump, and the version is re-read inside it, so two
+    processes starting at once apply every migration exactly once.
+
+    Args:
+        db_path (str): Path to the SQLite database file; it is not created
+        migrations (Sequence[Migration]): Migrations in version order
+
+    Returns:
+        int: Number of migrations applied
+
+    Raises:
+        sqlite3.Error: If the file is missing or read-only, or a migration
+            fails; that migration is rolled back and later ones are skipped
+    """
+    uri = Path(db_path).resolve().as_uri()
+    latest = migrations[-1].version if migrations else 0
+
+    reader = sqlite3.connect(uri + "?mode=ro", uri=True)
+    try:
+        if schema_version(reader) >= latest:
+            return 0
+    finally:
+        reader.close()
+
+    applied = 0
+    conn = sqlite3.connect(uri + "?mode=rw", uri=True, isolation_level=None)
+    try:
+        for migration in migrations:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if schema_version(conn) >= migration.version:
+                    conn.execute("ROLLBACK")
+                    continue
+                for statement in migration.statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            applied += 1
+            logger.info(
+                f"Applied migration {migration.version} ({migration.name}) "
+                f"to {db_path}"
+            )
+    finally:
+        conn.close()
+    return applied
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "db",
+        nargs="?",
+        default=DEFAULT_DB,
+        help=f"database file (default {DEFAULT_DB})",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        applied = apply_migrations(args.db)
+    except sqlite3.Error as e:
+        logger.error(f"Could not migrate {args.db}: {e}")
+        return 1
+    logger.info(f"{args.db} is at schema version {LATEST_VERSION} ({applied} applied)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
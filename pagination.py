@@ -0,0 +1,304 @@
+"""
+Cursor Pagination
+
+Opaque, signed continuation tokens for ``/query`` and ``/projects``.
+
+Single-table queries that select their table's ``id`` primary key are paged
+with keyset seeks (``WHERE id > ? ORDER BY id``), so every page costs the
+same as the first. Other queries (joins, aggregates, explicit ordering) are
+paged by position: the statement is re-run and the rows before the page
+skipped.
+"""
+
+import hashlib
+import sqlite3
+from contextlib import nullcontext
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from metrics import StageTimer
+from sql_validator import IDENTIFIER, NUMBER, OPERATOR, STRING, WORD, Token
+
+KEYSET = "k"
+OFFSET = "o"
+
+# Clauses that make id order differ from the query's own order or grouping
+_KEYSET_BLOCKERS = frozenset(
+    {"JOIN", "ORDER", "GROUP", "LIMIT", "OFFSET", "DISTINCT", "UNION", "OVER"}
+)
+
+# Keywords after which a bare ``id`` is a column reference, not an alias
+_ID_PRECEDERS = frozenset({"SELECT", "WHERE", "AND", "OR", "NOT", "ON", "BY"})
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a continuation token that is malformed or tampered with."""
+
+
+class Page:
+    """One page of results plus the state needed to fetch the next one."""
+
+    __slots__ = ("columns", "rows", "next_state")
+
+    def __init__(
+        self,
+        columns: List[str],
+        rows: List[Tuple[Any, ...]],
+        next_state: Optional[Dict[str, Any]],
+    ) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.next_state = next_state
+
+
+class CursorCodec:
+    """
+    Sign and verify continuation tokens.
+
+    The scope is part of the signature, so a token issued for one endpoint
+    or query (see ``query_digest``) is rejected by any other.
+
+    Args:
+        secret_key (str): Key used to sign tokens (the app's ``SECRET_KEY``)
+    """
+
+    def __init__(self, secret_key: str) -> None:
+        self._secret_key = secret_key
+
+    def encode(self, scope: str, state: Dict[str, Any]) -> str:
+        """Serialize ``state`` into an opaque token valid only for ``scope``."""
+        return URLSafeSerializer(self._secret_key, salt=scope).dumps(state)
+
+    def decode(self, scope: str, token: str) -> Dict[str, Any]:
+        """
+        Recover the state from a token.
+
+        Raises:
+            InvalidCursorError: If the token is not a valid token for ``scope``
+        """
+        if not isinstance(token, str):
+            raise InvalidCursorError("Invalid cursor")
+        try:
+            state = URLSafeSerializer(self._secret_key, salt=scope).loads(token)
+        except (BadSignature, TypeError, ValueError) as e:
+            raise InvalidCursorError("Invalid cursor") from e
+        if not isinstance(state, dict):
+            raise InvalidCursorError("Invalid cursor")
+        return state
+
+
+def query_digest(tokens: Sequence[Token]) -> str:
+    """Short digest binding a token to the query it was issued for."""
+    return hashlib.sha256(repr(tuple(tokens)).encode()).hexdigest()[:16]
+
+
+def id_keyed_tables(conn: sqlite3.Connection) -> frozenset:
+    """
+    Find the tables whose primary key is a single, never-null ``id`` column.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database to inspect
+
+    Returns:
+        frozenset: Lower-cased table names
+    """
+    keyed = set()
+    tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for (table,) in tables:
+        key = conn.execute(
+            'SELECT name, type, "notnull" FROM pragma_table_info(?) WHERE pk > 0',
+            (table,),
+        ).fetchall()
+        if len(key) == 1 and key[0][0].lower() == "id":
+            # INTEGER PRIMARY KEY is the rowid; other key types may hold NULLs
+            if key[0][1].upper() == "INTEGER" or key[0][2]:
+                keyed.add(table.lower())
+    return frozenset(keyed)
+
+
+def supports_keyset(
+    tokens: Sequence[Token], allowed_tables: frozenset, keyed_tables: frozenset
+) -> bool:
+    """
+    Check whether a query can be paged by seeking on its table's ``id``.
+
+    Args:
+        tokens (Sequence[Token]): The query's tokens (comments excluded),
+            case-folded or not
+        allowed_tables (frozenset): Lower-cased table names
+        keyed_tables (frozenset): Lower-cased names of the tables whose
+            primary key is ``id`` (see ``id_keyed_tables``)
+
+    Returns:
+        bool: True for single-table, single-SELECT queries without ordering,
+        grouping or limits that return the table's ``id`` exactly once and
+        no column name twice, where ``id`` is never used as an alias
+    """
+    selects = 0
+    tables = set()
+    items: List[List[Token]] = [[]]
+    in_select_list = False
+    depth = 0
+    previous = None
+    for token in tokens:
+        kind, value = token
+        if kind == WORD:
+            value = value.upper()
+            if value in _KEYSET_BLOCKERS:
+                return False
+            if value == "SELECT":
+                selects += 1
+                in_select_list = True
+                previous = Token(kind, value)
+                continue
+            if value == "FROM" and depth == 0:
+                in_select_list = False
+        if kind in (WORD, IDENTIFIER):
+            if value.lower() == "id" and _may_alias(previous):
+                return False
+            if value.lower() in allowed_tables:
+                tables.add(value.lower())
+        if in_select_list:
+            if kind == OPERATOR and value in ("(", ")"):
+                depth += 1 if value == "(" else -1
+            if kind == OPERATOR and value == "," and depth == 0:
+                items.append([])
+            else:
+                items[-1].append(Token(kind, value))
+        previous = Token(kind, value)
+    if selects != 1 or len(tables) != 1 or not tables <= keyed_tables:
+        return False
+
+    names = [_column_name(item) for item in items]
+    if "*" in names:
+        # Every column of one table: names are unique and include id
+        return len(names) == 1
+    return names.count("id") == 1 and len(set(names)) == len(names)
+
+
+def _column_name(item: Sequence[Token]) -> Hashable:
+    """
+    Lower-cased name of a select-list item's result column, ``*`` for every
+    column, or the item's tokens when the name is the expression text.
+    """
+    if not item:
+        return ()
+    last = item[-1]
+    if last.kind == OPERATOR and last.value == "*":
+        return "*"
+    if last.kind in (WORD, IDENTIFIER):
+        if len(item) == 1 or (len(item) == 3 and item[1].value == "."):
+            return last.value.lower()
+        if _may_alias(item[-2]):
+            return last.value.lower()
+    return tuple((kind, value.lower()) for kind, value in item)
+
+
+def _may_alias(previous: Optional[Token]) -> bool:
+    """Whether an ``id`` word after ``previous`` could be a column alias."""
+    if previous is None:
+        return False
+    if previous.kind == WORD:
+        return previous.value not in _ID_PRECEDERS
+    return previous.kind in (IDENTIFIER, NUMBER, STRING) or previous.value == ")"
+
+
+def _strip_statement(sql: str) -> str:
+    sql = sql.rstrip()
+    return sql[:-1] if sql.endswith(";") else sql
+
+
+def fetch_page(
+    conn: sqlite3.Connection,
+    sql: str,
+    state: Optional[Dict[str, Any]],
+    page_size: int,
+    keyset: bool,
+    timer: Optional[StageTimer] = None,
+) -> Page:
+    """
+    Fetch one page of a validated query.
+
+    Args:
+        conn (sqlite3.Connection): Connection to run on
+        sql (str): The validated query
+        state (Optional[Dict[str, Any]]): Decoded cursor state; None for the
+            first page
+        page_size (int): Maximum rows in the page
+        keyset (bool): Whether the query can be paged by seeking on ``id``
+            (see ``supports_keyset``); only consulted for the first page
+        timer (Optional[StageTimer]): Receives ``execute`` and ``fetch`` times
+
+    Returns:
+        Page: Columns, rows and the next page's state (None on the last page)
+    """
+
+    def stage(name: str):
+        return timer.stage(name) if timer is not None else nullcontext()
+
+    cursor = conn.cursor()
+    cursor.row_factory = None
+
+    if state is None:
+        if keyset:
+            state = {"m": KEYSET}
+        else:
+            with stage("execute"):
+                cursor.execute(sql)
+            columns = [desc[0] for desc in cursor.description or ()]
+            with stage("fetch"):
+                rows = cursor.fetchmany(page_size + 1)
+            return _page(columns, rows, page_size, {"m": OFFSET, "o": 0})
+
+    if state.get("m") == KEYSET:
+        body = _strip_statement(sql)
+        with stage("execute"):
+            if "a" in state:
+                cursor.execute(
+                    f"SELECT * FROM (\n{body}\n) WHERE id > ? ORDER BY id LIMIT ?",
+                    (state["a"], page_size + 1),
+                )
+            else:
+                cursor.execute(
+                    f"SELECT * FROM (\n{body}\n) ORDER BY id LIMIT ?",
+                    (page_size + 1,),
+                )
+        columns = [desc[0] for desc in cursor.description]
+        with stage("fetch"):
+            rows = cursor.fetchmany(page_size + 1)
+        return _page(columns, rows, page_size, state)
+
+    offset = int(state.get("o", 0))
+    with stage("execute"):
+        cursor.execute(sql)
+    columns = [desc[0] for desc in cursor.description or ()]
+    with stage("fetch"):
+        skipped = 0
+        while skipped < offset:
+            chunk = cursor.fetchmany(min(1000, offset - skipped))
+            if not chunk:
+                break
+            skipped += len(chunk)
+        rows = cursor.fetchmany(page_size + 1)
+    return _page(columns, rows, page_size, state)
+
+
+def _page(
+    columns: List[str],
+    rows: List[Tuple[Any, ...]],
+    page_size: int,
+    state: Dict[str, Any],
+) -> Page:
+    if len(rows) <= page_size:
+        return Page(columns, rows, None)
+    rows = rows[:page_size]
+    if state["m"] == KEYSET:
+        # The column is named as the query spells it, e.g. ``ID``
+        position = [column.lower() for column in columns].index("id")
+        next_state = {"m": KEYSET, "a": rows[-1][position]}
+    else:
+        next_state = {"m": OFFSET, "o": int(state.get("o", 0)) + page_size}
+    return Page(columns, rows, next_state)
@@ -0,0 +1,188 @@
+"""
+Query Plan Cost Guard
+
+Runs ``EXPLAIN QUERY PLAN`` on validated user SQL and estimates its cost
+before execution, so cross joins and other unindexed nested loops are
+rejected up front instead of being left to the execution deadline.
+
+The estimate is deliberately coarse: every full ``SCAN`` multiplies the
+nested-loop cost by ``scan_cost``, an index ``SEARCH`` leaves it unchanged,
+and each temp B-tree (sorting or de-duplicating) adds ``temp_btree_cost``
+times the rows reaching it. Correlated subqueries are costed inside the loop
+that drives them.
+"""
+
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from cache import LRUCache
+
+
+class QueryTooExpensiveError(Exception):
+    """Raised when a query's estimated plan cost exceeds the budget."""
+
+
+class PlanEstimate(NamedTuple):
+    """Summary of a query plan and its estimated cost."""
+
+    cost: float
+    full_scans: int
+    temp_btrees: int
+    nested_depth: int
+    plan: Tuple[str, ...]
+
+    def describe(self) -> str:
+        """Human-readable summary used in error messages."""
+        return (
+            f"{self.full_scans} full table scan(s), "
+            f"nested-loop depth {self.nested_depth}, "
+            f"{self.temp_btrees} temp B-tree(s)"
+        )
+
+
+def estimate_plan(
+    plan_rows: List[Tuple[int, int, int, str]],
+    scan_cost: float = 10.0,
+    temp_btree_cost: float = 5.0,
+) -> PlanEstimate:
+    """
+    Estimate the cost of an ``EXPLAIN QUERY PLAN`` result.
+
+    Args:
+        plan_rows (List[Tuple[int, int, int, str]]): (id, parent, notused,
+            detail) rows as returned by SQLite
+        scan_cost (float): Multiplier applied for every full table scan
+        temp_btree_cost (float): Weight of each temp B-tree per row sorted
+
+    Returns:
+        PlanEstimate: Estimated cost and the counts it was derived from
+    """
+    children: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+    for node_id, parent, _, detail in plan_rows:
+        children[parent].append((node_id, detail))
+
+    totals = {"scans": 0, "temp": 0, "depth": 0}
+
+    def walk(parent: int, outer: float, depth: int) -> float:
+        """Cost of the loop nest under ``parent``, driven ``outer`` times."""
+        factor = outer
+        loops = 0
+        cost = 0.0
+        for node_id, detail in children.get(parent, ()):
+            if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW":
+                totals["scans"] += 1
+                factor *= scan_cost
+                loops += 1
+            elif detail.startswith("SEARCH "):
+                loops += 1
+            elif "TEMP B-TREE" in detail:
+                totals["temp"] += 1
+                cost += temp_btree_cost * factor
+            totals["depth"] = max(totals["depth"], depth + loops)
+            if node_id in children:
+                if detail.startswith("CORRELATED"):
+                    cost += walk(node_id, factor, depth + loops)
+                else:
+                    cost += walk(node_id, 1.0, 0)
+        return cost + (factor if loops else 0.0)
+
+    cost = walk(0, 1.0, 0)
+    return PlanEstimate(
+        cost=cost,
+        full_scans=totals["scans"],
+        temp_btrees=totals["temp"],
+        nested_depth=totals["depth"],
+        plan=tuple(detail for _, _, _, detail in plan_rows),
+    )
+
+
+class QueryCostGuard:
+    """
+    Reject queries whose estimated plan cost exceeds a budget.
+
+    Args:
+        max_cost (float): Highest accepted estimated cost; 0 disables the guard
+        scan_cost (float): Multiplier applied for every full table scan
+        temp_btree_cost (float): Weight of each temp B-tree per row sorted
+        cache_size (int): Number of plan estimates kept per process
+    """
+
+    def __init__(
+        self,
+        max_cost: float,
+        scan_cost: float = 10.0,
+        temp_btree_cost: float = 5.0,
+        cache_size: int = 256,
+    ) -> None:
+        self.max_cost = max_cost
+        self.scan_cost = scan_cost
+        self.temp_btree_cost = temp_btree_cost
+        self._cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def estimate(
+        self, conn: sqlite3.Connection, sql: str, key: Optional[Hashable] = None
+    ) -> PlanEstimate:
+        """
+        Plan ``sql`` on ``conn`` and estimate its cost.
+
+        Args:
+            conn (sqlite3.Connection): Connection to plan on
+            sql (str): A validated SELECT statement
+            key (Optional[Hashable]): Cache key (e.g. canonical query plus
+                database fingerprint); None skips the cache
+
+        Returns:
+            PlanEstimate: The (possibly cached) estimate
+        """
+        if key is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+        estimate = estimate_plan(rows, self.scan_cost, self.temp_btree_cost)
+        if key is not None:
+            self._cache.put(key, estimate)
+        return estimate
+
+    def check(
+        self, conn: sqlite3.Connection, sql: str, key: Optional[Hashable] = None
+    ) -> Optional[PlanEstimate]:
+        """
+        Raise if ``sql`` is estimated to cost more than ``max_cost``.
+
+        Returns:
+            Optional[PlanEstimate]: The estimate, or None if the guard is off
+
+        Raises:
+            QueryTooExpensiveError: If the estimate exceeds the budget
+        """
+        if not self.max_cost:
+            return None
+        estimate = self.estimate(conn, sql, key)
+        if estimate.cost > self.max_cost:
+            with self._lock:
+                self.rejected += 1
+            raise QueryTooExpensiveError(
+                f"Query is too expensive to run (estimated cost "
+                f"{estimate.cost:g} exceeds {self.max_cost:g}): "
+                f"{estimate.describe()}. Add WHERE conditions on id or "
+                f"reduce the number of joined tables."
+            )
+        return estimate
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Rejection count and plan-cache counters.
+
+        Returns:
+            Dict[str, Any]: max_cost, rejected and ``LRUCache.stats`` counters
+        """
+        with self._lock:
+            rejected = self.rejected
+        return {"max_cost": self.max_cost, "rejected": rejected, **self._cache.stats()}
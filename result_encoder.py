@@ -0,0 +1,119 @@
+"""
+Query Result Encoders
+
+Encode ``/query`` results straight from cursor tuples to JSON bytes. The
+output is byte-for-byte what Flask's compact ``jsonify`` produces for the
+same payload (sorted keys, ASCII escapes, trailing newline), without first
+copying every ``sqlite3.Row`` into a tuple and walking the response dict
+through the JSON provider.
+"""
+
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ROWS = "rows"
+COLUMNAR = "columnar"
+FORMATS = frozenset({ROWS, COLUMNAR})
+
+_dumps = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def fetch_tuples(cursor: sqlite3.Cursor, limit: int) -> List[Tuple[Any, ...]]:
+    """
+    Fetch up to ``limit`` rows as plain tuples, bypassing ``sqlite3.Row``.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor whose statement has been executed
+        limit (int): Maximum number of rows to fetch
+
+    Returns:
+        List[Tuple[Any, ...]]: Rows as tuples
+    """
+    cursor.row_factory = None
+    return cursor.fetchmany(limit)
+
+
+def _encode_object(fields: Dict[str, Any]) -> bytes:
+    """Encode a flat mapping with sorted keys, as compact ``jsonify`` does."""
+    members = ",".join(f"{_dumps(key)}:{_dumps(fields[key])}" for key in sorted(fields))
+    return f"{{{members}}}\n".encode()
+
+
+def encode_rows(
+    columns: Sequence[str],
+    rows: List[Tuple[Any, ...]],
+    next_cursor: Optional[str] = None,
+) -> bytes:
+    """
+    Encode a row-major result: ``{"columns", "next_cursor", "row_count", "rows"}``.
+
+    Args:
+        columns (Sequence[str]): Column names
+        rows (List[Tuple[Any, ...]]): Result rows
+        next_cursor (Optional[str]): Continuation token, None on the last page
+
+    Returns:
+        bytes: JSON document followed by a newline
+    """
+    return _encode_object(
+        {
+            "columns": list(columns),
+            "next_cursor": next_cursor,
+            "row_count": len(rows),
+            "rows": rows,
+        }
+    )
+
+
+def encode_columnar(
+    columns: Sequence[str],
+    rows: List[Tuple[Any, ...]],
+    next_cursor: Optional[str] = None,
+) -> bytes:
+    """
+    Encode a column-major result: one array per column in ``data``.
+
+    ``data[i]`` holds the values of ``columns[i]``; a list is used rather
+    than a mapping because joined tables can repeat column names.
+
+    Args:
+        columns (Sequence[str]): Column names
+        rows (List[Tuple[Any, ...]]): Result rows
+        next_cursor (Optional[str]): Continuation token, None on the last page
+
+    Returns:
+        bytes: JSON document followed by a newline
+    """
+    data = list(zip(*rows)) if rows else [[] for _ in columns]
+    return _encode_object(
+        {
+            "columns": list(columns),
+            "data": data,
+            "next_cursor": next_cursor,
+            "row_count": len(rows),
+        }
+    )
+
+
+def encode_result(
+    columns: Sequence[str],
+    rows: List[Tuple[Any, ...]],
+    fmt: str = ROWS,
+    next_cursor: Optional[str] = None,
+) -> bytes:
+    """
+    Encode a result in the requested format.
+
+    Args:
+        columns (Sequence[str]): Column names
+        rows (List[Tuple[Any, ...]]): Result rows
+        fmt (str): ``rows`` (default) or ``columnar``
+        next_cursor (Optional[str]): Continuation token, None on the last page
+
+    Returns:
+        bytes: JSON document followed by a newline
+    """
+    if fmt == COLUMNAR:
+        return encode_columnar(columns, rows, next_cursor)
+    return encode_rows(columns, rows, next_cursor)
@@ -1,24 +1,37 @@
 #!/usr/bin/env python3
 """
 Simple Flask server startup for Railway deployment
-Direct Flask execution without gunicorn dependencies
+Hands over to gunicorn with gunicorn.conf.py when it is installed,
+otherwise runs Flask directly without gunicorn dependencies
 """
 import os
 import sys
+import importlib.util
+
+from startup import mark_launch
 
 def main():
-    print("=== Railway Deployment Debug Info ===")
-    print(f"Python version: {sys.version}")
-    print(f"Python executable: {sys.executable}")
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"Environment PORT: {os.environ.get('PORT', 'NOT SET')}")
-    print(f"Environment HOST: {os.environ.get('HOST', 'NOT SET')}")
-    print("=====================================")
+    # Startup timing (logged with the first response) starts here
+    mark_launch()
+    print(
+        f"Python {sys.version.split()[0]} ({sys.executable}) in {os.getcwd()}, "
+        f"PORT={os.environ.get('PORT', 'NOT SET')} HOST={os.environ.get('HOST', 'NOT SET')}"
+    )
+    
+    # Prefer gunicorn with the shared configuration (located, not imported:
+    # the exec'd interpreter imports it anyway)
+    if importlib.util.find_spec("gunicorn") is not None:
+        cmd = [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app:app"]
+        print(f"🚀 Starting gunicorn: {' '.join(cmd)}")
+        sys.stdout.flush()
+        os.execv(sys.executable, cmd)
+    print("gunicorn not installed, starting the Flask server directly")
     
     # Import the Flask app
     try:
         print("Importing Flask app...")
         import app
+        app.open_worker_resources()
         print("✅ Flask app imported successfully")
     except Exception as e:
         print(f"❌ Failed to import app: {e}")
@@ -0,0 +1,126 @@
+"""
+Request Coalescing
+
+Single-flight execution: while one thread runs the work for a key, other
+threads asking for the same key wait for it and share its outcome instead
+of running it again. ``/query`` keys flights on the canonical query (with
+the database state, format and cursor), so a burst of identical statements
+hits SQLite once per worker.
+
+Waiting is bounded. A waiter whose flight has not landed within ``timeout``
+stops waiting and runs the work itself, so a stuck execution delays the
+requests behind it by at most that long. An exception raised by the
+execution is raised in every waiter too.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Flight:
+    """One in-progress execution and, once done, its outcome."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Run at most one execution per key at a time within this process.
+
+    Args:
+        timeout (float): Seconds a waiter waits for the running execution
+            before running the work itself; 0 disables coalescing
+    """
+
+    def __init__(self, timeout: float = 5.0) -> None:
+        self.timeout = max(0.0, float(timeout))
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.shared_errors = 0
+        self.timeouts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.timeout > 0
+
+    def do(self, key: Optional[Hashable], work: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run ``work`` for ``key``, or wait for the execution already running.
+
+        Args:
+            key (Optional[Hashable]): Identity of the work; None always runs it
+            work (Callable[[], Any]): Produces the result to share
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it came from another
+            thread's execution
+
+        Raises:
+            Exception: Whatever the execution this call ran or waited for raised
+        """
+        if key is None or not self.enabled:
+            return work(), False
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                leader = False
+
+        if leader:
+            try:
+                flight.result = work()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                # Later arrivals start a new flight (or hit a result cache)
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.result, False
+
+        if not flight.done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            return work(), False
+        with self._lock:
+            if flight.error is None:
+                self.coalesced += 1
+            else:
+                self.shared_errors += 1
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Coalescing counters for this process.
+
+        Returns:
+            Dict[str, Any]: Executions run, executions saved (results and
+            errors shared with waiters), wait timeouts and flights in progress
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "timeout": self.timeout,
+                "executions": self.executions,
+                "saved": self.coalesced + self.shared_errors,
+                "coalesced": self.coalesced,
+                "shared_errors": self.shared_errors,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._flights),
+            }
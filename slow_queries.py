@@ -0,0 +1,221 @@
+"""
+Slow-Query Log
+
+Records user SQL that took longer than a threshold: its normalized text
+(literals replaced by ``?``, so the same statement with different values is
+one offender and no user data is kept), the per-stage timing, the row count
+and the ``EXPLAIN QUERY PLAN`` output.
+
+Entries go into a bounded in-process ring buffer, summarized by ``top``,
+and can also be appended to a rotating JSON-lines file. Both are per
+process: under gunicorn each worker sees only the statements it ran, so
+``stats`` labels its output with the process id. For a server-wide view,
+give ``log_file`` a ``{pid}`` placeholder and read every worker's file
+(e.g. with ``index_advisor.py``).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from sql_validator import COMMENT, NUMBER, STRING, tokenize
+
+SORT_KEYS = ("total", "max", "count")
+
+
+def fingerprint_query(sql: str) -> str:
+    """
+    Normalize a statement for grouping: literals become ``?``, words are
+    upper-cased and comments are dropped.
+
+    Args:
+        sql (str): The statement
+
+    Returns:
+        str: Space-separated tokens, e.g. ``SELECT * FROM PROJECTS WHERE ID > ?``
+    """
+    parts = []
+    for kind, value in tokenize(sql):
+        if kind == COMMENT:
+            continue
+        parts.append("?" if kind in (NUMBER, STRING) else value)
+    return " ".join(parts)
+
+
+class SlowQueryLog:
+    """
+    Ring buffer (and optional JSON-lines file) of slow statements.
+
+    Args:
+        threshold (float): Seconds a statement must take to be recorded;
+            0 disables the log
+        capacity (int): Entries kept in memory per process
+        log_file (Optional[str]): JSON-lines file to append to; ``{pid}`` is
+            replaced by the process id. None or empty keeps memory only
+        max_bytes (int): Size at which the file is rotated
+        backups (int): Rotated files to keep
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        capacity: int = 200,
+        log_file: Optional[str] = None,
+        max_bytes: int = 10 * 1024 * 1024,
+        backups: int = 3,
+    ) -> None:
+        self.threshold = threshold
+        self.capacity = max(1, int(capacity))
+        self.log_file = log_file or None
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+        self._writer: Optional[logging.Logger] = None
+        self._writer_pid: Optional[int] = None
+        self.recorded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.threshold)
+
+    def is_slow(self, duration: float) -> bool:
+        """Check whether a statement that took ``duration`` seconds is recorded."""
+        return self.enabled and duration >= self.threshold
+
+    def _file_writer(self) -> Optional[logging.Logger]:
+        """Per-process logger writing to the rotating file, opened lazily."""
+        if self.log_file is None:
+            return None
+        pid = os.getpid()
+        if self._writer_pid != pid:
+            import logging.handlers  # only needed once a file is configured
+
+            path = self.log_file.replace("{pid}", str(pid))
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=self.max_bytes, backupCount=self.backups
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            writer = logging.getLogger(f"{__name__}.{pid}")
+            writer.handlers = [handler]
+            writer.setLevel(logging.INFO)
+            writer.propagate = False
+            self._writer, self._writer_pid = writer, pid
+        return self._writer
+
+    def record(
+        self,
+        sql: str,
+        duration: float,
+        stages: Optional[Dict[str, float]] = None,
+        row_count: Optional[int] = None,
+        plan: Optional[Sequence[str]] = None,
+        cost: Optional[float] = None,
+        error: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Add a slow statement to the log.
+
+        Args:
+            sql (str): The statement as submitted
+            duration (float): Seconds the request spent on it
+            stages (Optional[Dict[str, float]]): Seconds per pipeline stage
+            row_count (Optional[int]): Rows returned, None if it failed
+            plan (Optional[Sequence[str]]): ``EXPLAIN QUERY PLAN`` details
+            cost (Optional[float]): Estimated plan cost
+            error (Optional[str]): Why the statement failed, if it did
+
+        Returns:
+            Dict[str, Any]: The stored entry
+        """
+        entry = {
+            "ts": round(time.time(), 3),
+            "pid": os.getpid(),
+            "query": fingerprint_query(sql),
+            "duration_ms": round(duration * 1000, 3),
+            "stages_ms": {
+                name: round(seconds * 1000, 3)
+                for name, seconds in (stages or {}).items()
+            },
+            "row_count": row_count,
+            "plan": list(plan or ()),
+            "cost": cost,
+            "error": error,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+            writer = self._file_writer()
+        if writer is not None:
+            writer.info(json.dumps(entry, sort_keys=True))
+        return entry
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """The newest ``limit`` entries, newest first."""
+        with self._lock:
+            entries = list(self._entries)
+        return entries[::-1][: max(0, limit)]
+
+    def top(self, limit: int = 10, sort: str = "total") -> List[Dict[str, Any]]:
+        """
+        Group the buffered entries by normalized text and rank them.
+
+        Args:
+            limit (int): Number of offenders to return
+            sort (str): ``total`` (time spent overall), ``max`` (worst single
+                run) or ``count`` (occurrences)
+
+        Returns:
+            List[Dict[str, Any]]: Per statement: count, total/max/mean time,
+            errors, the latest row count, plan and cost
+        """
+        with self._lock:
+            entries = list(self._entries)
+        groups: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            group = groups.get(entry["query"])
+            if group is None:
+                group = groups[entry["query"]] = {
+                    "query": entry["query"],
+                    "count": 0,
+                    "errors": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+            group["count"] += 1
+            group["errors"] += 1 if entry["error"] else 0
+            group["total_ms"] += entry["duration_ms"]
+            group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+            group["last_seen"] = entry["ts"]
+            group["row_count"] = entry["row_count"]
+            group["plan"] = entry["plan"]
+            group["cost"] = entry["cost"]
+        for group in groups.values():
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["mean_ms"] = round(group["total_ms"] / group["count"], 3)
+        field = {"total": "total_ms", "max": "max_ms", "count": "count"}[sort]
+        ranked = sorted(groups.values(), key=lambda g: g[field], reverse=True)
+        return ranked[: max(0, limit)]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Log settings and counters of this process.
+
+        Returns:
+            Dict[str, Any]: scope (always ``worker``) and pid, threshold_ms,
+            capacity, buffered, recorded, log_file
+        """
+        with self._lock:
+            return {
+                "scope": "worker",
+                "pid": os.getpid(),
+                "threshold_ms": self.threshold * 1000,
+                "capacity": self.capacity,
+                "buffered": len(self._entries),
+                "recorded": self.recorded,
+                "log_file": self.log_file,
+            }
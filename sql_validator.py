@@ -0,0 +1,318 @@
+"""
+SQL Validator Engine
+
+Single-pass validator for user-submitted SQL. The query is tokenized once
+(string literals, quoted identifiers and comments are recognized as whole
+tokens) and every security decision is made from that token stream. Keyword
+and table sets are compiled when the validator is constructed, so a call to
+``validate`` never builds a regular expression.
+"""
+
+import re
+import string
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from cache import LRUCache
+
+# Token kinds
+WORD = "word"
+NUMBER = "number"
+STRING = "string"
+IDENTIFIER = "identifier"
+COMMENT = "comment"
+SEMICOLON = "semicolon"
+OPERATOR = "operator"
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<string>'(?:[^']|'')*(?:'|\Z))
+    | (?P<identifier>"(?:[^"]|"")*(?:"|\Z)|`[^`]*(?:`|\Z)|\[[^\]]*(?:\]|\Z))
+    | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<semicolon>;)
+    | (?P<operator>\*/|<>|!=|==|<=|>=|\|\||<<|>>|.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+_COMPARISON_OPERATORS = frozenset({"=", "=="})
+_BOOLEAN_LITERALS = frozenset({"TRUE", "FALSE"})
+
+
+class Token(NamedTuple):
+    """A lexical token of a SQL query.
+
+    ``value`` is upper-cased for words, unquoted and lower-cased for quoted
+    identifiers, and the raw source text for every other kind.
+    """
+
+    kind: str
+    value: str
+
+
+def tokenize(query: str, fold_case: bool = True) -> List[Token]:
+    """
+    Split a SQL query into tokens in a single scan.
+
+    Args:
+        query (str): The SQL text to tokenize
+        fold_case (bool): Upper-case words and lower-case quoted identifiers,
+            as the validator's case-insensitive rules expect
+
+    Returns:
+        List[Token]: Tokens in source order, whitespace excluded
+    """
+    tokens = []
+    append = tokens.append
+    for match in _TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup
+        if kind == "ws":
+            continue
+        text = match.group()
+        if kind == WORD:
+            append(Token(WORD, text.upper() if fold_case else text))
+        elif kind == IDENTIFIER:
+            closed = len(text) > 1 and text[-1] in '"`]'
+            name = text[1 : -1 if closed else None]
+            append(Token(IDENTIFIER, name.lower() if fold_case else name))
+        elif kind == COMMENT:
+            # Keep only the opening marker; the comment body is never inspected
+            append(Token(COMMENT, text[:2]))
+        else:
+            append(Token(kind, text))
+    return tokens
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for use as a verdict cache key.
+
+    Whitespace runs collapse to one character (a newline if the run held one,
+    so ``--`` comments keep their extent) and the text is upper-cased. Both
+    are verdict-preserving: every rule is case-insensitive and whitespace is
+    never a token.
+
+    Args:
+        query (str): The SQL text to normalize
+
+    Returns:
+        str: The normalized query
+    """
+    text = _WHITESPACE_PATTERN.sub(_collapse_whitespace, query.strip())
+    # Only ASCII letters are folded: str.upper() maps some non-ASCII
+    # characters (e.g. "ſ") to ASCII words the tokenizer would read differently
+    return text.upper() if text.isascii() else text.translate(_ASCII_UPPER)
+
+
+def canonical_query(query: str) -> Tuple[Token, ...]:
+    """
+    Token-level identity of a query, for caching results.
+
+    Queries that differ only in whitespace or comments map to the same value.
+    Case is kept: SQLite names result columns after the select list as
+    written (``SELECT name AS Foo`` returns a ``Foo`` column), so queries
+    differing in case may return different results.
+
+    Args:
+        query (str): The SQL text
+
+    Returns:
+        Tuple[Token, ...]: The query's non-comment tokens
+    """
+    return tuple(
+        token for token in tokenize(query, fold_case=False) if token.kind != COMMENT
+    )
+
+
+def _collapse_whitespace(match: "re.Match[str]") -> str:
+    return "\n" if "\n" in match.group() else " "
+
+
+def _is_literal(token: Token) -> bool:
+    return token.kind in (NUMBER, STRING) or (
+        token.kind == WORD and token.value in _BOOLEAN_LITERALS
+    )
+
+
+class SQLValidator:
+    """
+    Compiled validator for read-only SQL queries.
+
+    Args:
+        blocked_keywords (Iterable[str]): Words, phrases or symbols that reject
+            a query (e.g. ``DROP``, ``UNION``, ``--``)
+        allowed_tables (Iterable[str]): Tables a query may reference
+        max_query_length (int): Maximum accepted query length in characters
+        cache_size (int): Number of verdicts kept in the LRU cache, keyed on
+            the normalized query; 0 disables caching
+    """
+
+    def __init__(
+        self,
+        blocked_keywords: Iterable[str],
+        allowed_tables: Iterable[str],
+        max_query_length: int,
+        cache_size: int = 0,
+    ) -> None:
+        self._cache = LRUCache(cache_size)
+        self._signature: Optional[Tuple[FrozenSet[str], FrozenSet[str], int]] = None
+        self.configure(blocked_keywords, allowed_tables, max_query_length)
+
+    def configure(
+        self,
+        blocked_keywords: Iterable[str],
+        allowed_tables: Iterable[str],
+        max_query_length: int,
+    ) -> None:
+        """
+        Compile keyword and table sets, dropping cached verdicts if they changed.
+
+        Args:
+            blocked_keywords (Iterable[str]): Blocked words, phrases or symbols
+            allowed_tables (Iterable[str]): Tables a query may reference
+            max_query_length (int): Maximum accepted query length in characters
+        """
+        blocked_keywords = frozenset(blocked_keywords)
+        allowed_tables = frozenset(table.lower() for table in allowed_tables)
+        signature = (blocked_keywords, allowed_tables, max_query_length)
+        if signature == self._signature:
+            return
+
+        blocked_words = {}
+        blocked_phrases = []
+        blocked_symbols = {}
+        for keyword in blocked_keywords:
+            parts = keyword.upper().split()
+            if not parts:
+                continue
+            if len(parts) > 1:
+                blocked_phrases.append((tuple(parts), keyword))
+            elif _WORD_PATTERN.fullmatch(parts[0]):
+                blocked_words[parts[0]] = keyword
+            else:
+                blocked_symbols[parts[0]] = keyword
+
+        self.max_query_length = max_query_length
+        self.allowed_tables: FrozenSet[str] = allowed_tables
+        self._tables_message = ", ".join(sorted(allowed_tables))
+        self._blocked_words = blocked_words
+        self._blocked_phrases = blocked_phrases
+        self._blocked_symbols = blocked_symbols
+        self._signature = signature
+        self._cache.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters of the verdict cache.
+
+        Returns:
+            Dict[str, Any]: Counters from ``LRUCache.stats``
+        """
+        return self._cache.stats()
+
+    def _find_blocked(self, tokens: List[Token]) -> str:
+        """Return the first blocked keyword in ``tokens``, or an empty string."""
+        words = self._blocked_words
+        symbols = self._blocked_symbols
+        phrases = self._blocked_phrases
+        for index, (kind, value) in enumerate(tokens):
+            if kind == WORD:
+                if value in words:
+                    return words[value]
+                for parts, keyword in phrases:
+                    if value == parts[0] and all(
+                        index + offset < len(tokens)
+                        and tokens[index + offset] == (WORD, part)
+                        for offset, part in enumerate(parts[1:], 1)
+                    ):
+                        return keyword
+            elif kind in (COMMENT, OPERATOR) and value in symbols:
+                return symbols[value]
+        return ""
+
+    @staticmethod
+    def _has_tautology(tokens: List[Token]) -> bool:
+        """Detect literal-to-literal comparisons such as ``'1'='1'`` or ``1=1``."""
+        for index in range(1, len(tokens) - 1):
+            token = tokens[index]
+            if token.kind == OPERATOR and token.value in _COMPARISON_OPERATORS:
+                if _is_literal(tokens[index - 1]) and _is_literal(tokens[index + 1]):
+                    return True
+        return False
+
+    def validate(self, query: str) -> Tuple[bool, str]:
+        """
+        Validate SQL query for security and allowed operations.
+
+        Args:
+            query (str): The SQL query to validate
+
+        Returns:
+            Tuple[bool, str]: (is_valid, error_message)
+        """
+        if not query or not query.strip():
+            return False, "Query cannot be empty"
+
+        if len(query) > self.max_query_length:
+            return (
+                False,
+                f"Query too long. Maximum {self.max_query_length} "
+                f"characters allowed",
+            )
+
+        key = normalize_query(query)
+        verdict = self._cache.get(key)
+        if verdict is None:
+            verdict = self._check(tokenize(query))
+            self._cache.put(key, verdict)
+        return verdict
+
+    def _check(self, tokens: List[Token]) -> Tuple[bool, str]:
+        """Run every token-level rule against an already tokenized query."""
+        blocked = self._find_blocked(tokens)
+        if blocked:
+            return False, f"Operation '{blocked}' is not allowed"
+
+        if self._has_tautology(tokens):
+            return False, "Suspicious SQL pattern detected"
+
+        code = [token for token in tokens if token.kind != COMMENT]
+        if not code or code[0] != (WORD, "SELECT"):
+            return False, "Only SELECT queries are allowed"
+
+        semicolons = [i for i, token in enumerate(code) if token.kind == SEMICOLON]
+        if len(semicolons) > 1 or (semicolons and semicolons[0] != len(code) - 1):
+            return False, "Multiple statements are not allowed"
+
+        tables = set()
+        has_union = has_join = False
+        for kind, value in code:
+            if kind == WORD:
+                if value == "UNION":
+                    has_union = True
+                elif value == "JOIN":
+                    has_join = True
+                else:
+                    lowered = value.lower()
+                    if lowered in self.allowed_tables:
+                        tables.add(lowered)
+            elif kind == IDENTIFIER and value in self.allowed_tables:
+                tables.add(value)
+
+        if not tables:
+            return (
+                False,
+                f"Query must reference at least one allowed table: "
+                f"{self._tables_message}",
+            )
+
+        if len(tables) > 1 and (has_union or not has_join):
+            # Allow JOINs but be suspicious of multiple tables without explicit JOINs
+            return False, "Multiple table references detected without explicit JOIN"
+
+        return True, ""
@@ -1,46 +1,50 @@
 #!/usr/bin/env python3
 """
 Production startup script for Railway deployment
-Tries gunicorn first, falls back to Flask dev server if needed
+Hands over to gunicorn (with gunicorn.conf.py) in this same process, falls back
+to the Flask dev server if gunicorn is not installed
 """
 import os
 import sys
-import subprocess
+import importlib.util
+
+from startup import mark_launch
 
 def main():
+    # Startup timing (logged with the first response) starts here
+    mark_launch()
     port = os.environ.get("PORT", "5000")
     host = "0.0.0.0"
     
-    # Try gunicorn first
-    try:
-        print("Attempting to start with gunicorn...")
+    # exec instead of a child process: no second interpreter to start, and
+    # gunicorn receives the platform's signals directly
+    if importlib.util.find_spec("gunicorn") is not None:
         cmd = [
-            "python3", "-m", "gunicorn",
-            "--bind", f"{host}:{port}",
-            "--workers", "1",
-            "--timeout", "60",
-            "--preload",
+            sys.executable, "-m", "gunicorn",
+            "--config", "gunicorn.conf.py",
             "app:app"
         ]
         print(f"Running: {' '.join(cmd)}")
-        subprocess.run(cmd, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print(f"Gunicorn failed: {e}")
-        print("Falling back to Flask development server...")
-        
-        # Import and run Flask app directly
-        try:
-            import app
-            print(f"Starting Flask app on {host}:{port}")
-            app.app.run(
-                host=host,
-                port=int(port),
-                debug=False,
-                threaded=True
-            )
-        except Exception as e:
-            print(f"Flask startup failed: {e}")
-            sys.exit(1)
+        sys.stdout.flush()
+        os.execv(sys.executable, cmd)
+    
+    print("gunicorn is not installed")
+    print("Falling back to Flask development server...")
+    
+    # Import and run Flask app directly
+    try:
+        import app
+        app.open_worker_resources()
+        print(f"Starting Flask app on {host}:{port}")
+        app.app.run(
+            host=host,
+            port=int(port),
+            debug=False,
+            threaded=True
+        )
+    except Exception as e:
+        print(f"Flask startup failed: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
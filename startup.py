@@ -0,0 +1,123 @@
+"""
+Startup Timing
+
+Phase-by-phase wall-clock timing of process startup, up to the worker being
+ready to serve. The first request's own latency is kept apart, so time spent
+waiting for a client never counts as startup. Launchers export ``STARTUP_T0`` (epoch seconds) before
+they exec the server, so the report covers the launcher, the interpreter,
+the app import and worker start. Without it, the process's own start time
+is used where ``/proc`` provides it.
+
+Imports only the standard library modules Python has already loaded, so
+it adds nothing measurable to the startup it measures.
+"""
+
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+STARTUP_ENV = "STARTUP_T0"
+
+# When this module was first imported; app.py imports it before anything
+# else, so the gap to the next mark is the cost of the app's imports
+LOADED_AT = time.time()
+
+
+def process_start_time() -> Optional[float]:
+    """Epoch time this process started, from ``/proc`` (None elsewhere)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesized command name
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+    return boot + ticks / os.sysconf("SC_CLK_TCK")
+
+
+def startup_origin() -> float:
+    """Launcher start if exported, else process start, else now."""
+    try:
+        return float(os.environ[STARTUP_ENV])
+    except (KeyError, ValueError):
+        pass
+    return process_start_time() or time.time()
+
+
+def mark_launch() -> None:
+    """Export the launch time for the processes this one execs or spawns."""
+    os.environ.setdefault(STARTUP_ENV, repr(time.time()))
+
+
+class StartupTimer:
+    """
+    Named startup phases, each measured from the end of the previous one.
+
+    Args:
+        origin (Optional[float]): Epoch time startup began; defaults to
+            ``startup_origin()``
+    """
+
+    def __init__(self, origin: Optional[float] = None) -> None:
+        self.origin = startup_origin() if origin is None else origin
+        self.phases: List[Tuple[str, float]] = []
+        self._last = self.origin
+        self._lock = threading.Lock()
+        self.finished = False
+        self.first_response: Optional[float] = None
+
+    def mark(self, name: str, at: Optional[float] = None) -> float:
+        """
+        End phase ``name`` now (or at epoch time ``at``).
+
+        Returns:
+            float: Seconds the phase took
+        """
+        with self._lock:
+            now = time.time() if at is None else at
+            seconds = max(0.0, now - self._last)
+            self.phases.append((name, seconds))
+            self._last = now
+            return seconds
+
+    def elapsed(self) -> float:
+        """Seconds since the origin."""
+        return time.time() - self.origin
+
+    def summary(self) -> str:
+        """
+        One-line breakdown, e.g. ``interpreter=95ms imports=160ms total=301ms``.
+        """
+        with self._lock:
+            parts = [f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases]
+            total = self._last - self.origin
+        return " ".join(parts + [f"total={total * 1000:.0f}ms"])
+
+    def finish(self, name: str) -> bool:
+        """
+        End the last phase once, when the worker is ready to serve.
+
+        Returns:
+            bool: True only for the call that finished the timer
+        """
+        with self._lock:
+            if self.finished:
+                return False
+            self.finished = True
+        self.mark(name)
+        return True
+
+    def record_first_response(self, seconds: float) -> bool:
+        """
+        Keep the first request's latency, reported apart from startup.
+
+        Returns:
+            bool: True only for the call that recorded it
+        """
+        with self._lock:
+            if self.first_response is not None:
+                return False
+            self.first_response = seconds
+            return True
@@ -1955,16 +1955,13 @@ document.getElementById('queryForm').addEventListener('submit', e => {
   loadingProgress.style.animation =
     'loadingAnimation 2s ease-in-out forwards, gradientShift 2s ease-in-out infinite';
 
-  // Create form data
-  const formData = new FormData();
-  formData.append('query', query);
-
   // Wait for loading animation (2 seconds) then send request and transform layout
   setTimeout(() => {
     // Send POST request to /query endpoint
     fetch('/query', {
       method: 'POST',
-      body: formData,
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query }),
     })
       .then(response => response.json())
       .then(data => {
@@ -1991,13 +1988,7 @@ document.getElementById('queryForm').addEventListener('submit', e => {
           html += '</tr></thead><tbody>';
 
           // Add data rows
-          data.rows.forEach(row => {
-            html += '<tr>';
-            row.forEach(cell => {
-              html += `<td>${cell !== null ? cell : 'NULL'}</td>`;
-            });
-            html += '</tr>';
-          });
+          html += buildRowsHtml(data.rows);
           html += '</tbody></table>';
 
           if (data.rows.length === 0) {
@@ -2005,6 +1996,11 @@ document.getElementById('queryForm').addEventListener('submit', e => {
           }
 
           resultsDiv.innerHTML = html;
+
+          // Results are paged; offer the rest of the rows
+          if (data.next_cursor) {
+            showMoreRowsButton(resultsDiv, query, data.next_cursor);
+          }
         }
 
         // Show results card with animation
@@ -2034,6 +2030,68 @@ document.getElementById('queryForm').addEventListener('submit', e => {
   }, 2000); // 2 second delay for loading animation
 });
 
+/**
+ * Build table rows for a page of query results
+ * @param {Array} rows - Result rows from /query
+ * @returns {string} - HTML for the rows
+ */
+function buildRowsHtml(rows) {
+  let html = '';
+  rows.forEach(row => {
+    html += '<tr>';
+    row.forEach(cell => {
+      html += `<td>${cell !== null ? cell : 'NULL'}</td>`;
+    });
+    html += '</tr>';
+  });
+  return html;
+}
+
+/**
+ * Add a button that fetches the next page of results and appends its rows
+ * @param {HTMLElement} resultsDiv - Container holding the results table
+ * @param {string} query - Query that produced the results
+ * @param {string} cursor - next_cursor returned with the previous page
+ */
+function showMoreRowsButton(resultsDiv, query, cursor) {
+  const button = document.createElement('button');
+  button.type = 'button';
+  button.className = 'more-rows-btn';
+  button.textContent = currentLang === 'es' ? 'Cargar más filas' : 'Load more rows';
+
+  button.addEventListener('click', () => {
+    button.disabled = true;
+    fetch('/query', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query, cursor }),
+    })
+      .then(response => response.json())
+      .then(data => {
+        button.remove();
+        if (data.error) {
+          resultsDiv.insertAdjacentHTML(
+            'beforeend',
+            `<div class="error">Error: ${data.error}</div>`
+          );
+          return;
+        }
+
+        const tbody = resultsDiv.querySelector('.results-table tbody');
+        tbody.insertAdjacentHTML('beforeend', buildRowsHtml(data.rows));
+        if (data.next_cursor) {
+          showMoreRowsButton(resultsDiv, query, data.next_cursor);
+        }
+      })
+      .catch(error => {
+        button.disabled = false;
+        showError(`Network error: ${error.message}`);
+      });
+  });
+
+  resultsDiv.appendChild(button);
+}
+
 function transformToSplitLayout() {
   const container = document.querySelector('.container');
   const queryCard = document.querySelector('.query-card');
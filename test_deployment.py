@@ -44,7 +44,7 @@ def test_gunicorn_config():
     
     try:
         # Start gunicorn (this will fail on Windows, but we can see the command)
-        cmd = ['gunicorn', '--bind', '0.0.0.0:8000', '--workers', '2', '--timeout', '30', 'app:app']
+        cmd = ['gunicorn', '--config', 'gunicorn.conf.py', 'app:app']
         print(f"Command: {' '.join(cmd)}")
         
         # On Windows, we can't actually run gunicorn, so let's just verify the command format
@@ -5,11 +5,43 @@ Run tests with: python -m pytest tests.py -v
 """
 
 import unittest
+import gzip
 import json
+import zlib
 import sqlite3
 import os
+import shutil
+import tempfile
+import threading
+import time
+import asyncio
+import runpy
+import subprocess
+import sys
+from unittest import mock
+from flask import jsonify
+import app as app_module
+from admission import AdmissionController
 from app import app, validate_sql_query, DB_PATH
-
+from asgi import WSGIBridge, build_environ
+from assets import AssetManifest, build_assets, select_variant
+from benchmarks import generate_corpus
+from cache import LRUCache
+from compression import CompressionMiddleware
+from loadtest import compare, median_results, percentile
+from metrics import MetricsRegistry
+from migrations import LATEST_VERSION, MIGRATIONS, Migration, apply_migrations
+from migrations import main as migrate_main
+from index_advisor import advise, column_roles, load_traffic
+from db_pool import ConnectionPool, PoolTimeoutError, QueryTimeoutError, StatementDeadline
+from db_replica import MemoryReplica
+from pagination import fetch_page, id_keyed_tables, supports_keyset
+from result_encoder import encode_rows
+from query_planner import QueryCostGuard, estimate_plan
+from singleflight import SingleFlight
+from slow_queries import SlowQueryLog, fingerprint_query
+from startup import STARTUP_ENV, StartupTimer, startup_origin
+from sql_validator import SQLValidator, tokenize, STRING, COMMENT, IDENTIFIER
 
 class PortfolioTestCase(unittest.TestCase):
     """Test cases for Portfolio application"""
@@ -29,6 +61,29 @@ class PortfolioTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Portfolio', response.data)
     
+    def test_conditional_get(self):
+        """Test that revalidating with a current ETag returns 304 Not Modified"""
+        for url in ['/', '/projects']:
+            with self.subTest(url=url):
+                response = self.app.get(url)
+                etag = response.headers.get('ETag')
+                self.assertIsNotNone(etag)
+                self.assertIn('Cache-Control', response.headers)
+                revalidated = self.app.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated.data, b'')
+                stale = self.app.get(url, headers={'If-None-Match': '"stale"'})
+                self.assertEqual(stale.status_code, 200)
+    
+    def test_query_conditional(self):
+        """Test that a query result revalidates against its ETag"""
+        body = json.dumps({'query': 'SELECT name FROM skills WHERE id = 5'})
+        first = self.app.post('/query', data=body, content_type='application/json')
+        etag = first.headers['ETag']
+        second = self.app.post('/query', data=body, content_type='application/json',
+                               headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+    
     def test_valid_sql_query(self):
         """Test valid SQL query validation"""
         valid_queries = [
@@ -76,6 +131,93 @@ class PortfolioTestCase(unittest.TestCase):
         self.assertIsInstance(data['columns'], list)
         self.assertIsInstance(data['rows'], list)
     
+    def test_query_endpoint_columnar(self):
+        """Test the columnar format returns one array per column"""
+        response = self.app.post('/query',
+                                 data=json.dumps({'query': 'SELECT id, name FROM skills',
+                                                  'format': 'columnar'}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['columns'], ['id', 'name'])
+        self.assertEqual(len(data['data']), 2)
+        self.assertEqual(len(data['data'][0]), data['row_count'])
+    
+    def test_query_endpoint_unknown_format(self):
+        """Test that an unknown result format is rejected"""
+        response = self.app.post('/query?format=xml',
+                                 data=json.dumps({'query': 'SELECT * FROM skills'}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.app.post('/query',
+                                 data=json.dumps({'query': 'SELECT * FROM skills',
+                                                  'format': ['x']}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown format', json.loads(response.data)['error'])
+    
+    def test_encoder_matches_jsonify(self):
+        """Test the direct encoder produces the same bytes as jsonify"""
+        columns, rows = ['id', 'name', 'note'], [(1, 'Año', None), (2, 'b', 2.5)]
+        with app.app_context():
+            expected = jsonify({'columns': columns, 'rows': rows,
+                                'row_count': len(rows), 'next_cursor': 'abc'}).get_data()
+        self.assertEqual(encode_rows(columns, rows, 'abc'), expected)
+    
+    def test_query_endpoint_stream(self):
+        """Test NDJSON streaming via the request body flag and Accept header"""
+        requests_ = [
+            ({'query': 'SELECT * FROM skills', 'stream': True}, {}),
+            ({'query': 'SELECT * FROM skills'}, {'Accept': 'application/x-ndjson'}),
+        ]
+        for body, headers in requests_:
+            with self.subTest(headers=headers):
+                response = self.app.post('/query',
+                                         data=json.dumps(body),
+                                         content_type='application/json',
+                                         headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.mimetype, 'application/x-ndjson')
+                lines = [json.loads(line) for line in response.data.splitlines()]
+                self.assertIn('columns', lines[0])
+                rows = lines[1:-1]
+                self.assertEqual(lines[-1], {'row_count': len(rows)})
+                self.assertTrue(all(isinstance(row, list) for row in rows))
+    
+    def test_query_endpoint_stream_error(self):
+        """Test that a failing streamed query still returns a JSON error status"""
+        response = self.app.post('/query',
+                                 data=json.dumps({'query': 'SELECT missing FROM skills',
+                                                  'stream': True}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('error', json.loads(response.data))
+    
+    def test_query_result_cache(self):
+        """Test that repeated queries are served from the result cache"""
+        app_module.result_cache.clear()
+        headers = []
+        for sql in ['SELECT name FROM skills WHERE id = 3',
+                    '  SELECT name\n  FROM skills  WHERE id = 3']:
+            response = self.app.post('/query',
+                                     data=json.dumps({'query': sql}),
+                                     content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            headers.append(response.headers.get('X-Cache'))
+        self.assertEqual(headers, ['MISS', 'HIT'])
+    
+    def test_result_cache_keeps_alias_case(self):
+        """Test that queries differing only in alias case are cached apart"""
+        app_module.result_cache.clear()
+        for sql, column in [('SELECT name AS Foo FROM projects', 'Foo'),
+                            ('SELECT name AS foo FROM projects', 'foo'),
+                            ('SELECT name AS "Bar" FROM projects', 'Bar'),
+                            ('SELECT name AS "bar" FROM projects', 'bar')]:
+            response = self.app.post('/query', json={'query': sql})
+            self.assertEqual(response.headers.get('X-Cache'), 'MISS')
+            self.assertEqual(response.get_json()['columns'], [column])
+    
     def test_query_endpoint_invalid(self):
         """Test query endpoint with invalid SQL"""
         response = self.app.post('/query', 
@@ -189,6 +331,1610 @@ class SecurityTestCase(unittest.TestCase):
         self.assertFalse(is_valid)
 
 
+class SQLValidatorTestCase(unittest.TestCase):
+    """Test cases for the tokenizing SQL validator"""
+    
+    def test_tokenizer_keeps_literals_whole(self):
+        """Test that strings, quoted identifiers and comments are single tokens"""
+        tokens = tokenize("SELECT \"Name\" FROM projects WHERE name = 'a ; b' -- note")
+        kinds = [token.kind for token in tokens]
+        self.assertIn(STRING, kinds)
+        self.assertIn(COMMENT, kinds)
+        self.assertEqual(tokens[1], (IDENTIFIER, 'name'))
+        self.assertEqual(tokens[-2], (STRING, "'a ; b'"))
+    
+    def test_keywords_inside_literals_allowed(self):
+        """Test that blocked words and semicolons inside string literals are ignored"""
+        queries = [
+            "SELECT * FROM projects WHERE name = 'drop or delete'",
+            "SELECT * FROM projects WHERE description = 'a; b'",
+            "SELECT name FROM skills WHERE category = 'Programming';",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                is_valid, message = validate_sql_query(query)
+                self.assertTrue(is_valid, message)
+    
+    def test_comments_and_tautologies_blocked(self):
+        """Test comment markers and literal comparisons are rejected"""
+        self.assertEqual(
+            validate_sql_query("SELECT * FROM projects /* x */"),
+            (False, "Operation '/*' is not allowed"),
+        )
+        self.assertEqual(
+            validate_sql_query("SELECT * FROM projects WHERE 1 = 1"),
+            (False, "Suspicious SQL pattern detected"),
+        )
+    
+    def test_table_names_matched_as_identifiers(self):
+        """Test that table names inside literals do not count as references"""
+        is_valid, message = validate_sql_query(
+            "SELECT name FROM sqlite_master WHERE name = 'projects'"
+        )
+        self.assertFalse(is_valid)
+        self.assertIn('allowed table', message)
+
+    
+    def test_verdict_cache_normalizes_queries(self):
+        """Test that whitespace and case variants share one cached verdict"""
+        validator = SQLValidator({'DROP'}, {'projects'}, 1000, cache_size=8)
+        self.assertEqual(validator.validate('SELECT * FROM projects'), (True, ''))
+        self.assertEqual(validator.validate('  select *\tfrom   PROJECTS '), (True, ''))
+        stats = validator.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+    
+    def test_verdict_cache_evicts_lru(self):
+        """Test that the cache stays within its configured size"""
+        validator = SQLValidator({'DROP'}, {'projects'}, 1000, cache_size=2)
+        for query_id in range(3):
+            validator.validate(f'SELECT * FROM projects WHERE id = {query_id}')
+        stats = validator.cache_stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 1))
+    
+    def test_verdict_cache_dropped_on_rule_change(self):
+        """Test that reloading changed tables or keywords drops stale verdicts"""
+        query = 'SELECT * FROM projects'
+        self.assertTrue(validate_sql_query(query)[0])
+        app_module.ALLOWED_TABLES.discard('projects')
+        try:
+            app_module.reload_validation_rules()
+            self.assertFalse(validate_sql_query(query)[0])
+        finally:
+            app_module.ALLOWED_TABLES.add('projects')
+            app_module.reload_validation_rules()
+        self.assertTrue(validate_sql_query(query)[0])
+
+
+
+class PaginationTestCase(unittest.TestCase):
+    """Test cases for cursor pagination of /query and /projects"""
+    
+    def setUp(self):
+        """Use a small page size so the fixture data spans several pages"""
+        self.client = app.test_client()
+        self.original_max_results = app_module.MAX_RESULTS
+        app_module.MAX_RESULTS = 4
+    
+    def tearDown(self):
+        """Restore the configured page size"""
+        app_module.MAX_RESULTS = self.original_max_results
+    
+    def collect_query_pages(self, sql):
+        """Follow next_cursor until the last page, returning all rows"""
+        rows, cursor = [], None
+        while True:
+            response = self.client.post('/query',
+                                        data=json.dumps({'query': sql, 'cursor': cursor}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertLessEqual(data['row_count'], 4)
+            rows.extend(data['rows'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                return rows
+    
+    def test_query_pages_cover_all_rows(self):
+        """Test keyset and positional paging both return every row once"""
+        for sql, table in [('SELECT * FROM clients', 'clients'),
+                           ('SELECT ID, name FROM clients', 'clients'),
+                           ('SELECT c.name, e.company FROM clients c JOIN experience e',
+                            None)]:
+            with self.subTest(sql=sql):
+                rows = self.collect_query_pages(sql)
+                with sqlite3.connect(DB_PATH) as conn:
+                    expected = conn.execute(sql).fetchall()
+                self.assertEqual(sorted(map(tuple, rows)), sorted(expected))
+    
+    def test_keyset_eligibility(self):
+        """Test which queries can be paged by seeking on id"""
+        cases = {
+            'SELECT * FROM clients WHERE age > 20': True,
+            'SELECT name, id FROM skills': True,
+            'SELECT s.ID, upper(name) AS shout FROM skills s': True,
+            'SELECT * FROM clients ORDER BY age': False,
+            'SELECT name id FROM skills': False,
+            'SELECT category "id" FROM skills': False,
+            'SELECT category AS [ID] FROM skills': False,
+            'SELECT name FROM skills WHERE id > 3': False,
+            'SELECT max(id) FROM skills': False,
+            'SELECT id, name, NAME FROM skills': False,
+            'SELECT *, id FROM skills': False,
+            'SELECT * FROM skills, clients': False,
+            'SELECT p.id FROM projects p JOIN skills s ON p.id = s.id': False,
+        }
+        allowed = app_module._validator.allowed_tables
+        with sqlite3.connect(DB_PATH) as conn:
+            keyed = id_keyed_tables(conn)
+        for sql, expected in cases.items():
+            with self.subTest(sql=sql):
+                tokens = [t for t in tokenize(sql) if t.kind != COMMENT]
+                self.assertEqual(supports_keyset(tokens, allowed, keyed), expected)
+    
+    def test_keyset_needs_id_primary_key(self):
+        """Test that only tables keyed on a non-null id are paged by seeks"""
+        conn = sqlite3.connect(':memory:')
+        conn.executescript(
+            'CREATE TABLE keyed (id INTEGER PRIMARY KEY, name TEXT);'
+            'CREATE TABLE plain (id INTEGER, name TEXT);'
+            'CREATE TABLE nullable (id TEXT PRIMARY KEY, name TEXT);'
+            'CREATE TABLE composite (id INTEGER, name TEXT, PRIMARY KEY (id, name));'
+        )
+        keyed = id_keyed_tables(conn)
+        self.assertEqual(keyed, {'keyed'})
+        allowed = frozenset({'keyed', 'plain', 'nullable', 'composite'})
+        for table in allowed:
+            with self.subTest(table=table):
+                tokens = tokenize(f'SELECT id, name FROM {table}')
+                self.assertEqual(supports_keyset(tokens, allowed, keyed), table == 'keyed')
+        conn.close()
+    
+    def test_first_keyset_page_runs_once(self):
+        """Test that the first keyset page executes a single statement"""
+        conn = sqlite3.connect(DB_PATH)
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            page = fetch_page(conn, 'SELECT ID, name FROM clients', None, 2, True)
+        finally:
+            conn.close()
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(page.columns, ['ID', 'name'])
+        self.assertEqual(page.next_state, {'m': 'k', 'a': page.rows[-1][0]})
+    
+    def test_cursor_bound_to_query(self):
+        """Test that a cursor cannot be replayed against a different query"""
+        first = self.client.post('/query',
+                                 data=json.dumps({'query': 'SELECT * FROM clients'}),
+                                 content_type='application/json')
+        cursor = json.loads(first.data)['next_cursor']
+        response = self.client.post('/query',
+                                    data=json.dumps({'query': 'SELECT * FROM skills',
+                                                     'cursor': cursor}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_malformed_cursor(self):
+        """Test that cursors that are not signed strings are rejected with a 400"""
+        for cursor in (123, ['x'], {'a': 1}, 'bogus'):
+            response = self.client.post('/query',
+                                        data=json.dumps({'query': 'SELECT * FROM skills',
+                                                         'cursor': cursor}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('error', response.get_json())
+    
+    def test_projects_pagination(self):
+        """Test /projects pages with next_cursor"""
+        response = self.client.get('/projects')
+        data = json.loads(response.data)
+        self.assertEqual(len(data['projects']), 4)
+        response = self.client.get('/projects?cursor=' + data['next_cursor'])
+        data = json.loads(response.data)
+        self.assertGreater(len(data['projects']), 0)
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(self.client.get('/projects?cursor=bogus').status_code, 400)
+
+
+class QueryPlannerTestCase(unittest.TestCase):
+    """Test cases for the EXPLAIN QUERY PLAN cost guard"""
+    
+    CROSS_JOIN = 'SELECT * FROM clients JOIN experience JOIN skills JOIN projects JOIN education'
+    
+    def test_estimate_counts_scans_and_depth(self):
+        """Test that plan estimates reflect scans, temp B-trees and nesting"""
+        plan = [
+            (2, 0, 0, 'SCAN p'),
+            (4, 0, 0, 'SEARCH s USING INTEGER PRIMARY KEY (rowid=?)'),
+            (9, 0, 0, 'USE TEMP B-TREE FOR ORDER BY'),
+        ]
+        estimate = estimate_plan(plan, scan_cost=10, temp_btree_cost=5)
+        self.assertEqual(
+            (estimate.full_scans, estimate.temp_btrees, estimate.nested_depth),
+            (1, 1, 2),
+        )
+        self.assertEqual(estimate.cost, 60)
+    
+    def test_guard_caches_decisions(self):
+        """Test that repeated plans are served from the cache"""
+        guard = QueryCostGuard(1000)
+        with sqlite3.connect(DB_PATH) as conn:
+            for _ in range(2):
+                estimate = guard.check(conn, 'SELECT * FROM projects', key='projects')
+        self.assertEqual(estimate.full_scans, 1)
+        self.assertEqual(guard.stats()['hits'], 1)
+    
+    def test_query_endpoint_rejects_cross_join(self):
+        """Test that an expensive cross join is rejected before execution"""
+        response = app.test_client().post('/query',
+                                          data=json.dumps({'query': self.CROSS_JOIN}),
+                                          content_type='application/json')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('too expensive', json.loads(response.data)['error'])
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """Test cases for the byte-bounded, expiring LRU cache"""
+    
+    def test_byte_bound_evicts_lru(self):
+        """Test that the least recently used entries go once bytes exceed the cap"""
+        cache = LRUCache(None, max_bytes=10)
+        cache.put('a', b'12345', 5)
+        cache.put('b', b'12345', 5)
+        cache.get('a')
+        cache.put('c', b'123', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'12345')
+        self.assertEqual(cache.stats()['bytes'], 8)
+    
+    def test_oversized_values_skipped(self):
+        """Test that a value larger than the byte cap is never stored"""
+        cache = LRUCache(None, max_bytes=4)
+        cache.put('a', b'12345', 5)
+        self.assertEqual(len(cache), 0)
+    
+    def test_ttl_expiry(self):
+        """Test that expired entries count as misses"""
+        cache = LRUCache(None, ttl=1e-9)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual((stats['expirations'], stats['misses']), (1, 1))
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    """Test cases for the read-only connection pool"""
+    
+    def setUp(self):
+        """Create a small pool over the portfolio database"""
+        self.pool = ConnectionPool(DB_PATH, size=1, timeout=0.05)
+    
+    def tearDown(self):
+        """Close pooled connections"""
+        self.pool.close()
+    
+    def test_connections_are_read_only(self):
+        """Test that pooled connections reject writes"""
+        with self.pool.connection() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM projects")
+    
+    def test_connections_are_reused(self):
+        """Test that a released connection is handed out again"""
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            self.assertIs(first, second)
+        stats = self.pool.stats()
+        self.assertEqual((stats['open'], stats['checkouts']), (1, 2))
+    
+    def test_checkout_timeout(self):
+        """Test that an exhausted pool times out and counts it"""
+        with self.pool.connection():
+            with self.assertRaises(PoolTimeoutError):
+                with self.pool.connection():
+                    pass
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+    
+    def test_expired_connections_recycled(self):
+        """Test that connections older than the recycle age are reopened"""
+        self.pool.recycle = 1e-9
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            self.assertIsNot(first, second)
+        self.assertEqual(self.pool.stats()['recycled'], 1)
+    
+    def test_statement_deadline_aborts(self):
+        """Test that a statement running past its budget is interrupted"""
+        deadline = StatementDeadline(0.05, check_interval=100)
+        runaway = (
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+            "SELECT COUNT(*) FROM n"
+        )
+        with self.pool.connection() as conn:
+            with self.assertRaises(QueryTimeoutError):
+                with deadline.applied(conn):
+                    conn.execute(runaway).fetchone()
+            # The connection stays usable once the handler is removed
+            self.assertEqual(conn.execute("SELECT 1").fetchone()[0], 1)
+        self.assertEqual(deadline.stats()['aborted'], 1)
+    
+    def test_query_endpoint_timeout(self):
+        """Test that an aborted /query returns a distinct 408 error"""
+        original = app_module.query_deadline
+        app_module.query_deadline = StatementDeadline(1e-9, check_interval=1)
+        try:
+            response = app.test_client().post(
+                '/query',
+                data=json.dumps({'query': 'SELECT * FROM clients JOIN experience'}),
+                content_type='application/json',
+            )
+        finally:
+            app_module.query_deadline = original
+        self.assertEqual(response.status_code, 408)
+        self.assertIn('execution limit', json.loads(response.data)['error'])
+    
+    def test_metered_deadline_ignores_pauses(self):
+        """Test that only time inside applied blocks spends a metered budget"""
+        deadline = StatementDeadline(0.2, check_interval=1)
+        budget = deadline.metered()
+        with self.pool.connection() as conn:
+            cursor = conn.execute('SELECT id FROM skills')
+            for _ in range(3):
+                with budget.applied(conn):
+                    cursor.fetchmany(2)
+                time.sleep(0.1)
+        self.assertGreater(budget.remaining, 0.1)
+        self.assertEqual(deadline.stats()['aborted'], 0)
+    
+    def test_slow_stream_reader_is_not_cut_off(self):
+        """Test that a streamed result outlives the deadline while the client reads slowly"""
+        with mock.patch.object(app_module, 'query_deadline', StatementDeadline(0.1, check_interval=1)), \
+                mock.patch.object(app_module, 'STREAM_BATCH_SIZE', 2), \
+                app.test_request_context('/query'):
+            stream = app_module._stream_query('SELECT id FROM skills', None)
+            chunks = [next(stream)]
+            for chunk in stream:
+                chunks.append(chunk)
+                time.sleep(0.03)
+        lines = [json.loads(line) for line in b''.join(chunks).splitlines()]
+        self.assertEqual(lines[-1], {'row_count': len(lines) - 2})
+
+
+class MemoryReplicaTestCase(unittest.TestCase):
+    """Test cases for the in-memory read replica"""
+    
+    def setUp(self):
+        """Copy the database so the test can change it on disk"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'portfolio.db')
+        shutil.copy(DB_PATH, self.db_path)
+        self.pool = ConnectionPool(self.db_path, size=2, timeout=0.5)
+        self.replica = MemoryReplica(self.db_path, ['projects', 'skills'], self.pool)
+        self.replica.refresh(force=True)
+    
+    def tearDown(self):
+        """Drop the replica and the copy"""
+        self.replica.close()
+        self.pool.close()
+        shutil.rmtree(self.tmpdir)
+    
+    def _count_projects(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+    
+    def test_serves_only_allowed_tables(self):
+        """Test that the replica keeps the listed tables and drops the rest"""
+        with self.pool.connection() as conn:
+            self.assertGreater(conn.execute("SELECT COUNT(*) FROM skills").fetchone()[0], 0)
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("SELECT * FROM clients")
+    
+    def test_replica_is_read_only(self):
+        """Test that pooled replica connections reject writes"""
+        with self.pool.connection() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM projects")
+    
+    def test_refresh_picks_up_file_changes(self):
+        """Test that a rebuild swaps in the new data and retires old connections"""
+        before = self._count_projects()
+        self.assertFalse(self.replica.refresh())
+        
+        writer = sqlite3.connect(self.db_path)
+        writer.execute("DELETE FROM projects")
+        writer.commit()
+        writer.close()
+        self.assertTrue(self.replica.stats()['stale'])
+        self.assertEqual(self._count_projects(), before)
+        
+        self.assertTrue(self.replica.refresh())
+        self.assertEqual(self._count_projects(), 0)
+        self.assertEqual(self.replica.stats()['generation'], 2)
+        self.assertGreaterEqual(self.pool.stats()['recycled'], 1)
+    
+    def test_child_process_builds_its_own_copy(self):
+        """Test that a forked process never uses or closes its parent's replica"""
+        parent_uri = self.replica.uri
+        self.assertFalse(self.replica.open())
+        with mock.patch('db_replica.os.getpid', return_value=os.getpid() + 1):
+            self.assertTrue(self.replica.open())
+            self.assertNotEqual(self.replica.uri, parent_uri)
+            self.assertFalse(self.replica.open())
+        # The parent's generation is still alive for the parent's connections
+        probe = sqlite3.connect(parent_uri, uri=True)
+        try:
+            self.assertGreater(probe.execute('SELECT COUNT(*) FROM skills').fetchone()[0], 0)
+        finally:
+            probe.close()
+    
+    def test_reload_endpoint_requires_token(self):
+        """Test that the admin reload endpoint is hidden or forbidden without the token"""
+        client = app.test_client()
+        original = app_module.ADMIN_TOKEN
+        try:
+            app_module.ADMIN_TOKEN = ''
+            self.assertEqual(client.post('/admin/replica/reload').status_code, 404)
+            app_module.ADMIN_TOKEN = 'secret'
+            response = client.post('/admin/replica/reload', headers={'X-Admin-Token': 'wrong'})
+            self.assertEqual(response.status_code, 403)
+        finally:
+            app_module.ADMIN_TOKEN = original
+
+
+class ASGIBridgeTestCase(unittest.TestCase):
+    """Test cases for the ASGI serving path"""
+    
+    def setUp(self):
+        """Stub WSGI app whose /query blocks until released"""
+        self.release = threading.Event()
+        
+        def wsgi_app(environ, start_response):
+            if environ['PATH_INFO'] == '/query':
+                self.release.wait(5)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['PATH_INFO'].encode()]
+        
+        self.stub = WSGIBridge(wsgi_app, db_workers=1, web_workers=1, backlog=0)
+    
+    def tearDown(self):
+        """Unblock any waiting request"""
+        self.release.set()
+        for lane in (self.stub.db_lane, self.stub.web_lane):
+            lane.executor.shutdown(wait=True)
+    
+    async def _request(self, bridge, method, path, body=b'', headers=(), messages=None):
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+            'headers': [(b'content-type', b'application/json')] + list(headers),
+        }
+        messages = messages or [{'type': 'http.request', 'body': body}]
+        sent = []
+        
+        async def receive():
+            return messages.pop(0)
+        
+        async def send(message):
+            sent.append(message)
+        
+        await bridge(scope, receive, send)
+        body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+        return (sent[0]['status'] if sent else None), body
+    
+    def test_routes_through_flask_app(self):
+        """Test that the real app answers /health and /query over ASGI"""
+        import asgi
+        
+        async def scenario():
+            health = await self._request(asgi.application, 'GET', '/health')
+            query = await self._request(
+                asgi.application, 'POST', '/query',
+                json.dumps({'query': 'SELECT id FROM projects LIMIT 1'}).encode(),
+            )
+            return health, query
+        
+        (health_status, _), (query_status, body) = asyncio.run(scenario())
+        self.assertEqual((health_status, query_status), (200, 200))
+        self.assertEqual(json.loads(body)['row_count'], 1)
+    
+    def test_slow_query_does_not_block_cheap_routes(self):
+        """Test that /health completes while a /query holds the database lane"""
+        async def scenario():
+            slow = asyncio.ensure_future(self._request(self.stub, 'POST', '/query'))
+            await asyncio.sleep(0.05)
+            fast = await asyncio.wait_for(self._request(self.stub, 'GET', '/health'), 2)
+            self.assertFalse(slow.done())
+            self.release.set()
+            return fast, await slow
+        
+        fast, slow = asyncio.run(scenario())
+        self.assertEqual(fast, (200, b'/health'))
+        self.assertEqual(slow, (200, b'/query'))
+    
+    def test_full_lane_sheds_with_503(self):
+        """Test that a lane beyond its backlog answers 503 with Retry-After"""
+        async def scenario():
+            slow = asyncio.ensure_future(self._request(self.stub, 'POST', '/query'))
+            await asyncio.sleep(0.05)
+            shed = await self._request(self.stub, 'POST', '/query')
+            self.release.set()
+            await slow
+            return shed
+        
+        status, _ = asyncio.run(scenario())
+        self.assertEqual(status, 503)
+        self.assertEqual(self.stub.stats()['db']['rejected'], 1)
+        
+        with mock.patch.object(app_module, 'worker_metric_sources', [self.stub.metric_series]):
+            text = app.test_client().get('/metrics').data.decode()
+        pid = os.getpid()
+        self.assertIn(f'portfolio_asgi_db_lane_rejected_total{{pid="{pid}"}} 1', text)
+        self.assertIn(f'portfolio_asgi_web_lane_rejected_total{{pid="{pid}"}} 0', text)
+    
+    def test_disconnect_mid_body_aborts_request(self):
+        """Test that a body cut short by a disconnect never reaches the app"""
+        calls = []
+        
+        def wsgi_app(environ, start_response):
+            calls.append(environ['wsgi.input'].read())
+            start_response('200 OK', [])
+            return [b'']
+        
+        bridge = WSGIBridge(wsgi_app, db_workers=1, web_workers=1)
+        messages = [{'type': 'http.request', 'body': b'{"query": "SEL', 'more_body': True},
+                    {'type': 'http.disconnect'}]
+        try:
+            result = asyncio.run(self._request(bridge, 'POST', '/query', messages=messages))
+        finally:
+            bridge.db_lane.executor.shutdown(wait=True)
+            bridge.web_lane.executor.shutdown(wait=True)
+        self.assertEqual(result, (None, b''))
+        self.assertEqual(calls, [])
+    
+    def test_repeated_headers_are_joined(self):
+        """Test that repeated Cookie headers join with "; " and others with ","""
+        scope = {
+            'method': 'GET', 'path': '/', 'headers': [
+                (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+                (b'accept', b'text/html'), (b'accept', b'*/*'),
+            ],
+        }
+        environ = build_environ(scope, b'')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,*/*')
+
+
+class GunicornConfigTestCase(unittest.TestCase):
+    """Test cases for the shared gunicorn configuration"""
+    
+    def _load(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(os.path.join(os.path.dirname(__file__), 'gunicorn.conf.py'))
+    
+    def test_defaults_follow_cpu_count(self):
+        """Test that gthread workers and threads are derived, not hard-coded"""
+        with mock.patch.dict(os.environ):
+            for name in ('WEB_CONCURRENCY', 'GUNICORN_WORKER_CLASS', 'GUNICORN_THREADS'):
+                os.environ.pop(name, None)
+            settings = self._load(DB_POOL_SIZE='3')
+        self.assertEqual(settings['worker_class'], 'gthread')
+        self.assertEqual(settings['threads'], 3)
+        self.assertEqual(settings['workers'], min(os.cpu_count() + 1, 8))
+        self.assertTrue(settings['preload_app'])
+    
+    def test_environment_overrides(self):
+        """Test WEB_CONCURRENCY and the sync worker mode"""
+        settings = self._load(WEB_CONCURRENCY='3', GUNICORN_WORKER_CLASS='sync')
+        self.assertEqual((settings['workers'], settings['threads']), (3, 1))
+    
+    def test_replica_is_built_after_fork(self):
+        """Test that the master imports no replica and workers build their own"""
+        replica = MemoryReplica(DB_PATH, ['projects'])
+        self.assertIsNone(replica.uri)
+        with mock.patch.object(app_module, 'replica', replica):
+            app_module.open_worker_resources()
+            self.assertIsNotNone(replica.uri)
+            self._load()['worker_exit'](None, None)
+            self.assertIsNone(replica.uri)
+    
+    def test_worker_exit_releases_resources(self):
+        """Test that the worker_exit hook closes connections and clears caches"""
+        app_module.open_worker_resources()
+        app_module.result_cache.put('key', b'value', 5)
+        self._load()['worker_exit'](None, None)
+        self.assertEqual(app_module.db_pool.stats()['idle'], 0)
+        self.assertEqual(len(app_module.result_cache), 0)
+
+
+class LoadTestGateTestCase(unittest.TestCase):
+    """Test cases for the load-test regression gate"""
+    
+    def setUp(self):
+        """A baseline for one endpoint"""
+        self.baseline = {
+            'GET /health': {'errors': 0, 'rps': 100.0, 'p50_ms': 5.0, 'p95_ms': 10.0, 'p99_ms': 20.0}
+        }
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles, including the empty case"""
+        samples = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 51.0)
+        self.assertEqual(percentile(samples, 99), 100.0)
+        self.assertEqual(percentile([], 95), 0.0)
+    
+    def test_within_threshold_passes(self):
+        """Test that small changes in either direction are not regressions"""
+        current = {'GET /health': dict(self.baseline['GET /health'], rps=90.0, p95_ms=11.0)}
+        self.assertEqual(compare(self.baseline, current, 0.25), [])
+    
+    def test_regressions_reported(self):
+        """Test that slower latency, lower throughput and new errors fail"""
+        current = {
+            'GET /health': {'errors': 2, 'rps': 50.0, 'p50_ms': 5.0, 'p95_ms': 30.0, 'p99_ms': 20.0}
+        }
+        regressions = compare(self.baseline, current, 0.25)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(any('p95_ms' in message for message in regressions))
+        self.assertTrue(any('rps' in message for message in regressions))
+        self.assertIn('missing', compare(self.baseline, {}, 0.25)[0])
+    
+    def test_median_of_runs_ignores_an_outlier(self):
+        """Test that one noisy run does not move the gated result"""
+        runs = [
+            {'GET /health': dict(self.baseline['GET /health'], rps=rps, p95_ms=p95)}
+            for rps, p95 in [(100.0, 10.0), (40.0, 45.0), (98.0, 11.0)]
+        ]
+        combined = median_results(runs)
+        self.assertEqual((combined['GET /health']['rps'], combined['GET /health']['p95_ms']),
+                         (98.0, 11.0))
+        self.assertEqual(compare(self.baseline, combined, 0.25), [])
+
+
+class BenchmarkCorpusTestCase(unittest.TestCase):
+    """Test cases for the generated benchmark corpus"""
+    
+    def test_corpus_kinds_match_validator(self):
+        """Test that valid queries pass and run, and the rest are rejected"""
+        corpus = generate_corpus(count=300, seed=1)
+        self.assertEqual({kind for kind, _ in corpus}, {'valid', 'malicious', 'oversized'})
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            for kind, sql in corpus:
+                is_valid, _ = validate_sql_query(sql)
+                self.assertEqual(is_valid, kind == 'valid', sql)
+                if is_valid:
+                    conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Test cases for Server-Timing and the /metrics histograms"""
+    
+    def setUp(self):
+        """Start from empty counters"""
+        app_module.request_metrics.reset()
+        self.client = app.test_client()
+    
+    def test_server_timing_stages(self):
+        """Test that an executed /query reports each pipeline stage"""
+        response = self.client.post(
+            '/query',
+            data=json.dumps({'query': 'SELECT id, name FROM clients WHERE age > 0'}),
+            content_type='application/json',
+        )
+        stages = [part.split(';')[0] for part in response.headers['Server-Timing'].split(', ')]
+        for stage in ('validate', 'acquire', 'plan', 'execute', 'fetch', 'encode', 'total'):
+            self.assertIn(stage, stages)
+    
+    def test_metrics_exposition(self):
+        """Test request counters and histograms in Prometheus text format"""
+        self.client.get('/health')
+        self.client.get('/health')
+        self.client.get('/missing')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.data.decode()
+        self.assertIn('portfolio_requests_total{endpoint="health_check",status="2xx"} 2', text)
+        self.assertIn('portfolio_requests_total{endpoint="other",status="4xx"} 1', text)
+        pid = os.getpid()
+        self.assertIn(f'portfolio_db_pool_size{{pid="{pid}"}} {app_module.db_pool.size}', text)
+        self.assertIn(f'portfolio_db_pool_checkouts_total{{pid="{pid}"}}', text)
+        self.assertIn('# TYPE portfolio_db_pool_wait_seconds_max gauge', text)
+        self.assertIn(f'portfolio_query_deadline_aborted_total{{pid="{pid}"}}', text)
+        self.assertIn(f'portfolio_query_cost_rejected_total{{pid="{pid}"}}', text)
+        self.assertIn(f'portfolio_validation_cache_misses_total{{pid="{pid}"}}', text)
+        self.assertIn(f'portfolio_result_cache_hits_total{{pid="{pid}"}}', text)
+        self.assertIn('# TYPE portfolio_result_cache_bytes gauge', text)
+        self.assertIn(
+            'portfolio_request_duration_seconds_bucket{endpoint="health_check",le="+Inf"} 2', text
+        )
+        self.assertIn('portfolio_request_duration_seconds_count{endpoint="health_check"} 2', text)
+    
+    def test_metrics_optional_subsystems(self):
+        """Test that optional subsystems add their series only when enabled"""
+        with mock.patch.object(app_module, 'query_flights', None):
+            text = self.client.get('/metrics').data.decode()
+        self.assertNotIn('portfolio_query_coalesce', text)
+        self.assertNotIn('portfolio_admission', text)
+        
+        flights = SingleFlight(timeout=5)
+        with mock.patch.object(app_module, 'query_flights', flights), \
+                mock.patch.object(app_module.result_cache, 'max_bytes', 0):
+            self.client.post('/query', json={'query': 'SELECT id FROM projects'})
+            text = self.client.get('/metrics').data.decode()
+        pid = os.getpid()
+        self.assertIn(f'portfolio_query_coalesce_executions_total{{pid="{pid}"}} 1', text)
+        self.assertIn(f'portfolio_query_coalesce_saved_total{{pid="{pid}"}} 0', text)
+        self.assertIn('# TYPE portfolio_query_coalesce_timeouts_total counter', text)
+        
+        controller = AdmissionController(rate=0.5, burst=1, max_concurrent=0)
+        with mock.patch.object(app_module, 'admission', controller):
+            self.client.post('/query', json={'query': 'SELECT id FROM projects'})
+            self.client.post('/query', json={'query': 'SELECT id FROM projects'})
+            text = self.client.get('/metrics').data.decode()
+        self.assertIn('portfolio_admission_admitted_total 1\n', text)
+        self.assertIn('portfolio_admission_throttled_total 1\n', text)
+        self.assertIn('portfolio_admission_shed_total 0\n', text)
+    
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_counts_shared_across_forked_workers(self):
+        """Test that observations made in a forked child are visible to the parent"""
+        registry = MetricsRegistry(('query', 'other'), ('execute',))
+        registry.observe_request('query', 200, 0.002, {'execute': 0.001})
+        pid = os.fork()
+        if pid == 0:
+            registry.observe_request('query', 500, 0.2, {'execute': 0.15})
+            os._exit(0)
+        os.waitpid(pid, 0)
+        text = registry.render()
+        self.assertIn('portfolio_request_duration_seconds_count{endpoint="query"} 2', text)
+        self.assertIn('portfolio_requests_total{endpoint="query",status="5xx"} 1', text)
+        self.assertIn(
+            'portfolio_stage_duration_seconds_bucket{endpoint="query",stage="execute",le="0.25"} 2',
+            text,
+        )
+
+
+class AdmissionControlTestCase(unittest.TestCase):
+    """Test cases for /query admission control"""
+    
+    def test_disabled_by_default(self):
+        """Test that admission control is opt-in"""
+        controller = AdmissionController()
+        self.assertFalse(controller.enabled)
+        for _ in range(100):
+            self.assertIsNone(controller.admit('10.0.0.1'))
+    
+    def test_token_bucket_per_client(self):
+        """Test that each client gets its burst, then 429s with Retry-After"""
+        controller = AdmissionController(rate=0.5, burst=3, max_concurrent=0)
+        for _ in range(3):
+            self.assertIsNone(controller.admit('10.0.0.1'))
+            controller.release()
+        rejection = controller.admit('10.0.0.1')
+        self.assertEqual(rejection.status, 429)
+        self.assertEqual(rejection.retry_after, 2)
+        self.assertIsNone(controller.admit('10.0.0.2'))
+        self.assertEqual(controller.stats()['throttled'], 1)
+    
+    def test_concurrency_limit_sheds_and_refunds(self):
+        """Test that requests over the global limit get 503 without spending a token"""
+        controller = AdmissionController(rate=0.01, burst=3, max_concurrent=2, retry_after=2)
+        self.assertIsNone(controller.admit('10.0.0.1'))
+        self.assertIsNone(controller.admit('10.0.0.2'))
+        rejection = controller.admit('10.0.0.1')
+        self.assertEqual((rejection.status, rejection.retry_after), (503, 2))
+        
+        controller.release()
+        self.assertIsNone(controller.admit('10.0.0.1'))
+        stats = controller.stats()
+        self.assertEqual((stats['in_flight'], stats['admitted'], stats['shed']), (2, 3, 1))
+        # The shed request's token was given back, so a third one is left
+        controller.release()
+        self.assertIsNone(controller.admit('10.0.0.1'))
+    
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_state_shared_across_forked_workers(self):
+        """Test that a forked worker's buckets and in-flight requests count for all"""
+        controller = AdmissionController(rate=0.1, burst=2, max_concurrent=1)
+        self.assertIsNone(controller.admit('10.0.0.1'))
+        pid = os.fork()
+        if pid == 0:
+            # The parent's request is in flight, so this one is shed
+            rejection = controller.admit('10.0.0.2')
+            os._exit(0 if rejection is not None and rejection.status == 503 else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        controller.release()
+        
+        pid = os.fork()
+        if pid == 0:
+            controller.admit('10.0.0.1')
+            os._exit(0)
+        os.waitpid(pid, 0)
+        # The exited child never released; its slot no longer counts once reused
+        self.assertEqual(controller.admit('10.0.0.1').status, 429)
+        self.assertEqual(controller.stats()['admitted'], 2)
+    
+    def test_only_query_is_shed(self):
+        """Test that /query is rejected while /health and static files are served"""
+        client = app.test_client()
+        controller = AdmissionController(rate=0.5, burst=1, max_concurrent=0)
+        with mock.patch.object(app_module, 'admission', controller):
+            self.assertEqual(client.post('/query', json={'query': 'SELECT id FROM projects'}).status_code, 200)
+            response = client.post('/query', json={'query': 'SELECT id FROM projects'})
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '2')
+            self.assertIn('error', response.get_json())
+            self.assertEqual(client.get('/health').status_code, 200)
+            self.assertEqual(client.get('/static/sw.js').status_code, 200)
+            self.assertEqual(client.get('/').status_code, 200)
+        self.assertEqual(controller.stats()['in_flight'], 0)
+    
+    def test_client_address_behind_proxies(self):
+        """Test that the trusted hop of X-Forwarded-For identifies the client"""
+        headers = {'X-Forwarded-For': '203.0.113.7, 10.0.0.9'}
+        with mock.patch.object(app_module, 'ADMISSION_PROXY_HOPS', 2), \
+                app.test_request_context('/query', headers=headers):
+            self.assertEqual(app_module._client_address(), '203.0.113.7')
+        with app.test_request_context(
+            '/query', headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.9'}
+        ):
+            self.assertEqual(app_module._client_address(), '10.0.0.9')
+
+
+class QueryBatchTestCase(unittest.TestCase):
+    """Test cases for the /query/batch endpoint"""
+    
+    def setUp(self):
+        self.client = app.test_client()
+    
+    def test_results_in_order_with_per_query_errors(self):
+        """Test that each query gets its own result or error, in order"""
+        response = self.client.post('/query/batch', json={'queries': [
+            'SELECT id, name FROM projects ORDER BY id LIMIT 2',
+            'DROP TABLE projects',
+            'SELECT COUNT(*) AS n FROM skills',
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        results = data['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['columns'], ['id', 'name'])
+        self.assertEqual(results[0]['row_count'], 2)
+        self.assertEqual(results[1]['status'], 400)
+        self.assertIn('DROP', results[1]['error'])
+        self.assertEqual(results[2]['columns'], ['n'])
+        self.assertEqual(data['row_count'], 3)
+        
+        columnar = self.client.post('/query/batch', json={
+            'queries': ['SELECT id FROM projects ORDER BY id LIMIT 2'], 'format': 'columnar',
+        }).get_json()
+        self.assertEqual(columnar['results'][0]['data'], [[1, 2]])
+    
+    def test_one_connection_and_transaction(self):
+        """Test that the batch checks out one connection and leaves no transaction open"""
+        before = app_module.db_pool.checkouts
+        queries = ['SELECT id FROM projects LIMIT 1'] * 3
+        self.assertEqual(self.client.post('/query/batch', json={'queries': queries}).status_code, 200)
+        self.assertEqual(app_module.db_pool.checkouts - before, 1)
+        with app_module.db_pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+    
+    def test_row_limit_across_results(self):
+        """Test that the total row cap truncates with a cursor, then skips queries"""
+        with mock.patch.object(app_module, 'BATCH_MAX_ROWS', 2):
+            data = self.client.post('/query/batch', json={'queries': [
+                'SELECT id FROM projects ORDER BY id',
+                'SELECT name FROM skills',
+            ]}).get_json()
+        first, second = data['results']
+        self.assertEqual(data['row_count'], 2)
+        self.assertIsNotNone(first['next_cursor'])
+        self.assertEqual(second['status'], 413)
+        
+        # The cursor continues the statement on /query
+        following = self.client.post('/query', json={
+            'query': 'SELECT id FROM projects ORDER BY id', 'cursor': first['next_cursor'],
+        }).get_json()
+        self.assertEqual(following['rows'][0], [3])
+    
+    def test_rejects_malformed_batches(self):
+        """Test that bad bodies and oversized batches are rejected as a whole"""
+        self.assertEqual(self.client.post('/query/batch', data='x').status_code, 400)
+        self.assertEqual(self.client.post('/query/batch', json={'queries': []}).status_code, 400)
+        self.assertEqual(self.client.post('/query/batch', json={'queries': 'SELECT 1'}).status_code, 400)
+        too_many = ['SELECT id FROM projects'] * (app_module.BATCH_MAX_QUERIES + 1)
+        self.assertEqual(self.client.post('/query/batch', json={'queries': too_many}).status_code, 400)
+        response = self.client.post('/query/batch', json={'queries': ['SELECT 1 FROM projects'], 'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        
+        entry = self.client.post('/query/batch', json={'queries': [42]}).get_json()['results'][0]
+        self.assertEqual(entry['status'], 400)
+        
+        response = self.client.post('/query/batch', json={'queries': ['SELECT 1'], 'format': ['x']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown format', response.get_json()['error'])
+    
+    def test_unexpected_error_is_json(self):
+        """Test that an unexpected failure still answers with a JSON 500"""
+        with mock.patch.object(app_module, '_run_batch_query', side_effect=RuntimeError('boom')):
+            response = self.client.post('/query/batch', json={'queries': ['SELECT * FROM skills']})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.get_json(), {'error': 'Internal server error'})
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Test cases for coalescing identical concurrent executions"""
+    
+    def _run_concurrently(self, flights, work, waiters):
+        """Start a leader plus ``waiters`` callers once the leader is running"""
+        outcomes = []
+        
+        def call():
+            try:
+                outcomes.append(('ok',) + flights.do('key', work))
+            except Exception as e:
+                outcomes.append(('error', e))
+        
+        threads = [threading.Thread(target=call) for _ in range(waiters + 1)]
+        threads[0].start()
+        self.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flights._flights['key'].waiters < waiters and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+    
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+    
+    def _blocking(self, result=None, error=None):
+        def work():
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+        return work
+    
+    def test_waiters_share_one_execution(self):
+        """Test that concurrent callers get the running execution's result"""
+        flights = SingleFlight(timeout=5)
+        outcomes = self._run_concurrently(flights, self._blocking(result='rows'), 4)
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(o[2] for o in outcomes), [False, True, True, True, True])
+        self.assertTrue(all(o[1] == 'rows' for o in outcomes))
+        stats = flights.stats()
+        self.assertEqual((stats['executions'], stats['saved'], stats['in_flight']), (1, 4, 0))
+        
+        # Once landed, the next call executes again
+        self.assertEqual(flights.do('key', lambda: 'fresh'), ('fresh', False))
+    
+    def test_errors_reach_every_waiter(self):
+        """Test that the execution's exception is raised in all callers"""
+        flights = SingleFlight(timeout=5)
+        error = sqlite3.OperationalError('boom')
+        outcomes = self._run_concurrently(flights, self._blocking(error=error), 3)
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([o[0] for o in outcomes], ['error'] * 4)
+        self.assertTrue(all(o[1] is error for o in outcomes))
+        self.assertEqual(flights.stats()['shared_errors'], 3)
+    
+    def test_wait_is_bounded(self):
+        """Test that a waiter gives up on a stuck execution and runs its own"""
+        flights = SingleFlight(timeout=0.05)
+        leader = threading.Thread(target=flights.do, args=('key', self._blocking()))
+        leader.start()
+        self.started.wait(5)
+        try:
+            self.assertEqual(flights.do('key', lambda: 'own'), ('own', False))
+        finally:
+            self.release.set()
+            leader.join(5)
+        self.assertEqual(flights.stats()['timeouts'], 1)
+    
+    def test_disabled_or_unkeyed_runs_directly(self):
+        """Test that a zero timeout or a None key never coalesces"""
+        self.assertEqual(SingleFlight(timeout=0).do('key', lambda: 1), (1, False))
+        self.assertEqual(SingleFlight().do(None, lambda: 2), (2, False))
+        self.assertFalse(SingleFlight(timeout=0).stats()['enabled'])
+    
+    def test_identical_queries_execute_once(self):
+        """Test that concurrent identical /query requests share one execution"""
+        client_results = []
+        real_fetch_page = app_module.fetch_page
+        
+        def blocking_fetch_page(*args, **kwargs):
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            return real_fetch_page(*args, **kwargs)
+        
+        def post():
+            response = app.test_client().post(
+                '/query', json={'query': "SELECT name FROM skills WHERE category = 'Coalesce'"}
+            )
+            client_results.append((response.status_code, response.data))
+        
+        flights = SingleFlight(timeout=5)
+        with mock.patch.object(app_module, 'fetch_page', blocking_fetch_page), \
+                mock.patch.object(app_module, 'query_flights', flights), \
+                mock.patch.object(app_module.result_cache, 'max_bytes', 0):
+            threads = [threading.Thread(target=post) for _ in range(4)]
+            threads[0].start()
+            self.started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and (
+                not flights._flights or next(iter(flights._flights.values())).waiters < 3
+            ):
+                time.sleep(0.001)
+            self.release.set()
+            for thread in threads:
+                thread.join(5)
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([status for status, _ in client_results], [200] * 4)
+        self.assertEqual(len({body for _, body in client_results}), 1)
+        self.assertEqual(flights.stats()['saved'], 3)
+    
+    def test_alias_case_is_not_coalesced(self):
+        """Test that queries differing only in alias case run separately"""
+        real_fetch_page = app_module.fetch_page
+        
+        def blocking_fetch_page(*args, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                self.started.set()
+                self.release.wait(5)
+            return real_fetch_page(*args, **kwargs)
+        
+        def post(alias, results):
+            response = app.test_client().post(
+                '/query', json={'query': f'SELECT name AS {alias} FROM skills'}
+            )
+            results.append(response.get_json()['columns'])
+        
+        leader_results, other_results = [], []
+        flights = SingleFlight(timeout=5)
+        with mock.patch.object(app_module, 'fetch_page', blocking_fetch_page), \
+                mock.patch.object(app_module, 'query_flights', flights), \
+                mock.patch.object(app_module.result_cache, 'max_bytes', 0):
+            leader = threading.Thread(target=post, args=('Foo', leader_results))
+            leader.start()
+            self.started.wait(5)
+            try:
+                post('foo', other_results)
+            finally:
+                self.release.set()
+                leader.join(5)
+        
+        self.assertEqual((leader_results, other_results), ([['Foo']], [['foo']]))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(flights.stats()['saved'], 0)
+
+
+class SlowQueryLogTestCase(unittest.TestCase):
+    """Test cases for the slow-query log"""
+    
+    def setUp(self):
+        """Record every /query statement in a fresh log"""
+        self.original = app_module.slow_query_log
+        app_module.slow_query_log = SlowQueryLog(1e-9, capacity=10)
+        self.original_token = app_module.ADMIN_TOKEN
+        app_module.ADMIN_TOKEN = 'secret'
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        app_module.slow_query_log = self.original
+        app_module.ADMIN_TOKEN = self.original_token
+    
+    def test_fingerprint_replaces_literals(self):
+        """Test that statements differing only in literals share a fingerprint"""
+        first = fingerprint_query("SELECT * FROM clients WHERE age > 25 AND name = 'Ann' -- x")
+        second = fingerprint_query("SELECT * FROM clients WHERE age > 40 AND name = 'Bob'")
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'SELECT * FROM CLIENTS WHERE AGE > ? AND NAME = ?')
+    
+    def test_ring_buffer_and_grouping(self):
+        """Test that the buffer is bounded and top() groups by fingerprint"""
+        log = SlowQueryLog(0.1, capacity=3)
+        self.assertFalse(log.is_slow(0.05))
+        self.assertTrue(log.is_slow(0.2))
+        log.record('SELECT * FROM skills WHERE id = 1', 0.2)
+        log.record('SELECT * FROM skills WHERE id = 2', 0.4)
+        log.record('SELECT * FROM projects', 0.5)
+        log.record('SELECT * FROM projects', 0.1)
+        self.assertEqual(log.stats()['buffered'], 3)
+        self.assertEqual(log.stats()['recorded'], 4)
+        
+        by_count = log.top(sort='count')
+        self.assertEqual(by_count[0]['query'], 'SELECT * FROM PROJECTS')
+        self.assertEqual(by_count[0]['count'], 2)
+        by_max = log.top(sort='max')
+        self.assertEqual(by_max[0]['max_ms'], 500.0)
+        self.assertEqual(log.recent(1)[0]['duration_ms'], 100.0)
+        self.assertFalse(SlowQueryLog(0).is_slow(10.0))
+    
+    def test_writes_json_lines_file(self):
+        """Test that entries are appended to the log file as JSON lines"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'slow-{pid}.jsonl')
+        log = SlowQueryLog(0.1, log_file=path)
+        log.record('SELECT * FROM education', 0.3, {'execute': 0.25}, 2, ['SCAN education'], 10.0)
+        
+        with open(path.replace('{pid}', str(os.getpid()))) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['stages_ms'], {'execute': 250.0})
+        self.assertEqual(lines[0]['plan'], ['SCAN education'])
+    
+    def test_query_records_plan_and_rows(self):
+        """Test that a slow /query is recorded with its plan, stages and row count"""
+        response = self.client.post('/query', json={'query': 'SELECT * FROM skills WHERE id > 1'})
+        self.assertEqual(response.status_code, 200)
+        
+        entry = app_module.slow_query_log.recent(1)[0]
+        self.assertEqual(entry['query'], 'SELECT * FROM SKILLS WHERE ID > ?')
+        self.assertEqual(entry['row_count'], json.loads(response.data)['row_count'])
+        self.assertTrue(entry['plan'])
+        self.assertIn('execute', entry['stages_ms'])
+        self.assertIsNone(entry['error'])
+    
+    def test_endpoint_lists_offenders(self):
+        """Test that the slow-query endpoint is protected and lists top offenders"""
+        self.client.post('/query', json={'query': 'SELECT * FROM projects WHERE id > 1'})
+        self.client.post('/query', json={'query': 'SELECT * FROM projects WHERE id > 2'})
+        
+        self.assertEqual(self.client.get('/admin/slow-queries').status_code, 403)
+        headers = {'X-Admin-Token': 'secret'}
+        response = self.client.get('/admin/slow-queries?sort=count', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['offenders'][0]['query'], 'SELECT * FROM PROJECTS WHERE ID > ?')
+        self.assertEqual(data['offenders'][0]['count'], 2)
+        self.assertEqual(len(data['recent']), 2)
+        self.assertEqual((data['scope'], data['pid']), ('worker', os.getpid()))
+        self.assertEqual(response.headers['X-Worker-Pid'], str(os.getpid()))
+        
+        response = self.client.get('/admin/slow-queries?sort=bogus', headers=headers)
+        self.assertEqual(response.status_code, 400)
+        app_module.ADMIN_TOKEN = ''
+        self.assertEqual(self.client.get('/admin/slow-queries').status_code, 404)
+
+
+def _unmigrated_copy(directory):
+    """Copy portfolio.db into ``directory`` with its indexes and version removed"""
+    path = os.path.join(directory, 'portfolio.db')
+    source = sqlite3.connect(DB_PATH)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    names = target.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    ).fetchall()
+    for (name,) in names:
+        target.execute(f'DROP INDEX {name}')
+    target.execute('DROP TABLE IF EXISTS sqlite_stat1')
+    target.execute('PRAGMA user_version = 0')
+    target.commit()
+    target.close()
+    return path
+
+
+class MigrationsTestCase(unittest.TestCase):
+    """Test cases for the versioned schema migrations"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = _unmigrated_copy(self.directory)
+    
+    def _plan(self, sql):
+        conn = sqlite3.connect(self.path)
+        try:
+            return ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+        finally:
+            conn.close()
+    
+    def test_applies_pending_migrations_once(self):
+        """Test that migrations run in order and a current database is left alone"""
+        self.assertIn('SCAN skills', self._plan("SELECT name FROM skills WHERE category = 'x'"))
+        self.assertEqual(apply_migrations(self.path), len(MIGRATIONS))
+        
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], LATEST_VERSION)
+        conn.close()
+        self.assertIn(
+            'USING COVERING INDEX idx_skills_category',
+            self._plan("SELECT name FROM skills WHERE category = 'x'"),
+        )
+        self.assertIn(
+            'SEARCH clients USING COVERING INDEX idx_clients_age',
+            self._plan('SELECT name, email FROM clients WHERE age > 25'),
+        )
+        
+        mtime = os.stat(self.path).st_mtime_ns
+        self.assertEqual(apply_migrations(self.path), 0)
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+    
+    def test_failed_migration_is_rolled_back(self):
+        """Test that a failing migration leaves the version and schema unchanged"""
+        broken = MIGRATIONS + (
+            Migration(99, 'broken', ('CREATE INDEX idx_broken ON projects (name)', 'NOT SQL')),
+        )
+        with self.assertRaises(sqlite3.Error):
+            apply_migrations(self.path, broken)
+        
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], LATEST_VERSION)
+        self.assertIsNone(
+            conn.execute("SELECT name FROM sqlite_master WHERE name = 'idx_broken'").fetchone()
+        )
+        conn.close()
+    
+    def test_command_line_migrates_the_given_file(self):
+        """Test that the deploy step migrates the file it is given"""
+        self.assertEqual(migrate_main([self.path]), 0)
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], LATEST_VERSION)
+        conn.close()
+        self.assertEqual(migrate_main([os.path.join(self.directory, 'missing.db')]), 1)
+    
+    def test_missing_database_is_not_created(self):
+        """Test that migrating a missing file raises instead of creating it"""
+        missing = os.path.join(self.directory, 'missing.db')
+        with self.assertRaises(sqlite3.Error):
+            apply_migrations(missing)
+        self.assertFalse(os.path.exists(missing))
+
+
+class IndexAdvisorTestCase(unittest.TestCase):
+    """Test cases for the index advisor"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = _unmigrated_copy(self.directory)
+    
+    def test_column_roles(self):
+        """Test that filter, sort and output columns are told apart per table"""
+        tables = {'projects': ['id', 'name'], 'skills': ['id', 'name', 'category']}
+        roles = column_roles(
+            "SELECT s.name FROM projects p JOIN skills s ON p.id = s.id "
+            "WHERE s.category = 'x' ORDER BY s.name",
+            'skills',
+            tables,
+        )
+        self.assertEqual(roles, (['id', 'category'], [], ['name'], ['name']))
+    
+    def test_proposes_index_for_scanned_filter(self):
+        """Test that a filtered full scan yields an index proposal with its gain"""
+        traffic = load_traffic([])
+        traffic.update(["SELECT * FROM clients WHERE email = 'a@b.c'"] * 3)
+        traffic.update(['SELECT name FROM skills WHERE category = ?'])
+        traffic.update(['DELETE FROM clients'])
+        proposals, skipped = advise(self.path, traffic, loops=1)
+        
+        indexes = {p.create_sql() for p in proposals}
+        self.assertIn('CREATE INDEX IF NOT EXISTS idx_clients_email ON clients (email)', indexes)
+        self.assertIn(
+            'CREATE INDEX IF NOT EXISTS idx_skills_category ON skills (category)', indexes
+        )
+        self.assertEqual(skipped, ['DELETE FROM clients'])
+        
+        email = next(p for p in proposals if p.columns == ('email',)).summary()
+        self.assertEqual(email['occurrences'], 3)
+        self.assertGreater(email['estimated_speedup'], 1)
+        self.assertIsNotNone(email['measured_speedup'])
+    
+    def test_reads_slow_query_log(self):
+        """Test that traffic is read from slow-query log files and their rotations"""
+        path = os.path.join(self.directory, 'slow.jsonl')
+        log = SlowQueryLog(0.1, log_file=path)
+        log.record('SELECT * FROM clients WHERE age > 30', 0.2)
+        log.record('SELECT * FROM clients WHERE age > 40', 0.2)
+        with open(path + '.1', 'w') as f:
+            f.write('SELECT * FROM projects\n')
+        
+        traffic = load_traffic([path])
+        self.assertEqual(traffic['SELECT * FROM CLIENTS WHERE AGE > ?'], 2)
+        self.assertEqual(traffic['SELECT * FROM projects'], 1)
+        proposals, _ = advise(self.path, traffic, loops=1)
+        self.assertEqual([p.columns for p in proposals], [('age',)])
+
+
+class StaticAssetTestCase(unittest.TestCase):
+    """Test cases for the hashed, precompressed static assets"""
+    
+    def setUp(self):
+        """Build the assets into a copy of the static folder"""
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_dir)
+        for name in ('styles.css', 'script.js', 'analytics.js', 'sw.js'):
+            shutil.copy(os.path.join(app.static_folder, name), self.static_dir)
+        self.manifest = build_assets(self.static_dir)
+        
+        self.originals = (app_module.ASSET_DIR, app_module.asset_manifest)
+        app_module.ASSET_DIR = os.path.join(self.static_dir, 'dist')
+        app_module.asset_manifest = AssetManifest(self.static_dir)
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        app_module.ASSET_DIR, app_module.asset_manifest = self.originals
+    
+    def test_build_writes_hashed_files_and_variants(self):
+        """Test that the build writes hashed copies, gzip variants and a manifest"""
+        path = self.manifest['styles.css']
+        self.assertRegex(path, r'^dist/styles\.[0-9a-f]{10}\.css$')
+        with open(os.path.join(self.static_dir, 'styles.css'), 'rb') as f:
+            original = f.read()
+        with open(os.path.join(self.static_dir, path + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), original)
+        
+        with open(os.path.join(self.static_dir, 'dist', 'sw.js')) as f:
+            worker = f.read()
+        self.assertIn(f"'/static/{path}'", worker)
+        self.assertNotIn('sql-portfolio-v1', worker)
+        
+        with open(os.path.join(self.static_dir, 'styles.css'), 'a') as f:
+            f.write('\n/* changed */\n')
+        rebuilt = build_assets(self.static_dir)
+        self.assertNotEqual(rebuilt['styles.css'], path)
+        self.assertFalse(os.path.exists(os.path.join(self.static_dir, path)))
+    
+    def test_select_variant(self):
+        """Test Accept-Encoding negotiation against the files that exist"""
+        directory = os.path.join(self.static_dir, 'dist')
+        name = os.path.basename(self.manifest['script.js'])
+        self.assertEqual(select_variant(directory, name, {'gzip': 1.0}), (name + '.gz', 'gzip'))
+        self.assertEqual(select_variant(directory, name, {'*': 1.0}), (name + '.gz', 'gzip'))
+        self.assertEqual(select_variant(directory, name, {'gzip': 0}), (name, None))
+        self.assertEqual(select_variant(directory, name, {}), (name, None))
+    
+    def test_serves_precompressed_immutable_asset(self):
+        """Test that hashed assets are served gzipped and cacheable forever"""
+        url = '/static/' + self.manifest['styles.css']
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertNotIn('Content-Disposition', response.headers)
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertEqual(self.client.get(url + '.gz').status_code, 404)
+    
+    def test_templates_and_service_worker_use_build(self):
+        """Test that the page links hashed names and the built worker is served"""
+        page = self.client.get('/').data.decode()
+        self.assertIn('/static/' + self.manifest['script.js'], page)
+        self.assertNotIn('"static/styles.css"', page)
+        
+        response = self.client.get('/static/sw.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertIn(self.manifest['script.js'].encode(), response.data)
+
+
+class CompressionTestCase(unittest.TestCase):
+    """Test cases for the response compression middleware"""
+    
+    def setUp(self):
+        self.client = app.test_client()
+        self.gzip = {'Accept-Encoding': 'gzip'}
+    
+    def _call(self, middleware, headers=None):
+        """Run a WSGI app through the middleware, returning status, headers and chunks"""
+        environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip'}
+        environ.update(headers or {})
+        started = {}
+        
+        def start_response(status, response_headers, exc_info=None):
+            started['status'], started['headers'] = status, dict(response_headers)
+        
+        chunks = list(middleware(environ, start_response))
+        return started['status'], started['headers'], chunks
+    
+    def test_buffered_json_is_compressed(self):
+        """Test that a large JSON result is gzipped and still revalidates"""
+        body = {'query': 'SELECT * FROM clients'}
+        plain = self.client.post('/query', json=body)
+        response = self.client.post('/query', json=body, headers=self.gzip)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertLess(len(response.data), len(plain.data))
+        
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        revalidated = self.client.post(
+            '/query', json=body, headers={**self.gzip, 'If-None-Match': etag}
+        )
+        self.assertEqual(revalidated.status_code, 304)
+    
+    def test_small_and_unaccepted_responses_are_untouched(self):
+        """Test that tiny bodies and clients without gzip get the plain body"""
+        response = self.client.get('/health', headers=self.gzip)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(response.data)['status'], 'healthy')
+        
+        response = self.client.post('/query', json={'query': 'SELECT * FROM clients'})
+        self.assertNotIn('Content-Encoding', response.headers)
+    
+    def test_stream_is_compressed_incrementally(self):
+        """Test that each streamed chunk is flushed as soon as it is compressed"""
+        produced = []
+        
+        def wsgi_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+            for i in range(3):
+                chunk = (json.dumps({'batch': i, 'rows': [i] * 400}) + '\n').encode()
+                produced.append(chunk)
+                yield chunk
+        
+        middleware = CompressionMiddleware(wsgi_app, min_size=512)
+        environ = {'REQUEST_METHOD': 'POST', 'HTTP_ACCEPT_ENCODING': 'gzip, br'}
+        started = {}
+        
+        def start_response(status, headers, exc_info=None):
+            started['headers'] = dict(headers)
+        
+        body = iter(middleware(environ, start_response))
+        decompressor = zlib.decompressobj(31)
+        first = decompressor.decompress(next(body))
+        self.assertEqual(started['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(first, produced[0])
+        self.assertEqual(len(produced), 1)
+        rest = b''.join(decompressor.decompress(chunk) for chunk in body)
+        self.assertEqual(first + rest, b''.join(produced))
+    
+    def test_short_stream_and_encoded_bodies_pass_through(self):
+        """Test that short streams, precompressed and binary bodies are not gzipped"""
+        def short_stream(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+            yield b'{"a": 1}\n'
+            yield b'{"b": 2}\n'
+        
+        _, headers, chunks = self._call(CompressionMiddleware(short_stream, min_size=512))
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(headers['Content-Length'], '18')
+        self.assertEqual(b''.join(chunks), b'{"a": 1}\n{"b": 2}\n')
+        
+        def encoded(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/css'), ('Content-Encoding', 'br')])
+            return [b'x' * 4096]
+        
+        def image(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'image/png'), ('Content-Length', '4096')])
+            return [b'x' * 4096]
+        
+        for wsgi_app in (encoded, image):
+            _, headers, chunks = self._call(CompressionMiddleware(wsgi_app, min_size=10))
+            self.assertNotEqual(headers.get('Content-Encoding'), 'gzip')
+            self.assertEqual(b''.join(chunks), b'x' * 4096)
+
+
+class PrerenderedIndexTestCase(unittest.TestCase):
+    """Test cases for the pre-rendered index page"""
+    
+    def setUp(self):
+        self.client = app.test_client()
+        app_module._index_page['page'] = None
+        self.addCleanup(app_module._index_page.update, page=None)
+    
+    def test_renders_once_and_serves_variants(self):
+        """Test that the page is rendered once and served plain or gzipped"""
+        with mock.patch.object(app_module, 'INDEX_AUTO_RELOAD', False), \
+                mock.patch.object(app_module, 'render_template', wraps=app_module.render_template) as render:
+            plain = self.client.get('/')
+            zipped = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+            self.client.get('/')
+        self.assertEqual(render.call_count, 1)
+        
+        self.assertEqual(plain.headers['Content-Length'], str(len(plain.data)))
+        self.assertEqual(zipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.data), plain.data)
+        self.assertEqual(zipped.headers['ETag'], 'W/' + plain.headers['ETag'])
+        self.assertIn('Accept-Encoding', zipped.headers['Vary'])
+        
+        revalidated = self.client.get(
+            '/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']}
+        )
+        self.assertEqual(revalidated.status_code, 304)
+    
+    def test_rerenders_when_template_changes_in_debug(self):
+        """Test that auto-reload re-renders after the template's mtime changes"""
+        with mock.patch.object(app_module, 'INDEX_AUTO_RELOAD', True), \
+                mock.patch.object(app_module, 'render_template', wraps=app_module.render_template) as render:
+            self.client.get('/')
+            self.client.get('/')
+            self.assertEqual(render.call_count, 1)
+            with mock.patch.object(app_module, '_template_mtime', return_value=1):
+                self.client.get('/')
+            self.assertEqual(render.call_count, 2)
+    
+    def test_worker_startup_prerenders(self):
+        """Test that opening worker resources renders the page up front"""
+        app_module.open_worker_resources()
+        self.assertIsNotNone(app_module._index_page['page'])
+
+
+class StartupTimerTestCase(unittest.TestCase):
+    """Test cases for the startup phase timing"""
+    
+    def test_phases_are_measured_from_the_previous_mark(self):
+        """Test that each phase covers the time since the one before it"""
+        timer = StartupTimer(origin=100.0)
+        self.assertAlmostEqual(timer.mark('launch', at=100.25), 0.25)
+        self.assertAlmostEqual(timer.mark('imports', at=100.5), 0.25)
+        self.assertEqual(timer.summary(), 'launch=250ms imports=250ms total=500ms')
+    
+    def test_finishes_once(self):
+        """Test that only the first finish ends the timer"""
+        timer = StartupTimer(origin=0.0)
+        self.assertTrue(timer.finish('worker_init'))
+        self.assertFalse(timer.finish('worker_init'))
+        self.assertEqual([name for name, _ in timer.phases], ['worker_init'])
+    
+    def test_first_response_is_not_a_phase(self):
+        """Test that the first request's latency is kept apart from the startup total"""
+        timer = StartupTimer(origin=100.0)
+        timer.mark('worker_init', at=100.5)
+        self.assertTrue(timer.record_first_response(0.004))
+        self.assertFalse(timer.record_first_response(0.2))
+        self.assertEqual(timer.first_response, 0.004)
+        self.assertEqual(timer.summary(), 'worker_init=500ms total=500ms')
+    
+    def test_origin_comes_from_the_launcher(self):
+        """Test that an exported launch time is the origin, and bad ones are ignored"""
+        with mock.patch.dict(os.environ, {STARTUP_ENV: '1234.5'}):
+            self.assertEqual(startup_origin(), 1234.5)
+        with mock.patch.dict(os.environ, {STARTUP_ENV: 'soon'}):
+            self.assertNotEqual(startup_origin(), 1234.5)
+    
+    def test_preload_warms_caches_and_page(self):
+        """Test that preloading validates, plans and renders before workers fork"""
+        app_module._index_page['page'] = None
+        self.addCleanup(app_module._index_page.update, page=None)
+        with mock.patch.object(app_module.cost_guard, 'estimate', wraps=app_module.cost_guard.estimate) as estimate:
+            app_module.preload_resources()
+        self.assertEqual(estimate.call_count, len(app_module.WARM_QUERIES))
+        self.assertIsNotNone(app_module._index_page['page'])
+        self.assertEqual(app_module.db_pool.stats()['open'], 0)
+    
+    def test_disabled_subsystems_are_not_imported(self):
+        """Test that importing the app skips modules of switched-off features"""
+        env = dict(os.environ, SLOW_QUERY_THRESHOLD='0', QUERY_COALESCE_TIMEOUT='0',
+                   COMPRESSION_ENABLED='False',
+                   ADMISSION_RATE='0', ADMISSION_MAX_CONCURRENT='0')
+        optional = ['admission', 'compression', 'migrations', 'singleflight', 'slow_queries']
+        script = f'import sys, app; print([m for m in {optional!r} if m in sys.modules])'
+        output = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                timeout=60).stdout
+        self.assertEqual(output.strip(), '[]')
+
+
 if __name__ == '__main__':
     # Run tests
     unittest.main(verbosity=2)